@@ -0,0 +1,281 @@
+"""
+准入控制 - 上傳 I/O、音訊提取（FFmpeg / CPU）與對外 API 呼叫各自的並行上限與有界等待佇列
+
+- 每種資源一個 AdmissionPool：最多 limit 個同時執行，其餘依先來後到排隊
+- 上傳在接收本文之前（中介層）檢查上傳與提取佇列；翻譯管線的每批請求同樣佔用對外 API 名額
+- 新請求在佇列已滿、或預估等待時間超過 max_wait 時立即被拒絕（AdmissionRejected，對應 HTTP 429 +
+  Retry-After）；排隊超過 max_wait 仍未輪到也會被拒絕。過載時拒絕多出來的請求，
+  已接受的請求延遲維持在上限內，而不是所有請求一起變慢
+- 背景任務（轉錄）在請求當下以 reserve() 決定接受或 429，之後在背景排隊等待；
+  已接受的背景工作（重新提取音訊、波形）以 reject=False 排隊：不會被拒絕，但同樣計入佇列深度，
+  背景工作堆積時新的請求會先被拒絕
+- Retry-After 由排隊人數與服務時間（EWMA）估計
+
+多 worker 部署時上限為每個 worker 各自計算。
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Collection, Deque, Dict, Optional, Tuple
+
+
+# 資源種類
+POOL_UPLOAD = "upload"
+POOL_EXTRACT = "extract"
+POOL_API = "api"
+
+# 拒絕原因
+REASON_QUEUE_FULL = "queue_full"
+REASON_PREDICTED_WAIT = "predicted_wait"
+REASON_TIMEOUT = "timeout"
+REASONS = (REASON_QUEUE_FULL, REASON_PREDICTED_WAIT, REASON_TIMEOUT)
+
+# 預設值：(並行上限, 佇列長度, 最長等待秒數)；可由 ADMISSION_<POOL>_CONCURRENCY / _QUEUE / _MAX_WAIT 覆寫
+DEFAULT_LIMITS: Dict[str, Tuple[int, int, float]] = {
+    POOL_UPLOAD: (8, 32, 30.0),
+    POOL_EXTRACT: (os.cpu_count() or 1, 16, 120.0),
+    POOL_API: (16, 64, 60.0),
+}
+
+EWMA_ALPHA = 0.2
+MAX_RETRY_AFTER = 300
+
+
+class AdmissionRejected(Exception):
+    """資源忙碌，請求未被接受"""
+
+    def __init__(self, pool: str, reason: str, retry_after: int):
+        super().__init__(f"伺服器忙碌中（{pool}），請於 {retry_after} 秒後重試")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """單一資源的並行上限與有界 FIFO 等待佇列（在事件迴圈中使用）"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float = 0.0):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = {reason: 0 for reason in REASONS}
+        self.peak_waiting = 0
+        self.ewma_wait: Optional[float] = None
+        self.ewma_service: Optional[float] = None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def predicted_wait(self) -> float:
+        """新請求排在佇列尾端時的預估等待秒數（尚無服務時間量測時為 0）"""
+        if self.active < self.limit and not self._waiters:
+            return 0.0
+        return (self.waiting + 1) * (self.ewma_service or 0.0) / self.limit
+
+    def retry_after(self) -> int:
+        """建議的重試秒數：目前佇列大致消化完所需的時間"""
+        service = self.ewma_service or 1.0
+        return min(MAX_RETRY_AFTER, max(1, math.ceil((self.waiting + 1) * service / self.limit)))
+
+    def check(self):
+        """
+        確認目前會接受新請求（不佔用名額），否則拋出 AdmissionRejected
+
+        用於在昂貴的前置工作之前提早拒絕（例如上傳寫入檔案前先檢查提取佇列）。
+        """
+        if self.active < self.limit and not self._waiters:
+            return
+        if self.waiting >= self.queue_size:
+            self._reject(REASON_QUEUE_FULL)
+        if self.max_wait and self.predicted_wait() > self.max_wait:
+            self._reject(REASON_PREDICTED_WAIT)
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(self.name, reason, self.retry_after())
+
+    def slot(self, reject: bool = True) -> "Ticket":
+        """
+        取得名額（以 async with 使用）
+
+        Args:
+            reject: True 時佇列已滿、預估等待過長或排隊逾時會拋出 AdmissionRejected；
+                    False 時一律排隊等待（已接受的背景工作）
+        """
+        return self._ticket(reject, self.max_wait if reject and self.max_wait else None)
+
+    def reserve(self) -> "Ticket":
+        """
+        立即決定是否接受（不接受時拋出 AdmissionRejected），接受後排隊不逾時
+
+        用於背景任務：請求當下即回應 429 或接受，任務之後再以 async with ticket 等待輪到。
+        """
+        return self._ticket(True, None)
+
+    def _ticket(self, reject: bool, timeout: Optional[float]) -> "Ticket":
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return Ticket(self, None, timeout)
+        if reject:
+            self.check()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        return Ticket(self, waiter, timeout)
+
+    def _release(self):
+        # 名額直接交給佇列中的下一位（active 不變），避免新到的請求插隊
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "max_wait_seconds": self.max_wait,
+            "peak_waiting": self.peak_waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_ms": round(self.ewma_wait * 1000, 1) if self.ewma_wait is not None else None,
+            "service_ms": round(self.ewma_service * 1000, 1) if self.ewma_service is not None else None,
+            "predicted_wait_ms": round(self.predicted_wait() * 1000, 1),
+        }
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else current + EWMA_ALPHA * (sample - current)
+
+
+class Ticket:
+    """准入池中的一個位置：建立時即決定是否接受，之後等待輪到，結束時歸還（可重複呼叫 release）"""
+
+    def __init__(self, pool: AdmissionPool, waiter: Optional[asyncio.Future], timeout: Optional[float]):
+        self.pool = pool
+        self._waiter = waiter
+        self._timeout = timeout
+        self._enqueued = time.monotonic()
+        self._admitted: Optional[float] = None
+        self._released = False
+        if waiter is None:
+            self._admit()
+
+    @property
+    def queued(self) -> bool:
+        """仍在排隊等待"""
+        return self._admitted is None and not self._released
+
+    def _admit(self):
+        self._admitted = time.monotonic()
+        self.pool.admitted += 1
+        self.pool.ewma_wait = _ewma(self.pool.ewma_wait, self._admitted - self._enqueued)
+
+    async def wait(self):
+        """等待輪到；排隊逾時拋出 AdmissionRejected"""
+        if self._admitted is not None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._waiter), self._timeout)
+        except asyncio.TimeoutError:
+            # 逾時與交接同時發生時視為已接受
+            if not self._waiter.done():
+                self.release()
+                self.pool._reject(REASON_TIMEOUT)
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        self._admit()
+
+    def release(self):
+        """歸還名額；仍在排隊時退出佇列"""
+        if self._released:
+            return
+        self._released = True
+        if self._admitted is not None:
+            self.pool.ewma_service = _ewma(self.pool.ewma_service, time.monotonic() - self._admitted)
+            self.pool._release()
+        elif self._waiter.done():
+            # 已輪到但未開始：名額交給下一位
+            self.pool._release()
+        else:
+            self.pool._waiters.remove(self._waiter)
+            self._waiter.cancel()
+
+    async def __aenter__(self) -> "Ticket":
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class AdmissionController:
+    """各資源的准入池"""
+
+    def __init__(self, pools: Dict[str, AdmissionPool]):
+        self.pools = pools
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        pools = {}
+        for name, (limit, queue_size, max_wait) in DEFAULT_LIMITS.items():
+            prefix = f"ADMISSION_{name.upper()}_"
+            pools[name] = AdmissionPool(
+                name,
+                int(os.getenv(prefix + "CONCURRENCY", limit)),
+                int(os.getenv(prefix + "QUEUE", queue_size)),
+                float(os.getenv(prefix + "MAX_WAIT", max_wait)),
+            )
+        return cls(pools)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+class UploadAdmissionMiddleware:
+    """
+    上傳請求在接收本文之前先取得名額（ASGI 中介層）；名額不足時直接回應 429，不接收本文
+
+    precheck 為上傳完成後還會用到的資源（例如音訊提取）：其中任一佇列已滿時同樣在接收本文前拒絕。
+    端點寫完檔案後可呼叫 request.state.release_admission() 提早歸還名額，
+    其餘情況在回應結束時歸還。
+    """
+
+    def __init__(self, app, pool: AdmissionPool, paths: Collection[str],
+                 on_reject: Callable[[AdmissionRejected], Any], precheck: Collection[AdmissionPool] = ()):
+        self.app = app
+        self.pool = pool
+        self.paths = paths
+        self.on_reject = on_reject
+        self.precheck = precheck
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        try:
+            for pool in self.precheck:
+                pool.check()
+            ticket = self.pool.slot()
+            await ticket.wait()
+        except AdmissionRejected as e:
+            await self.on_reject(e)(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["release_admission"] = ticket.release
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ticket.release()
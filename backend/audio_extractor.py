@@ -1,9 +1,19 @@
 """
 音訊提取模組 - 使用 FFmpeg 從影片提取音訊
 """
+import csv
+import functools
+import json
 import subprocess
 import os
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# 單次解碼產生的音訊版本
+PCM_SAMPLE_RATE = 24000      # Realtime API / 波形使用的 PCM
+WHISPER_SAMPLE_RATE = 16000  # Whisper 內部即以 16kHz 處理，更高採樣率只會增加上傳量
+WHISPER_SEGMENT_SECONDS = 300.0
 
 
 def extract_audio(video_path: str, output_path: str, sample_rate: int = 24000):
@@ -18,15 +28,7 @@ def extract_audio(video_path: str, output_path: str, sample_rate: int = 24000):
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"影片檔案不存在: {video_path}")
     
-    # 檢查 FFmpeg 是否可用
-    try:
-        subprocess.run(
-            ["ffmpeg", "-version"],
-            capture_output=True,
-            check=True
-        )
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        raise RuntimeError("FFmpeg 未安裝或不在 PATH 中。請先安裝 FFmpeg。")
+    _check_ffmpeg()
     
     # 使用 FFmpeg 提取音訊
     # -i: 輸入檔案
@@ -56,3 +58,220 @@ def extract_audio(video_path: str, output_path: str, sample_rate: int = 24000):
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"FFmpeg 執行失敗: {e.stderr}")
 
+
+
+@functools.lru_cache(maxsize=None)
+def _check_ffmpeg():
+    """檢查 FFmpeg 是否可用（每個程序只檢查一次）"""
+    try:
+        subprocess.run(
+            ["ffmpeg", "-version"],
+            capture_output=True,
+            check=True
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        raise RuntimeError("FFmpeg 未安裝或不在 PATH 中。請先安裝 FFmpeg。")
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(video_path: str) -> Dict[str, Any]:
+    """
+    以 ffprobe 讀取影片中繼資料（只讀取容器標頭，不解碼）
+    
+    Returns:
+        {duration, format_name, bit_rate, size, tracks: [...], audio_tracks: int}；
+        每個 track 包含 index、type、codec，音訊另有 sample_rate、channels、language、title，
+        視訊另有 width、height、frame_rate
+    """
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"影片檔案不存在: {video_path}")
+    
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        video_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffprobe 未安裝或不在 PATH 中。請先安裝 FFmpeg。")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffprobe 執行失敗: {e.stderr}")
+    
+    data = json.loads(result.stdout or "{}")
+    fmt = data.get("format", {})
+    tracks = []
+    for stream in data.get("streams", []):
+        tags = stream.get("tags", {})
+        track = {
+            "index": stream.get("index"),
+            "type": stream.get("codec_type"),
+            "codec": stream.get("codec_name"),
+            "duration": _to_float(stream.get("duration")),
+        }
+        if track["type"] == "audio":
+            track.update({
+                "sample_rate": _to_int(stream.get("sample_rate")),
+                "channels": stream.get("channels"),
+                "channel_layout": stream.get("channel_layout"),
+                "language": tags.get("language"),
+                "title": tags.get("title"),
+                "default": bool(stream.get("disposition", {}).get("default")),
+            })
+        elif track["type"] == "video":
+            track.update({
+                "width": stream.get("width"),
+                "height": stream.get("height"),
+                "frame_rate": stream.get("avg_frame_rate"),
+            })
+        tracks.append(track)
+    
+    return {
+        "duration": _to_float(fmt.get("duration")),
+        "format_name": fmt.get("format_name"),
+        "bit_rate": _to_int(fmt.get("bit_rate")),
+        "size": _to_int(fmt.get("size")),
+        "tracks": tracks,
+        "audio_tracks": sum(1 for t in tracks if t["type"] == "audio"),
+    }
+
+
+def read_segment_list(list_path: str) -> List[Dict[str, Any]]:
+    """讀取 FFmpeg segment muxer 產生的 CSV 清單（檔名, 開始秒數, 結束秒數）"""
+    base = Path(list_path).parent
+    segments = []
+    with open(list_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            segments.append({
+                "path": str(base / row[0]),
+                "start_time": float(row[1]),
+                "end_time": float(row[2]),
+            })
+    return segments
+
+
+def track_output_paths(pcm_path: str, whisper_dir: str, track: int):
+    """音訊軌的輸出路徑；第 0 軌使用原路徑，其餘加上 _a<軌號> 後綴"""
+    if track == 0:
+        return pcm_path, whisper_dir
+    stem, ext = os.path.splitext(pcm_path)
+    return f"{stem}_a{track}{ext}", f"{whisper_dir}_a{track}"
+
+
+def extract_audio_renditions(video_path: str, pcm_path: str, whisper_dir: str,
+                             segment_seconds: float = WHISPER_SEGMENT_SECONDS,
+                             media_info: Optional[Dict[str, Any]] = None,
+                             tracks: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    單次 FFmpeg 呼叫同時產生多個音訊版本（影片只解碼一次）
+    
+    每個音訊軌各自輸出（不同語言或講者的音軌不會混在一起）：
+    - pcm: 24kHz 16-bit mono WAV（Realtime API、波形）
+    - whisper: 16kHz mono FLAC，依 segment_seconds 切段並附 CSV 清單，
+      每段可直接上傳 Whisper API（無損壓縮，約為 24kHz WAV 的 1/3 大小）
+    
+    Args:
+        video_path: 輸入影片路徑
+        pcm_path: 第 0 軌的輸出 WAV 路徑
+        whisper_dir: 第 0 軌的 Whisper 分段輸出目錄
+        segment_seconds: 每段長度（秒）
+        media_info: 已取得的 probe_media 結果（未提供時自動執行 ffprobe）
+        tracks: 要提取的音訊軌（音訊軌序號，從 0 開始），預設為全部
+        
+    Returns:
+        {"media_info": {...}, "renditions": 第一個提取軌的 {"pcm", "whisper"},
+         "tracks": [{"track": n, "pcm": {...}, "whisper": {...}}, ...]}
+    """
+    if media_info is None:
+        media_info = probe_media(video_path)
+    if not media_info["audio_tracks"]:
+        raise RuntimeError("影片沒有音訊軌")
+    if tracks is None:
+        tracks = list(range(media_info["audio_tracks"]))
+    
+    _check_ffmpeg()
+    
+    # 每個輸出前的選項只作用於該輸出；所有輸出共用同一次解碼
+    cmd = [
+        "ffmpeg",
+        "-hide_banner", "-nostdin",
+        "-y",
+        "-i", video_path,
+    ]
+    outputs = []
+    for track in tracks:
+        track_pcm, track_dir = track_output_paths(pcm_path, whisper_dir, track)
+        os.makedirs(track_dir, exist_ok=True)
+        segment_list = os.path.join(track_dir, "segments.csv")
+        outputs.append((track, track_pcm, track_dir, segment_list))
+        cmd += [
+            # 24kHz PCM WAV
+            "-map", f"0:a:{track}",
+            "-vn",
+            "-ar", str(PCM_SAMPLE_RATE),
+            "-ac", "1",
+            "-c:a", "pcm_s16le",
+            "-f", "wav",
+            track_pcm,
+            # 16kHz FLAC 分段
+            "-map", f"0:a:{track}",
+            "-vn",
+            "-ar", str(WHISPER_SAMPLE_RATE),
+            "-ac", "1",
+            "-c:a", "flac",
+            "-f", "segment",
+            "-segment_time", str(segment_seconds),
+            "-segment_list", segment_list,
+            "-segment_list_type", "csv",
+            "-reset_timestamps", "1",
+            os.path.join(track_dir, "%04d.flac"),
+        ]
+    
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg 執行失敗: {e.stderr}")
+    
+    results = []
+    for track, track_pcm, track_dir, segment_list in outputs:
+        segments = read_segment_list(segment_list)
+        results.append({
+            "track": track,
+            "pcm": {
+                "path": track_pcm,
+                "sample_rate": PCM_SAMPLE_RATE,
+                "format": "wav",
+            },
+            "whisper": {
+                "dir": track_dir,
+                "sample_rate": WHISPER_SAMPLE_RATE,
+                "format": "flac",
+                "segments": segments,
+                "bytes": sum(os.path.getsize(s["path"]) for s in segments),
+            },
+        })
+    
+    default = results[0]
+    return {
+        "media_info": media_info,
+        "renditions": {"pcm": default["pcm"], "whisper": default["whisper"]},
+        "tracks": results,
+    }
@@ -0,0 +1,193 @@
+"""
+音訊指紋 - 以頻譜特徵雜湊對齊同一內容的不同版本（剪輯、裁切、重新編碼）
+
+每 HOP_SECONDS 取一個分析框（降採樣至約 6kHz，約 0.34 秒），將 300–2000Hz 分成
+33 個對數頻帶計算能量，以「相鄰頻帶能量差」在相鄰時間框之間的增減組成 32 位元子指紋
+（Haitsma–Kalker 方法）。同一段音訊即使重新編碼，大部分子指紋仍完全相同：
+
+1. 以雜湊查表找出新舊版本共有的子指紋，投票得出候選時間位移
+2. 對每個候選位移逐框計算位元錯誤率（平滑後），取最低者判定該框是否與舊版本相符
+3. 相同位移的連續相符框合併為對齊區段 {start, end, offset}（新版時間 + offset = 舊版時間）
+
+時間解析度為 HOP_SECONDS（50ms），足以換算字幕時間戳。
+"""
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from waveform import wav_data_layout
+
+
+FINGERPRINT_RATE = 6000       # 降採樣目標取樣率（只需要 2kHz 以下的頻帶）
+FRAME_SIZE = 2048             # 分析框長度（降採樣後的樣本數）
+HOP_SECONDS = 0.05            # 子指紋間隔
+BAND_RANGE_HZ = (300.0, 2000.0)
+BAND_COUNT = 33               # 33 個頻帶 → 32 個能量差位元
+BLOCK_FRAMES = 4096           # 每次處理的分析框數（控制記憶體用量）
+
+MAX_HASH_OCCURRENCES = 8      # 舊版本中出現太多次的子指紋（靜音、持續音）不參與投票
+MIN_VOTES = 4                 # 候選位移至少需要的相同子指紋數
+MAX_CANDIDATES = 32           # 逐框驗證的候選位移數上限
+SMOOTH_FRAMES = 20            # 位元錯誤率平滑窗（1 秒）
+MAX_BIT_ERROR_RATE = 0.3      # 平滑後低於此值視為相符（不相關音訊約 0.5）
+MIN_MATCH_SECONDS = 3.0       # 短於此長度的相符區段捨棄
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def compute_fingerprints(wav_path: str) -> Tuple[np.ndarray, float, float]:
+    """
+    以 memmap 分塊讀取 16-bit PCM WAV 並計算子指紋
+
+    Returns:
+        (hashes: uint32 陣列，第 i 個對應時間 i * hop_seconds, hop_seconds, 音訊長度秒數)
+    """
+    offset, size, sample_rate, channels, width = wav_data_layout(wav_path)
+    frame_count = size // (width * channels)
+    decimation = max(1, sample_rate // FINGERPRINT_RATE)
+    rate = sample_rate / decimation
+    hop = max(1, int(round(rate * HOP_SECONDS)))
+    hop_seconds = hop / rate
+    duration = frame_count / sample_rate if sample_rate else 0.0
+
+    decimated_count = frame_count // decimation
+    if decimated_count < FRAME_SIZE:
+        return np.zeros(0, dtype=np.uint32), hop_seconds, duration
+
+    total = 1 + (decimated_count - FRAME_SIZE) // hop
+    samples = np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(frame_count, channels))
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / rate)
+    edges = np.searchsorted(freqs, np.geomspace(*BAND_RANGE_HZ, BAND_COUNT + 1))
+
+    hashes = np.empty(total, dtype=np.uint32)
+    previous = None
+    for first in range(0, total, BLOCK_FRAMES):
+        last = min(total, first + BLOCK_FRAMES)
+        start = first * hop * decimation
+        end = ((last - 1) * hop + FRAME_SIZE) * decimation
+        chunk = samples[start:end].astype(np.float32).mean(axis=1)
+        # 以區塊平均降採樣（粗略低通，對能量差的正負號影響不大）
+        chunk = chunk.reshape(-1, decimation).mean(axis=1)
+        frames = sliding_window_view(chunk, FRAME_SIZE)[::hop]
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        cumulative = np.concatenate([np.zeros((len(power), 1)), np.cumsum(power, axis=1)], axis=1)
+        energy = cumulative[:, edges[1:]] - cumulative[:, edges[:-1]]
+
+        band_diff = energy[:, :-1] - energy[:, 1:]
+        before = np.concatenate([band_diff[:1] if previous is None else previous, band_diff[:-1]])
+        previous = band_diff[-1:]
+        bits = band_diff - before > 0
+        hashes[first:last] = np.ascontiguousarray(np.packbits(bits, axis=1)).view(">u4").ravel()
+    del samples
+    return hashes, hop_seconds, duration
+
+
+def build_fingerprints(wav_path: str, output_path: str) -> Dict[str, float]:
+    """計算子指紋並寫入 .npz 檔案，回傳 {frames, hop_seconds, duration}"""
+    hashes, hop_seconds, duration = compute_fingerprints(wav_path)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, hashes=hashes, hop_seconds=hop_seconds, duration=duration)
+    os.replace(tmp_path, output_path)
+    return {"frames": len(hashes), "hop_seconds": hop_seconds, "duration": duration}
+
+
+def load_fingerprints(path: str) -> Tuple[np.ndarray, float, float]:
+    """讀取子指紋，回傳 (hashes, hop_seconds, duration)"""
+    with np.load(path) as data:
+        return data["hashes"], float(data["hop_seconds"]), float(data["duration"])
+
+
+def bit_errors(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """逐元素計算兩組子指紋的相異位元數"""
+    xor = np.ascontiguousarray(a ^ b, dtype=np.uint32)
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 4).sum(axis=1)
+
+
+def shared_ratio(old: np.ndarray, new: np.ndarray) -> float:
+    """新版本子指紋中與舊版本完全相同的比例（快速篩選候選來源）"""
+    usable = new[new != 0]
+    if not len(usable) or not len(old):
+        return 0.0
+    return float(np.isin(usable, old).mean())
+
+
+def candidate_offsets(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """以相同子指紋投票，回傳票數最高的候選位移（單位：框，舊版索引 - 新版索引）"""
+    order = np.argsort(old, kind="stable")
+    sorted_old = old[order]
+    left = np.searchsorted(sorted_old, new, side="left")
+    counts = np.searchsorted(sorted_old, new, side="right") - left
+    usable = np.nonzero((counts > 0) & (counts <= MAX_HASH_OCCURRENCES) & (new != 0))[0]
+    if not len(usable):
+        return np.zeros(0, dtype=np.int64)
+
+    offsets = []
+    for k in range(MAX_HASH_OCCURRENCES):
+        positions = usable[counts[usable] > k]
+        if not len(positions):
+            break
+        offsets.append(order[left[positions] + k] - positions)
+    values, votes = np.unique(np.concatenate(offsets), return_counts=True)
+    keep = votes >= MIN_VOTES
+    values, votes = values[keep], votes[keep]
+    return values[np.argsort(votes, kind="stable")[::-1][:MAX_CANDIDATES]]
+
+
+def align(old: np.ndarray, new: np.ndarray, hop_seconds: float) -> List[Dict[str, float]]:
+    """
+    將新版本對齊到舊版本
+
+    Returns:
+        相符區段列表 [{start, end, offset}]（秒，依 start 排序）；
+        新版時間 t 對應舊版時間 t + offset，未涵蓋的時間即為新增或變動的內容
+    """
+    n = len(new)
+    candidates = candidate_offsets(old, new) if n and len(old) else []
+    if not len(candidates):
+        return []
+
+    kernel = np.ones(SMOOTH_FRAMES) / SMOOTH_FRAMES
+    positions = np.arange(n)
+    best_rate = np.ones(n)
+    best_offset = np.zeros(n, dtype=np.int64)
+    for offset in candidates:
+        mapped = positions + offset
+        valid = (mapped >= 0) & (mapped < len(old))
+        errors = np.full(n, 32.0)
+        errors[valid] = bit_errors(new[valid], old[mapped[valid]])
+        rate = np.convolve(errors / 32.0, kernel, mode="same")
+        better = rate < best_rate
+        best_rate[better] = rate[better]
+        best_offset[better] = offset
+
+    # 分析框與取樣格點不一定對齊，相鄰位移（±1 框）交替出現時視為同一區段
+    matched = best_rate <= MAX_BIT_ERROR_RATE
+    breaks = np.nonzero(
+        (matched[1:] != matched[:-1]) | (np.abs(np.diff(best_offset)) > 1)
+    )[0] + 1
+    bounds = np.concatenate([[0], breaks, [n]])
+
+    # 平滑窗會讓區段邊緣外擴，兩端各內縮半個窗（音訊開頭與結尾除外）
+    margin = SMOOTH_FRAMES // 2
+    min_frames = int(MIN_MATCH_SECONDS / hop_seconds)
+    segments = []
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        if not matched[first]:
+            continue
+        if first > 0:
+            first += margin
+        if last < n:
+            last -= margin
+        if last - first < min_frames:
+            continue
+        offset = int(np.median(best_offset[first:last]))
+        segments.append({
+            "start": float(first * hop_seconds),
+            "end": float(last * hop_seconds),
+            "offset": offset * hop_seconds,
+        })
+    return segments
@@ -0,0 +1,302 @@
+"""
+離線批次處理 - 大量影片的音訊提取、轉錄、翻譯與筆記生成
+
+- FFmpeg 音訊提取在行程池中執行（CPU 密集，不受 GIL 限制）
+- Whisper / 翻譯 / 筆記的 API 呼叫以非同步方式並行，總並行數由 --api-concurrency 限制
+- 每個階段完成即寫入檢查點（JSON Lines），中斷後重新執行會從上次完成的階段繼續
+- 結果寫在每個輸入檔旁：<名稱>.srt / .vtt、<名稱>.zh-TW.srt / .vtt、<名稱>.notes.json，
+  中間結果 <名稱>.subtitles.json 供續跑使用
+- 結束時回報吞吐量（每牆鐘小時處理的音訊小時數）
+
+使用方式：
+    python batch_process.py /data/recordings --ffmpeg-workers 8 --api-concurrency 16
+    python batch_process.py manifest.txt --no-translate --formats srt
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from audio_extractor import extract_audio
+from logging_setup import configure_logging, shutdown_logging
+from note_generator import generate_bilingual_notes
+from subtitle_export import build_srt, build_vtt
+from translation_pipeline import TranslationPipeline
+from translator import translate_batch_to_traditional_chinese
+from whisper_client import DEFAULT_WINDOW_SECONDS, WhisperTranscriptionClient
+
+
+logger = logging.getLogger("batch_process")
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v", ".flv", ".wmv"}
+CHECKPOINT_NAME = ".batch_checkpoint.jsonl"
+TRANSLATED_SUFFIX = ".zh-TW"
+
+# 檢查點階段（依序完成）
+STAGE_TRANSCRIBED = "transcribed"
+STAGE_TRANSLATED = "translated"
+STAGE_NOTES = "notes"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+
+
+def discover_inputs(source: str) -> List[Path]:
+    """
+    取得要處理的影片列表
+
+    source 為目錄時遞迴尋找影片檔；為檔案時視為清單（每行一個路徑，# 開頭為註解，
+    相對路徑以清單所在目錄為基準）。
+    """
+    path = Path(source)
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS)
+
+    inputs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = Path(line)
+            inputs.append(entry if entry.is_absolute() else path.parent / entry)
+    return inputs
+
+
+def file_key(path: Path) -> str:
+    """以絕對路徑、大小與修改時間識別輸入檔（檔案被替換時重新處理）"""
+    stat = path.stat()
+    return f"{path.resolve()}|{stat.st_size}|{int(stat.st_mtime)}"
+
+
+def wav_duration(path: str) -> float:
+    with wave.open(path, "rb") as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+
+class Checkpoint:
+    """以 JSON Lines 追加寫入的處理進度；每個輸入檔只保留最後一筆狀態"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 中斷時可能留下不完整的最後一行
+                    self.entries[entry["key"]] = entry
+        self._file = open(path, "a", encoding="utf-8")
+
+    def stage(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        return entry["stage"] if entry else None
+
+    def record(self, key: str, stage: str, **fields):
+        entry = {"key": key, "stage": stage, "at": round(time.time(), 3), **fields}
+        self.entries[key] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class BatchProcessor:
+    """批次處理器：行程池跑 FFmpeg、非同步 API 呼叫、逐階段檢查點"""
+
+    def __init__(self, args):
+        self.args = args
+        self.formats = [f for f in args.formats.split(",") if f]
+        self.api_slots = asyncio.Semaphore(args.api_concurrency)
+        # 同時處理中的影片數：避免所有影片的 WAV 都先提取出來佔滿磁碟
+        self.video_slots = asyncio.Semaphore(args.ffmpeg_workers + args.api_concurrency)
+        self.ffmpeg_pool = ProcessPoolExecutor(max_workers=args.ffmpeg_workers)
+        self.audio_dir = Path(args.audio_dir or tempfile.mkdtemp(prefix="batch-audio-"))
+        self.audio_dir.mkdir(parents=True, exist_ok=True)
+        self.whisper = WhisperTranscriptionClient()
+        self.stats = {"processed": 0, "skipped": 0, "failed": 0, "audio_seconds": 0.0}
+
+    async def _translate_batch(self, texts: List[str]) -> List[str]:
+        async with self.api_slots:
+            return await translate_batch_to_traditional_chinese(texts)
+
+    async def extract(self, video_path: Path) -> str:
+        digest = hashlib.sha1(str(video_path.resolve()).encode("utf-8")).hexdigest()[:12]
+        audio_path = self.audio_dir / f"{video_path.stem}-{digest}.wav"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.ffmpeg_pool, extract_audio, str(video_path), str(audio_path))
+        return str(audio_path)
+
+    async def transcribe(self, audio_path: str, pipeline: Optional[TranslationPipeline]) -> List[Dict[str, Any]]:
+        """逐時間窗轉錄；每個時間窗完成即送入翻譯管線"""
+        loop = asyncio.get_running_loop()
+        windows = self.whisper.transcribe_audio_windows(audio_path, self.args.window_seconds)
+        subtitles: List[Dict[str, Any]] = []
+        while True:
+            async with self.api_slots:
+                window = await loop.run_in_executor(None, next, windows, None)
+            if window is None:
+                return subtitles
+            subtitles.extend(window)
+            if pipeline:
+                pipeline.submit(window)
+
+    async def translate(self, subtitles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        translated: List[Dict[str, Any]] = []
+        pipeline = TranslationPipeline(translated.extend, translate_fn=self._translate_batch)
+        pipeline.submit(subtitles)
+        await pipeline.drain()
+        if pipeline.failed_count:
+            raise RuntimeError(f"{pipeline.failed_count} 條字幕翻譯失敗")
+        return sorted(translated, key=lambda s: s["id"])
+
+    async def notes(self, subtitles: List[Dict[str, Any]]) -> dict:
+        full_text = " ".join(s["text"] for s in subtitles)
+        async with self.api_slots:
+            # generate_notes 內部使用同步客戶端，放到執行緒中避免阻塞其他影片的處理
+            return await asyncio.to_thread(asyncio.run, generate_bilingual_notes(full_text))
+
+    def write_subtitles(self, video_path: Path, subtitles: List[Dict[str, Any]], text_key: str, suffix: str = ""):
+        stem = video_path.with_suffix("")
+        builders = {"srt": build_srt, "vtt": build_vtt}
+        for fmt in self.formats:
+            Path(f"{stem}{suffix}.{fmt}").write_text(builders[fmt](subtitles, text_key), encoding="utf-8")
+
+    async def process(self, video_path: Path, checkpoint: Checkpoint):
+        key = file_key(video_path)
+        last_stage = checkpoint.stage(key)
+        if last_stage == STAGE_DONE and not self.args.force:
+            self.stats["skipped"] += 1
+            return
+
+        async with self.video_slots:
+            state_path = Path(f"{video_path.with_suffix('')}.subtitles.json")
+            state: Dict[str, Any] = {}
+            if last_stage is not None and state_path.exists() and not self.args.force:
+                # 中斷後繼續：沿用已完成階段的結果
+                state = json.loads(state_path.read_text(encoding="utf-8"))
+                logger.info("從檢查點繼續（已完成: %s）: %s", ",".join(state.get("completed", [])), video_path)
+            completed = state.setdefault("completed", [])
+
+            def save_stage(stage: str, **fields):
+                completed.append(stage)
+                state_path.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+                checkpoint.record(key, stage, **fields)
+
+            start = time.perf_counter()
+            audio_path = None
+            try:
+                if STAGE_TRANSCRIBED not in completed:
+                    audio_path = await self.extract(video_path)
+                    state["audio_seconds"] = await asyncio.to_thread(wav_duration, audio_path)
+                    translated: List[Dict[str, Any]] = []
+                    pipeline = None
+                    if self.args.translate:
+                        pipeline = TranslationPipeline(translated.extend, translate_fn=self._translate_batch)
+                    state["subtitles"] = await self.transcribe(audio_path, pipeline)
+                    if pipeline:
+                        # 翻譯與轉錄重疊進行，這裡只等待剩餘批次；有失敗時留到翻譯階段重做
+                        await pipeline.drain()
+                        if not pipeline.failed_count:
+                            state["translated_subtitles"] = sorted(translated, key=lambda s: s["id"])
+                    self.write_subtitles(video_path, state["subtitles"], "text")
+                    self.stats["audio_seconds"] += state["audio_seconds"]
+                    save_stage(STAGE_TRANSCRIBED, cues=len(state["subtitles"]))
+
+                if self.args.translate and STAGE_TRANSLATED not in completed:
+                    if "translated_subtitles" not in state:
+                        state["translated_subtitles"] = await self.translate(state["subtitles"])
+                    self.write_subtitles(video_path, state["translated_subtitles"], "translated_text", TRANSLATED_SUFFIX)
+                    save_stage(STAGE_TRANSLATED)
+
+                if self.args.notes and STAGE_NOTES not in completed and state["subtitles"]:
+                    notes = await self.notes(state["subtitles"])
+                    Path(f"{video_path.with_suffix('')}.notes.json").write_text(
+                        json.dumps(notes, ensure_ascii=False, indent=2), encoding="utf-8"
+                    )
+                    save_stage(STAGE_NOTES)
+
+                checkpoint.record(key, STAGE_DONE, audio_seconds=state.get("audio_seconds", 0.0),
+                                  elapsed=round(time.perf_counter() - start, 3))
+                self.stats["processed"] += 1
+                logger.info("完成 %s（%.0f 秒音訊，%d 條字幕，%.1fs）", video_path,
+                            state.get("audio_seconds", 0.0), len(state["subtitles"]), time.perf_counter() - start)
+            except Exception as e:
+                self.stats["failed"] += 1
+                checkpoint.record(key, STAGE_FAILED, completed=list(completed), error=f"{type(e).__name__}: {e}")
+                logger.error("處理失敗 %s: %s", video_path, e)
+            finally:
+                if audio_path and not self.args.keep_audio and os.path.exists(audio_path):
+                    os.remove(audio_path)
+
+    async def run(self, inputs: List[Path], checkpoint: Checkpoint) -> dict:
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.process(path, checkpoint) for path in inputs))
+        finally:
+            self.ffmpeg_pool.shutdown()
+        wall = time.perf_counter() - start
+        audio_hours = self.stats["audio_seconds"] / 3600
+        return {
+            **self.stats,
+            "inputs": len(inputs),
+            "wall_seconds": round(wall, 3),
+            "audio_hours": round(audio_hours, 4),
+            # 每牆鐘小時處理的音訊小時數
+            "audio_hours_per_hour": round(audio_hours / (wall / 3600), 2) if wall > 0 else None,
+        }
+
+
+async def main(args) -> int:
+    inputs = discover_inputs(args.source)
+    if not inputs:
+        logger.error("找不到要處理的影片: %s", args.source)
+        return 1
+
+    source = Path(args.source)
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else \
+        (source if source.is_dir() else source.parent) / CHECKPOINT_NAME
+    checkpoint = Checkpoint(checkpoint_path)
+    logger.info("共 %d 個影片，檢查點: %s", len(inputs), checkpoint_path)
+    try:
+        report = await BatchProcessor(args).run(inputs, checkpoint)
+    finally:
+        checkpoint.close()
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="離線批次處理影片（轉錄、翻譯、筆記）")
+    parser.add_argument("source", help="影片目錄，或每行一個路徑的清單檔")
+    parser.add_argument("--ffmpeg-workers", type=int, default=os.cpu_count() or 2, help="FFmpeg 行程數")
+    parser.add_argument("--api-concurrency", type=int, default=8, help="同時進行的 API 呼叫數")
+    parser.add_argument("--window-seconds", type=float, default=DEFAULT_WINDOW_SECONDS, help="轉錄時間窗長度（秒）")
+    parser.add_argument("--formats", default="srt,vtt", help="字幕輸出格式（srt、vtt，逗號分隔）")
+    parser.add_argument("--no-translate", dest="translate", action="store_false", help="不翻譯為繁體中文")
+    parser.add_argument("--no-notes", dest="notes", action="store_false", help="不生成筆記")
+    parser.add_argument("--checkpoint", help=f"檢查點檔案（預設為來源目錄下的 {CHECKPOINT_NAME}）")
+    parser.add_argument("--audio-dir", help="暫存音訊目錄（預設為暫存目錄）")
+    parser.add_argument("--keep-audio", action="store_true", help="保留提取的 WAV 檔")
+    parser.add_argument("--force", action="store_true", help="忽略檢查點，全部重新處理")
+    args = parser.parse_args()
+
+    configure_logging()
+    try:
+        exit_code = asyncio.run(main(args))
+    finally:
+        shutdown_logging()
+    sys.exit(exit_code)
@@ -0,0 +1,186 @@
+"""
+冷啟動基準測試 - 量測 `import main` 的匯入時間與服務從啟動到就緒的時間，並檢查匯入預算
+
+檢查項目（任一項失敗即以非零狀態碼結束，可直接作為 CI 檢查）：
+- `python -X importtime -c "import main"` 的累計時間（多次取中位數）不超過 --budget-ms
+- 匯入時不載入重量級模組（openai、numpy 與 API 客戶端模組，這些在第一次使用或背景預熱時才載入）
+- 匯入時不在工作目錄建立任何檔案或目錄（資料目錄與檢索索引在服務啟動後才建立）
+- 可選（--serve）：啟動服務，量測到第一個回應與 /ready 回報就緒的時間，不超過 --ready-budget-ms
+
+使用方式：
+    python bench_cold_start.py --runs 5 --budget-ms 800 --serve
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmark import BACKEND_DIR, free_port
+
+# import main 的時間預算（毫秒）；test_cold_start.py 與本腳本共用
+DEFAULT_BUDGET_MS = 800.0
+
+# 匯入 main 時不應載入的模組
+HEAVY_MODULES = ("openai", "numpy", "whisper_client", "translator", "note_generator",
+                 "waveform", "audio_fingerprint", "incremental")
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """解析 -X importtime 輸出（微秒）"""
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            })
+    return modules
+
+
+def env_for(workdir: Path, **extra: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND_DIR),
+        "SEARCH_DB": str(workdir / "search_index.db"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "mock-key"),
+        **extra,
+    }
+
+
+def measure_import(workdir: Path) -> Dict[str, Any]:
+    """在空的工作目錄中以新行程匯入 main"""
+    before = set(workdir.iterdir())
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=workdir, env=env_for(workdir), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"匯入 main 失敗:\n{proc.stderr[-2000:]}")
+    modules = parse_importtime(proc.stderr)
+    main_entry = next(m for m in modules if m["module"] == "main" and m["depth"] == 0)
+    loaded = {m["module"] for m in modules}
+    return {
+        "import_ms": main_entry["cumulative_ms"],
+        "modules": modules,
+        "heavy_loaded": sorted(name for name in HEAVY_MODULES if name in loaded),
+        "created": sorted(p.name for p in set(workdir.iterdir()) - before),
+    }
+
+
+def top_modules(modules: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """累計時間最長的第一層模組（main 直接匯入的模組）"""
+    # importtime 先輸出子模組再輸出父模組：main 之前、上一個頂層模組之後的第一層即為 main 的子模組
+    end = next(i for i, m in enumerate(modules) if m["module"] == "main" and m["depth"] == 0)
+    begin = max((i for i in range(end) if modules[i]["depth"] == 0), default=-1) + 1
+    direct = [m for m in modules[begin:end] if m["depth"] == 1]
+    direct.sort(key=lambda m: m["cumulative_ms"], reverse=True)
+    return [{"module": m["module"], "cumulative_ms": round(m["cumulative_ms"], 1)} for m in direct[:limit]]
+
+
+async def measure_ready(workdir: Path, timeout: float) -> Dict[str, Optional[float]]:
+    """啟動服務，量測到第一個回應（存活）與 /ready 回報 200（就緒）的時間"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/ready"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "main.py")], cwd=workdir,
+        env=env_for(workdir, HOST="127.0.0.1", PORT=str(port), LOG_LEVEL="WARNING"),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    first_response, ready, checks = None, None, None
+    try:
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    response = await client.get(url)
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.01)
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                if first_response is None:
+                    first_response = elapsed
+                checks = response.json()["checks"]
+                if response.status_code == 200:
+                    ready = elapsed
+                    break
+                await asyncio.sleep(0.01)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {
+        "first_response_ms": round(first_response, 1) if first_response is not None else None,
+        "ready_ms": round(ready, 1) if ready is not None else None,
+        "checks": checks,
+    }
+
+
+def main(args) -> int:
+    runs, failures = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="cold-start-") as tmp:
+            runs.append(measure_import(Path(tmp)))
+
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    heavy = sorted({name for r in runs for name in r["heavy_loaded"]})
+    created = sorted({name for r in runs for name in r["created"]})
+    if import_ms > args.budget_ms:
+        failures.append(f"匯入時間 {import_ms:.0f} ms 超過預算 {args.budget_ms:.0f} ms")
+    if heavy:
+        failures.append(f"匯入時載入了重量級模組: {', '.join(heavy)}")
+    if created:
+        failures.append(f"匯入時建立了檔案或目錄: {', '.join(created)}")
+
+    result: Dict[str, Any] = {
+        "import_ms": {
+            "median": round(import_ms, 1),
+            "min": round(min(r["import_ms"] for r in runs), 1),
+            "max": round(max(r["import_ms"] for r in runs), 1),
+            "budget": args.budget_ms,
+        },
+        "top_modules": top_modules(runs[-1]["modules"], args.top),
+        "heavy_loaded": heavy,
+        "created_on_import": created,
+    }
+
+    if args.serve:
+        with tempfile.TemporaryDirectory(prefix="cold-start-") as tmp:
+            serve = asyncio.run(measure_ready(Path(tmp), args.ready_timeout))
+        result["serve"] = serve
+        if serve["ready_ms"] is None:
+            failures.append(f"服務未在 {args.ready_timeout} 秒內就緒: {serve['checks']}")
+        elif args.ready_budget_ms and serve["ready_ms"] > args.ready_budget_ms:
+            failures.append(f"就緒時間 {serve['ready_ms']:.0f} ms 超過預算 {args.ready_budget_ms:.0f} ms")
+
+    result["failures"] = failures
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="冷啟動基準測試與匯入時間預算檢查")
+    parser.add_argument("--runs", type=int, default=5, help="匯入量測次數（取中位數）")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="import main 的時間預算（毫秒）")
+    parser.add_argument("--top", type=int, default=10, help="列出累計時間最長的模組數")
+    parser.add_argument("--serve", action="store_true", help="同時量測服務啟動到就緒的時間")
+    parser.add_argument("--ready-budget-ms", type=float, default=0.0, help="就緒時間預算（毫秒，0 表示不檢查）")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="等待就緒的秒數")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""
+字幕儲存記憶體基準測試 - 比較 dict 列表（原文 + 翻譯複本）與欄位式 CueStore
+
+以 tracemalloc 量測保存多部影片字幕（含翻譯）所需的記憶體，並比較整份序列化的時間與大小。
+兩種做法都由 JSON 解析出的新字串建立（與 API 收到的轉錄結果相同），避免共用字串物件而低估 dict 版本。
+
+使用方式：
+    python bench_cue_store.py --videos 50 --subtitles 3000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from bench_ws_frames import synthetic_subtitles
+from cue_store import CueStore
+
+
+def synthetic_translation(rng: random.Random, text: str) -> str:
+    """產生與原文長度相近的中文翻譯"""
+    return "".join(rng.choice("這是一段關於系統設計與課程筆記的翻譯內容") for _ in range(max(4, len(text) // 3)))
+
+
+def build_dicts(corpus):
+    """原本的做法：subtitles 與 translated_subtitles 兩份 dict 列表"""
+    videos = []
+    for encoded in corpus:
+        subtitles, translations = json.loads(encoded)
+        translated = [{**s, "translated_text": t} for s, t in zip(subtitles, translations)]
+        videos.append({"subtitles": subtitles, "translated_subtitles": translated})
+    return videos
+
+
+def build_stores(corpus):
+    videos = []
+    for encoded in corpus:
+        subtitles, translations = json.loads(encoded)
+        store = CueStore(subtitles)
+        for s, t in zip(subtitles, translations):
+            store.set_translation(s["id"], t)
+        videos.append({"subtitles": store})
+    return videos
+
+
+def measure(name, corpus, build):
+    # 建立時間另外量測（tracemalloc 會大幅拖慢大量小物件的配置）
+    start = time.perf_counter()
+    build(corpus)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    videos = build(corpus)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cues = sum(len(v["subtitles"]) for v in videos)
+    return videos, {
+        "layout": name,
+        "bytes": current,
+        "bytes_per_cue": round(current / cues, 1) if cues else None,
+        "build_ms": round(elapsed * 1000, 2),
+    }
+
+
+def serialize(name, payloads):
+    start = time.perf_counter()
+    total = sum(len(json.dumps(p, ensure_ascii=False)) for p in payloads)
+    return {"case": name, "bytes": total, "ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def main(args):
+    rng = random.Random(1)
+    corpus = []
+    for _ in range(args.videos):
+        subtitles = synthetic_subtitles(args.subtitles)
+        translations = [synthetic_translation(rng, s["text"]) for s in subtitles]
+        corpus.append(json.dumps([subtitles, translations], ensure_ascii=False))
+
+    dict_videos, dict_result = measure("dicts", corpus, build_dicts)
+    store_videos, store_result = measure("cue_store", corpus, build_stores)
+    ratio = dict_result["bytes"] / store_result["bytes"] if store_result["bytes"] else None
+
+    serialization = [
+        serialize("dicts", [{"subtitles": v["translated_subtitles"]} for v in dict_videos]),
+        serialize("cue_store_dicts", [{"subtitles": list(v["subtitles"].translated)} for v in store_videos]),
+        serialize("cue_store_columns", [{"columns": v["subtitles"].to_columns(translations=True)}
+                                        for v in store_videos]),
+    ]
+    print(json.dumps({
+        "videos": args.videos,
+        "subtitles_per_video": args.subtitles,
+        "memory": [dict_result, store_result],
+        "memory_ratio": round(ratio, 2) if ratio else None,
+        "serialization": serialization,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="字幕儲存記憶體基準測試")
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--subtitles", type=int, default=3000)
+    main(parser.parse_args())
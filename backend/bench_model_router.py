@@ -0,0 +1,187 @@
+"""
+模型路由基準測試 - 以不同延遲特性的本地 mock 端點比較固定模型與路由政策
+
+啟動三個 mock OpenAI 伺服器：
+- slow：延遲高、轉錄延遲隨音訊長度大幅增加（模擬高品質但較慢的模型）
+- fast：延遲低（模擬較小、較便宜的模型或自架端點）
+- flaky：延遲中等但多數請求回傳 500（SDK 重試後仍約半數失敗）
+
+情境：
+- static：只使用 slow（原本的固定模型）
+- queue：佇列深度達門檻時改用較快的路由
+- slo：預估延遲超過目標時改用較快的路由（延遲由量測回饋）
+- budget：最近一小時成本超過預算時改用最便宜的路由
+- errors：偏好路由連續失敗後暫停，流量移到備援路由
+- audio_length：短音訊使用 slow，長音訊預估超過延遲目標時改用 fast
+
+使用方式：
+    python bench_model_router.py --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+from typing import Any, Dict, List, Tuple
+
+from benchmark import BACKEND_DIR, free_port, summarize, wait_ready
+from model_router import ModelRouter, Policy, Route, TASK_TRANSCRIBE, TASK_TRANSLATE, configure
+import translator
+from whisper_client import WhisperTranscriptionClient
+
+
+PROFILES = {
+    "slow": ["--latency", "0.4", "--latency-jitter", "0.1", "--transcription-seconds-per-minute", "2.0"],
+    "fast": ["--latency", "0.05", "--latency-jitter", "0.02", "--transcription-seconds-per-minute", "0.2"],
+    "flaky": ["--latency", "0.1", "--latency-jitter", "0.05", "--error-rate", "0.8"],
+}
+
+
+def start_mocks() -> Tuple[Dict[str, str], List[subprocess.Popen]]:
+    urls, procs = {}, []
+    for name, options in PROFILES.items():
+        port = free_port()
+        procs.append(subprocess.Popen(
+            [sys.executable, str(BACKEND_DIR / "mock_openai_server.py"), "--port", str(port), *options],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        urls[name] = f"http://127.0.0.1:{port}/v1"
+    return urls, procs
+
+
+def make_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+async def drive(total: int, concurrency: int, call) -> Dict[str, Any]:
+    """以固定並行數送出 total 個請求"""
+    samples, errors = [], 0
+    queue = asyncio.Queue()
+    for n in range(total):
+        queue.put_nowait(n)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            n = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                await call(n)
+            except Exception:
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, errors, time.perf_counter() - start)
+
+
+def translate_routes(urls: Dict[str, str], *names: str, costs: Dict[str, float] = None) -> List[Route]:
+    costs = costs or {}
+    return [Route(name, TASK_TRANSLATE, f"mock-{name}", base_url=urls[name], cost=costs.get(name, 0.0))
+            for name in names]
+
+
+def route_counts(router: ModelRouter, task: str) -> Dict[str, Any]:
+    stats = router.stats()[task]
+    return {
+        "routes": {name: {"calls": r["calls"], "errors": r["errors"], "latency_ms": r["latency_ms"]}
+                   for name, r in stats["routes"].items()},
+        "decisions": stats["decisions"],
+        "spent": stats["spent_last_hour"],
+    }
+
+
+async def run_translate(name: str, router: ModelRouter, args) -> Dict[str, Any]:
+    configure(router)
+    texts = [f"benchmark sentence {i}" for i in range(args.batch)]
+    try:
+        result = await drive(args.requests, args.concurrency,
+                             lambda n: translator.translate_batch_to_traditional_chinese(texts))
+    finally:
+        await router.aclose()
+    return {"scenario": name, **result, **route_counts(router, TASK_TRANSLATE)}
+
+
+async def run_audio_length(urls: Dict[str, str], args) -> Dict[str, Any]:
+    """先送短音訊再送長音訊；長音訊的延遲由短音訊量測到的每分鐘延遲推估"""
+    router = ModelRouter(
+        [Route("slow", TASK_TRANSCRIBE, "whisper-1", base_url=urls["slow"]),
+         Route("fast", TASK_TRANSCRIBE, "whisper-1", base_url=urls["fast"])],
+        {TASK_TRANSCRIBE: Policy(slo_seconds=args.transcribe_slo)},
+    )
+    client = WhisperTranscriptionClient(router)
+    phases = []
+    for length, seconds in (("short", 15.0), ("long", 120.0)):
+        data = make_wav(seconds)
+        before = {name: r["calls"] for name, r in router.stats()[TASK_TRANSCRIBE]["routes"].items()}
+        result = await drive(args.transcriptions, min(args.concurrency, 8), lambda n: asyncio.to_thread(
+            client._transcribe_window, "clip.wav", data, n + 1, 0.0, 1, seconds
+        ))
+        after = router.stats()[TASK_TRANSCRIBE]["routes"]
+        phases.append({
+            "audio_seconds": seconds, **result,
+            "routes": {name: r["calls"] - before.get(name, 0) for name, r in after.items()},
+        })
+    await router.aclose()
+    return {"scenario": "audio_length", "phases": phases, **route_counts(router, TASK_TRANSCRIBE)}
+
+
+async def main(args):
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+    urls, procs = start_mocks()
+    try:
+        for url in urls.values():
+            await wait_ready(url.replace("/v1", "/mock/stats"))
+
+        scenarios = [
+            await run_translate("static", ModelRouter(translate_routes(urls, "slow")), args),
+            await run_translate("queue", ModelRouter(
+                translate_routes(urls, "slow", "fast"),
+                {TASK_TRANSLATE: Policy(queue_threshold=args.queue_threshold)},
+            ), args),
+            await run_translate("slo", ModelRouter(
+                translate_routes(urls, "slow", "fast"),
+                {TASK_TRANSLATE: Policy(slo_seconds=args.slo)},
+            ), args),
+            await run_translate("budget", ModelRouter(
+                translate_routes(urls, "slow", "fast", costs={"slow": 1.0, "fast": 0.1}),
+                {TASK_TRANSLATE: Policy(budget_per_hour=args.budget)},
+            ), args),
+            await run_translate("errors", ModelRouter(
+                translate_routes(urls, "flaky", "fast"),
+                {TASK_TRANSLATE: Policy(error_threshold=3, cooldown_seconds=args.cooldown)},
+            ), args),
+            await run_audio_length(urls, args),
+        ]
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    print(json.dumps({"config": vars(args), "scenarios": scenarios}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模型路由基準測試")
+    parser.add_argument("--requests", type=int, default=200, help="每個翻譯情境的請求數")
+    parser.add_argument("--transcriptions", type=int, default=20, help="音訊長度情境每種長度的轉錄請求數")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=20, help="每次翻譯請求的字幕數")
+    parser.add_argument("--queue-threshold", type=int, default=4)
+    parser.add_argument("--slo", type=float, default=0.25, help="翻譯延遲目標（秒）")
+    parser.add_argument("--transcribe-slo", type=float, default=2.0, help="轉錄延遲目標（秒）")
+    parser.add_argument("--budget", type=float, default=1000.0, help="翻譯每小時預算（成本單位）")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="路由暫停秒數")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+字幕 WebSocket 訊框基準測試 - 比較逐條推送與批次/精簡編碼的訊框數與傳輸量
+
+壓縮大小以 permessage-deflate（保留壓縮上下文）相同的方式計算。
+
+使用方式：
+    python bench_ws_frames.py --subtitles 5000 --batch 50
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+
+from subtitle_frames import cues_frame, subtitles_frame
+from subtitle_hub import encode_message
+
+
+WORDS = "the quick brown fox jumps over lazy dog today we discuss lecture notes about systems".split()
+
+
+def synthetic_subtitles(count: int):
+    rng = random.Random(0)
+    subtitles = []
+    t = 0.0
+    for idx in range(1, count + 1):
+        duration = rng.uniform(1.5, 5.0)
+        subtitles.append({
+            "id": idx,
+            "start_time": t,
+            "end_time": t + duration,
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14))),
+        })
+        t += duration + rng.uniform(0.0, 0.5)
+    return subtitles
+
+
+def deflate_sizes(payloads):
+    """模擬 permessage-deflate（context takeover）：每則訊息 sync flush 並去除 4 位元組尾碼"""
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    total = 0
+    for payload in payloads:
+        data = compressor.compress(payload.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        total += len(data) - 4
+    return total
+
+
+def run_case(name, subtitles, build_frames):
+    start = time.perf_counter()
+    payloads = [encode_message(frame) for frame in build_frames(subtitles)]
+    elapsed = time.perf_counter() - start
+    raw_bytes = sum(len(p.encode("utf-8")) for p in payloads)
+    return {
+        "case": name,
+        "frames": len(payloads),
+        "raw_bytes": raw_bytes,
+        "deflate_bytes": deflate_sizes(payloads),
+        "encode_ms": round(elapsed * 1000, 2),
+        "frames_per_sec": round(len(payloads) / elapsed) if elapsed else None,
+        "subtitles_per_sec": round(len(subtitles) / elapsed) if elapsed else None,
+    }
+
+
+def batched(builder, size):
+    def build(subtitles):
+        return [builder(subtitles[i:i + size]) for i in range(0, len(subtitles), size)]
+    return build
+
+
+def main(args):
+    subtitles = synthetic_subtitles(args.subtitles)
+    results = [
+        run_case("per_subtitle", subtitles, lambda subs: [{"type": "subtitle", "data": s} for s in subs]),
+        run_case(f"batched_json_{args.batch}", subtitles, batched(subtitles_frame, args.batch)),
+        run_case(f"batched_compact_{args.batch}", subtitles, batched(cues_frame, args.batch)),
+    ]
+    print(json.dumps({"subtitles": args.subtitles, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="字幕 WebSocket 訊框基準測試")
+    parser.add_argument("--subtitles", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=50)
+    main(parser.parse_args())
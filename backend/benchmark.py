@@ -0,0 +1,297 @@
+"""
+端到端基準測試 - 以本地 mock OpenAI 伺服器驅動完整流程
+
+流程：FFmpeg 產生合成影片 → /upload → /ws/transcribe → /translate → /generate-notes → /export/srt
+輸出各階段吞吐量、p50/p95/p99 延遲與後端峰值 RSS（JSON，可與先前結果比較）。
+
+使用方式：
+    python benchmark.py --lengths 10,60,300 --iterations 5 --concurrency 2
+    python benchmark.py --compare bench_results/bench-20260101-120000.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+import mock_openai_server
+
+
+BACKEND_DIR = Path(__file__).resolve().parent
+STAGES = ["upload", "transcribe", "translate", "generate_notes", "export_srt", "total"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_video(path: Path, seconds: float):
+    """以 FFmpeg 產生含測試畫面與正弦波音訊的合成影片"""
+    if path.exists():
+        return
+    cmd = [
+        "ffmpeg",
+        "-f", "lavfi", "-i", "testsrc=size=320x240:rate=15",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "ultrafast",
+        "-c:a", "aac",
+        "-shortest",
+        "-y", str(path)
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg 產生測試影片失敗: {e.stderr}")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩百分位數"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: List[float], errors: int, wall_seconds: float) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / wall_seconds, 3) if wall_seconds else None,
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else None,
+        "p50_ms": round(percentile(ms, 50), 2) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 2) if ms else None,
+    }
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """讀取行程峰值 RSS（Linux /proc）"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=BACKEND_DIR
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"服務未在 {timeout} 秒內就緒: {url}")
+
+
+async def run_job(client: httpx.AsyncClient, base_url: str, video_path: Path) -> Dict[str, float]:
+    """執行一次完整流程，回傳各階段耗時（秒）"""
+    timings = {}
+    job_start = time.perf_counter()
+
+    start = time.perf_counter()
+    with open(video_path, "rb") as f:
+        response = await client.post(f"{base_url}/upload", files={"file": (video_path.name, f, "video/mp4")})
+    response.raise_for_status()
+    video_id = response.json()["video_id"]
+    timings["upload"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ws_url = base_url.replace("http://", "ws://") + f"/ws/transcribe/{video_id}?restart=true"
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        async for message in ws:
+            data = json.loads(message)
+            if data.get("type") == "completed":
+                break
+            if data.get("type") == "error" or "error" in data:
+                raise RuntimeError(f"轉錄失敗: {data.get('error')}")
+    timings["transcribe"] = time.perf_counter() - start
+
+    for stage, method, path in (
+        ("translate", "POST", f"/translate/{video_id}"),
+        ("generate_notes", "POST", f"/generate-notes/{video_id}"),
+        ("export_srt", "GET", f"/export/srt/{video_id}"),
+    ):
+        start = time.perf_counter()
+        response = await client.request(method, f"{base_url}{path}")
+        response.raise_for_status()
+        timings[stage] = time.perf_counter() - start
+
+    timings["total"] = time.perf_counter() - job_start
+    return timings
+
+
+async def run_scenario(base_url: str, video_path: Path, iterations: int, concurrency: int) -> dict:
+    samples = {stage: [] for stage in STAGES}
+    errors = {stage: 0 for stage in STAGES}
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(client):
+        async with slots:
+            try:
+                timings = await run_job(client, base_url, video_path)
+            except Exception as e:
+                errors["total"] += 1
+                print(f"  流程失敗: {e}", file=sys.stderr)
+                return
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=600) as client:
+        await asyncio.gather(*(one(client) for _ in range(iterations)))
+    wall = time.perf_counter() - start
+    return {
+        "wall_seconds": round(wall, 3),
+        "stages": {stage: summarize(samples[stage], errors[stage], wall) for stage in STAGES},
+    }
+
+
+def compare(current: dict, baseline_path: str):
+    """列出與基準結果的延遲差異"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n與 {baseline_path}（commit {baseline['meta'].get('git_commit')}）比較：")
+    for length, scenario in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(length)
+        if not base:
+            continue
+        for stage in STAGES:
+            cur_p50 = scenario["stages"][stage]["p50_ms"]
+            base_p50 = base["stages"].get(stage, {}).get("p50_ms")
+            if cur_p50 is None or not base_p50:
+                continue
+            delta = (cur_p50 - base_p50) / base_p50 * 100
+            print(f"  {length:>6} {stage:<15} p50 {base_p50:>10.1f} → {cur_p50:>10.1f} ms ({delta:+.1f}%)")
+    rss, base_rss = current.get("server_peak_rss_mb"), baseline.get("server_peak_rss_mb")
+    if rss and base_rss:
+        print(f"  峰值 RSS {base_rss} → {rss} MB")
+
+
+async def main(args):
+    lengths = [float(x) for x in args.lengths.split(",") if x]
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    video_dir = workdir / "videos"
+    video_dir.mkdir(exist_ok=True)
+
+    videos = {}
+    for seconds in lengths:
+        path = video_dir / f"synthetic_{int(seconds)}s.mp4"
+        make_video(path, seconds)
+        videos[seconds] = path
+
+    mock_port = free_port()
+    backend_port = free_port()
+    mock_cmd = [
+        sys.executable, str(BACKEND_DIR / "mock_openai_server.py"),
+        "--port", str(mock_port),
+        "--latency", str(args.latency),
+        "--latency-jitter", str(args.latency_jitter),
+        "--segment-seconds", str(args.segment_seconds),
+        "--transcription-seconds-per-minute", str(args.transcription_seconds_per_minute),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit", str(args.rate_limit),
+    ]
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "mock-key",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{mock_port}/v1",
+        "OPENAI_REALTIME_URL": f"ws://127.0.0.1:{mock_port}/v1/realtime",
+    }
+    backend_cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--app-dir", str(BACKEND_DIR),
+        "--host", "127.0.0.1", "--port", str(backend_port),
+        "--log-level", "warning",
+    ]
+
+    mock_proc = subprocess.Popen(mock_cmd, cwd=workdir, env=env)
+    backend_proc = subprocess.Popen(
+        backend_cmd, cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL if not args.verbose else None
+    )
+    base_url = f"http://127.0.0.1:{backend_port}"
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+        },
+        "scenarios": {},
+    }
+    try:
+        await wait_ready(f"http://127.0.0.1:{mock_port}/mock/stats")
+        await wait_ready(f"{base_url}/openapi.json")
+
+        for seconds, path in videos.items():
+            print(f"情境: {seconds:.0f}s 影片 × {args.iterations}（並行 {args.concurrency}）", file=sys.stderr)
+            results["scenarios"][f"{int(seconds)}s"] = await run_scenario(
+                base_url, path, args.iterations, args.concurrency
+            )
+
+        results["server_peak_rss_mb"] = peak_rss_mb(backend_proc.pid)
+        async with httpx.AsyncClient() as client:
+            results["mock_stats"] = (await client.get(f"http://127.0.0.1:{mock_port}/mock/stats")).json()
+    finally:
+        for proc in (backend_proc, mock_proc):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    output = Path(args.output or BACKEND_DIR / "bench_results" / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\n結果已寫入 {output}", file=sys.stderr)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="端到端基準測試（本地 mock OpenAI 伺服器）")
+    parser.add_argument("--lengths", default="10,60,300", help="合成影片長度（秒，逗號分隔）")
+    parser.add_argument("--iterations", type=int, default=5, help="每種長度執行次數")
+    parser.add_argument("--concurrency", type=int, default=2, help="同時執行的流程數")
+    parser.add_argument("--workdir", help="工作目錄（預設為暫存目錄，可重用已產生的影片）")
+    parser.add_argument("--output", help="結果 JSON 路徑（預設 bench_results/bench-<時間>.json）")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比較")
+    parser.add_argument("--verbose", action="store_true", help="顯示後端輸出")
+    mock_openai_server.add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,572 @@
+"""
+多 worker 共用狀態 - 以本機 SQLite（WAL）協調同一台機器上的多個 uvicorn worker 行程
+
+- videos：影片資料（不含字幕），version 在影片或其字幕任何變動時遞增，stamp 為全表遞增的變動序號；
+  各 worker 在背景輪詢 stamp 之後的變動，載入其他 worker 新建立或更新的影片
+- cues / tracks：各音訊軌的字幕與翻譯，revision 改變時重新載入該軌字幕
+- leases：轉錄任務與儲存清理的租約；持有者定期續約，worker 結束後租約逾時即可由其他 worker 接手
+- events：跨 worker 的字幕廣播；發布的訊息寫入事件表，其他 worker 輪詢後轉發到本地 SubtitleHub。
+  主題重新開始時刪除舊事件，因此事件表只保留每個主題目前這一輪的訊息（晚加入的訂閱者可取得完整快照）；
+  各 worker 在 cursors 表回報已套用的序號，所有 worker 都已套用的已結束主題與暫時事件即刪除
+
+每個 worker 各自開兩個連線：寫入在單一交易內完成，讀取使用另一個連線，WAL 模式下不會被寫入阻塞。
+defer() 將寫入交給專用的寫入執行緒依序執行，事件迴圈不必等待寫入鎖（busy timeout）。
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+LEASE_SECONDS = 30.0          # 租約有效期限；持有者每 1/3 期限續約
+POLL_SECONDS = 0.05           # 事件輪詢間隔
+TRANSIENT_EVENT_SECONDS = 60  # 不保留的事件（狀態更新）保存時間
+CURSOR_SECONDS = LEASE_SECONDS  # worker 的事件序號超過此時間未回報即視為已結束，不再等待其套用
+
+EVENT_MESSAGE = "message"
+EVENT_RESET = "reset"
+EVENT_CLOSE = "close"
+
+
+def resolve_workers(value: Optional[str]) -> int:
+    """解析 worker 數設定："auto" 依 CPU 核心數，未設定為 1"""
+    if not value:
+        return 1
+    if value.strip().lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+class ClusterState:
+    """單一 worker 對共用狀態資料庫的存取（執行緒安全）"""
+
+    def __init__(self, db_path: str, worker_id: Optional[str] = None):
+        self.db_path = db_path
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._held: Set[str] = set()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                stamp INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS tracks (
+                video_id TEXT NOT NULL,
+                track INTEGER NOT NULL,
+                revision INTEGER NOT NULL,
+                PRIMARY KEY (video_id, track)
+            );
+            CREATE TABLE IF NOT EXISTS cues (
+                video_id TEXT NOT NULL,
+                track INTEGER NOT NULL,
+                id INTEGER NOT NULL,
+                start_time REAL NOT NULL,
+                end_time REAL NOT NULL,
+                text TEXT NOT NULL,
+                translated_text TEXT,
+                PRIMARY KEY (video_id, track, id)
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                retain INTEGER NOT NULL,
+                droppable INTEGER NOT NULL,
+                variants TEXT,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS events_topic ON events (topic, seq);
+            CREATE TABLE IF NOT EXISTS expendable (
+                path TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS cursors (
+                worker_id TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                updated REAL NOT NULL
+            );
+        """)
+        if "stamp" not in {row[1] for row in self._conn.execute("PRAGMA table_info(videos)")}:
+            # 舊版資料庫沒有 stamp 欄位
+            self._conn.execute("ALTER TABLE videos ADD COLUMN stamp INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS videos_stamp ON videos (stamp)")
+        self._reader = sqlite3.connect(db_path, check_same_thread=False, timeout=10.0, isolation_level=None)
+        # 寫入與背景讀取（事件輪詢）各自的專用執行緒
+        self._writer_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cluster-writer")
+        self._fetch_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cluster-reader")
+
+    def defer(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """在寫入執行緒上依提交順序執行 fn(*args)，不阻塞呼叫端"""
+        return self._writer_thread.submit(fn, *args)
+
+    def fetch(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """在背景讀取執行緒上執行 fn(*args)（輪詢事件與影片變動）"""
+        return self._fetch_thread.submit(fn, *args)
+
+    def close(self):
+        """等待已提交的寫入完成後關閉連線"""
+        self._writer_thread.shutdown(wait=True)
+        self._fetch_thread.shutdown(wait=True)
+        self._conn.close()
+        self._reader.close()
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """在單一寫入交易中執行（BEGIN IMMEDIATE 取得寫入鎖，避免升級鎖時的死結）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _read(self, sql: str, params: Iterable = ()) -> List[tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, tuple(params)).fetchall()
+
+    # ---- 影片與字幕 ----
+
+    @staticmethod
+    def _next_stamp(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(MAX(stamp), 0) + 1 FROM videos").fetchone()[0]
+
+    @classmethod
+    def _bump(cls, conn: sqlite3.Connection, video_id: str) -> Tuple[Optional[int], int]:
+        row = conn.execute("SELECT version FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        before = row[0] if row else None
+        conn.execute("UPDATE videos SET version = version + 1, stamp = ? WHERE video_id = ?",
+                     (cls._next_stamp(conn), video_id))
+        return before, (before or 0) + 1
+
+    def save_video(self, video_id: str, data: Dict[str, Any]) -> Tuple[Optional[int], int]:
+        """
+        寫入影片資料
+
+        Returns:
+            (寫入前的 version, 寫入後的 version)；兩者相差 1 以外代表期間有其他 worker 寫入
+        """
+        return self.save_encoded(video_id, json.dumps(data, ensure_ascii=False))
+
+    def save_encoded(self, video_id: str, encoded: str) -> Tuple[Optional[int], int]:
+        """寫入已序列化的影片資料（呼叫端先序列化，寫入可交給寫入執行緒）"""
+        def write(conn):
+            row = conn.execute("SELECT version FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+            before = row[0] if row else None
+            conn.execute(
+                "INSERT INTO videos (video_id, data, version, stamp) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET data = excluded.data, version = version + 1, "
+                "stamp = excluded.stamp",
+                (video_id, encoded, self._next_stamp(conn))
+            )
+            return before, (before or 0) + 1
+        return self._write(write)
+
+    def video_version(self, video_id: str) -> Optional[int]:
+        rows = self._read("SELECT version FROM videos WHERE video_id = ?", (video_id,))
+        return rows[0][0] if rows else None
+
+    def load_video(self, video_id: str) -> Optional[Tuple[int, Dict[str, Any], Dict[int, int]]]:
+        """讀取影片資料：(version, 資料, {音訊軌: 字幕 revision})"""
+        with self._read_lock:
+            self._reader.execute("BEGIN")
+            try:
+                row = self._reader.execute(
+                    "SELECT version, data FROM videos WHERE video_id = ?", (video_id,)
+                ).fetchone()
+                revisions = dict(self._reader.execute(
+                    "SELECT track, revision FROM tracks WHERE video_id = ?", (video_id,)
+                ).fetchall())
+            finally:
+                self._reader.execute("COMMIT")
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), revisions
+
+    def changed_videos(self, after: int) -> Tuple[int, List[Tuple[str, int, Dict[str, Any], Dict[int, int]]]]:
+        """
+        stamp 大於 after 的影片變動
+
+        Returns:
+            (目前最大的 stamp, [(video_id, version, 資料, {音訊軌: 字幕 revision})])
+        """
+        changed = self._read("SELECT video_id, stamp FROM videos WHERE stamp > ? ORDER BY stamp", (after,))
+        videos = []
+        for video_id, stamp in changed:
+            loaded = self.load_video(video_id)
+            if loaded is not None:
+                videos.append((video_id, *loaded))
+            after = max(after, stamp)
+        return after, videos
+
+    def video_ids(self) -> List[str]:
+        return [row[0] for row in self._read("SELECT video_id FROM videos")]
+
+    def _cue_write(self, video_id: str, track: int,
+                   apply: Callable[[sqlite3.Connection], None]) -> Tuple[Optional[int], int]:
+        def write(conn):
+            apply(conn)
+            conn.execute(
+                "INSERT INTO tracks (video_id, track, revision) VALUES (?, ?, 1) "
+                "ON CONFLICT (video_id, track) DO UPDATE SET revision = revision + 1",
+                (video_id, track)
+            )
+            return self._bump(conn, video_id)
+        return self._write(write)
+
+    def reset_cues(self, video_id: str, track: int) -> Tuple[Optional[int], int]:
+        """清空音訊軌的字幕（重新轉錄）"""
+        return self._cue_write(video_id, track, lambda conn: conn.execute(
+            "DELETE FROM cues WHERE video_id = ? AND track = ?", (video_id, track)
+        ))
+
+    def add_cues(self, video_id: str, track: int,
+                 subtitles: List[Dict[str, Any]]) -> Tuple[Optional[int], int]:
+        """加入字幕（沿用的字幕可同時帶 translated_text）"""
+        rows = [
+            (video_id, track, s["id"], s["start_time"], s["end_time"], s["text"], s.get("translated_text"))
+            for s in subtitles
+        ]
+        return self._cue_write(video_id, track, lambda conn: conn.executemany(
+            "INSERT OR REPLACE INTO cues (video_id, track, id, start_time, end_time, text, translated_text) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        ))
+
+    def set_translations(self, video_id: str, track: int, translated: Iterable[Tuple[int, str]],
+                         replace: bool = False) -> Tuple[Optional[int], int]:
+        """寫入翻譯 [(字幕 id, 翻譯)]；replace=True 時先清除該軌所有翻譯"""
+        rows = [(text, video_id, track, cue_id) for cue_id, text in translated]
+
+        def apply(conn):
+            if replace:
+                conn.execute("UPDATE cues SET translated_text = NULL WHERE video_id = ? AND track = ?",
+                             (video_id, track))
+            conn.executemany(
+                "UPDATE cues SET translated_text = ? WHERE video_id = ? AND track = ? AND id = ?", rows
+            )
+        return self._cue_write(video_id, track, apply)
+
+    def load_cues(self, video_id: str, track: int) -> Iterator[Tuple[int, float, float, str, Optional[str]]]:
+        """依 id 順序讀取音訊軌字幕：(id, start_time, end_time, text, translated_text)"""
+        return iter(self._read(
+            "SELECT id, start_time, end_time, text, translated_text FROM cues "
+            "WHERE video_id = ? AND track = ? ORDER BY id", (video_id, track)
+        ))
+
+    # ---- 租約 ----
+
+    def acquire(self, name: str, ttl: float = LEASE_SECONDS) -> bool:
+        """取得租約（未被持有、已逾時或已由自己持有時成功）"""
+        now = time.time()
+
+        def write(conn):
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.expires < ? OR leases.owner = excluded.owner",
+                (name, self.worker_id, now + ttl, now)
+            )
+            row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+            return row is not None and row[0] == self.worker_id
+        acquired = self._write(write)
+        if acquired:
+            self._held.add(name)
+        return acquired
+
+    def release(self, name: str):
+        self._held.discard(name)
+        self._write(lambda conn: conn.execute(
+            "DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.worker_id)
+        ))
+
+    def release_all(self):
+        """釋放自己持有的所有租約（worker 結束時）"""
+        for name in list(self._held):
+            self.release(name)
+
+    def renew_all(self, ttl: float = LEASE_SECONDS) -> List[str]:
+        """續約自己持有的所有租約；回傳已失去（被其他 worker 接手）的租約"""
+        held = list(self._held)
+        if not held:
+            return []
+        expires = time.time() + ttl
+
+        def write(conn):
+            lost = []
+            for name in held:
+                cursor = conn.execute(
+                    "UPDATE leases SET expires = ? WHERE name = ? AND owner = ?",
+                    (expires, name, self.worker_id)
+                )
+                if cursor.rowcount == 0:
+                    lost.append(name)
+            return lost
+        lost = self._write(write)
+        self._held.difference_update(lost)
+        return lost
+
+    def holder(self, name: str) -> Optional[str]:
+        """租約目前的持有者（已逾時視為無人持有）"""
+        rows = self._read("SELECT owner FROM leases WHERE name = ? AND expires >= ?", (name, time.time()))
+        return rows[0][0] if rows else None
+
+    def leased(self, prefix: str) -> List[str]:
+        """有效租約中名稱以 prefix 開頭者（去掉 prefix）"""
+        rows = self._read(
+            "SELECT name FROM leases WHERE name >= ? AND name < ? AND expires >= ?",
+            (prefix, prefix + "￿", time.time())
+        )
+        return [row[0][len(prefix):] for row in rows]
+
+    # ---- 儲存空間的跨 worker 保留標記（StorageManager.shared_pins） ----
+
+    def pin(self, owner: str):
+        self.defer(self.acquire, f"pin:{owner}:{self.worker_id}")
+
+    def unpin(self, owner: str):
+        self.defer(self.release, f"pin:{owner}:{self.worker_id}")
+
+    def pinned(self) -> Set[str]:
+        return {name.split(":", 1)[0] for name in self.leased("pin:")}
+
+    def mark_expendable(self, path: str):
+        self.defer(self._write, lambda conn: conn.execute(
+            "INSERT OR IGNORE INTO expendable (path) VALUES (?)", (path,)
+        ))
+
+    def expendable(self) -> Set[str]:
+        return {row[0] for row in self._read("SELECT path FROM expendable")}
+
+    def forget_expendable(self, paths: List[str]):
+        self.defer(self._write, lambda conn: conn.executemany(
+            "DELETE FROM expendable WHERE path = ?", [(p,) for p in paths]
+        ))
+
+    # ---- 跨 worker 廣播 ----
+
+    def publish(self, topic: str, kind: str, variants: Optional[str] = None,
+                retain: bool = False, droppable: bool = False):
+        """寫入廣播事件；reset 同時刪除主題先前的事件"""
+        def write(conn):
+            if kind == EVENT_RESET:
+                conn.execute("DELETE FROM events WHERE topic = ?", (topic,))
+            conn.execute(
+                "INSERT INTO events (topic, origin, kind, retain, droppable, variants, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (topic, self.worker_id, kind, int(retain), int(droppable), variants, time.time())
+            )
+        self._write(write)
+
+    def poll(self, after: int, limit: int = 1000) -> List[Tuple[int, str, str, str, bool, bool, Optional[str]]]:
+        """seq 大於 after 的事件：(seq, topic, origin, kind, retain, droppable, variants)"""
+        return [
+            (seq, topic, origin, kind, bool(retain), bool(droppable), variants)
+            for seq, topic, origin, kind, retain, droppable, variants in self._read(
+                "SELECT seq, topic, origin, kind, retain, droppable, variants FROM events "
+                "WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit)
+            )
+        ]
+
+    def ack(self, seq: int):
+        """回報本 worker 已套用到 seq 的事件"""
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO cursors (worker_id, seq, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT (worker_id) DO UPDATE SET seq = excluded.seq, updated = excluded.updated",
+            (self.worker_id, seq, time.time())
+        ))
+
+    def prune_events(self, max_age: float = TRANSIENT_EVENT_SECONDS) -> int:
+        """
+        刪除不再需要的事件，回傳刪除數
+
+        - 所有仍在運作的 worker 都已套用的暫時事件，以及已結束（close 已被所有 worker 套用）主題的所有事件；
+          已結束主題的快照改由字幕儲存重建，晚啟動的 worker 只需重播進行中的主題
+        - 超過 max_age 的暫時事件（即使有 worker 尚未套用）
+        """
+        now = time.time()
+
+        def write(conn):
+            conn.execute("DELETE FROM cursors WHERE updated < ?", (now - CURSOR_SECONDS,))
+            low = conn.execute("SELECT MIN(seq) FROM cursors").fetchone()[0]
+            deleted = conn.execute(
+                "DELETE FROM events WHERE retain = 0 AND created < ?", (now - max_age,)
+            ).rowcount
+            if low is not None:
+                deleted += conn.execute(
+                    "DELETE FROM events WHERE seq <= ? AND (retain = 0 OR topic IN ("
+                    "SELECT topic FROM events WHERE kind = ? AND seq <= ?))",
+                    (low, EVENT_CLOSE, low)
+                ).rowcount
+            return deleted
+        return self._write(write)
+
+
+class SharedVideos(MutableMapping):
+    """
+    video_storage 的多 worker 版本：本地 dict + 共用狀態
+
+    每個 worker 在本地保有所有影片（與單一 worker 部署相同），存取時不查詢資料庫。
+    其他 worker 的建立與更新由背景輪詢（fetch_changes，在共用狀態的背景讀取執行緒執行）讀出，
+    交給 apply_remote 呼叫 refresh 就地更新本地副本（保留同一個 dict 物件，進行中的工作持有的參照不受影響）；
+    refresh 需要的其他資料（例如字幕）由 prepare 在同一個背景執行緒讀取。
+    其他 worker 剛建立、尚未輪詢到的影片可以 await load() 載入。
+    本地寫入後需呼叫 persist 寫回共用狀態；寫入在 ClusterState 的寫入執行緒上依序執行，
+    仍有未完成寫入的影片延到寫入完成後才套用其他 worker 的更新，避免以舊資料覆蓋本地修改。
+    """
+
+    def __init__(self, cluster: ClusterState,
+                 refresh: Callable[[str, Optional[Dict[str, Any]], Dict[str, Any], Dict[int, int], Any],
+                                   Dict[str, Any]],
+                 encode: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 prepare: Optional[Callable[[str, Dict[str, Any], Dict[int, int]], Any]] = None,
+                 on_error: Optional[Callable[[BaseException], None]] = None):
+        self.cluster = cluster
+        self.refresh = refresh
+        self.encode = encode
+        self.prepare = prepare
+        self.on_error = on_error
+        self._local: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._remote: Dict[str, Tuple[int, Dict[str, Any], Dict[int, int], Any]] = {}
+
+    def _prepared(self, video_id: str, version: int, data: Dict[str, Any],
+                  revisions: Dict[int, int]) -> Tuple[str, int, Dict[str, Any], Dict[int, int], Any]:
+        prepared = self.prepare(video_id, data, revisions) if self.prepare else None
+        return video_id, version, data, revisions, prepared
+
+    def fetch_changes(self, after: int) -> Tuple[int, List[Tuple[str, int, Dict[str, Any], Dict[int, int], Any]]]:
+        """
+        （背景讀取執行緒）stamp 大於 after 的影片變動，連同 prepare 讀出的資料
+
+        Returns:
+            (目前最大的 stamp, [(video_id, version, 資料, {音訊軌: 字幕 revision}, prepare 結果)])，交給 apply_remote
+        """
+        stamp, videos = self.cluster.changed_videos(after)
+        return stamp, [self._prepared(*video) for video in videos]
+
+    def _fetch_one(self, video_id: str):
+        loaded = self.cluster.load_video(video_id)
+        return None if loaded is None else self._prepared(video_id, *loaded)
+
+    async def load(self, video_id: str) -> bool:
+        """本地沒有的影片在背景讀取執行緒讀取共用狀態後加入本地；回傳影片是否存在"""
+        if video_id in self._local:
+            return True
+        fetched = await asyncio.wrap_future(self.cluster.fetch(self._fetch_one, video_id))
+        if fetched is None:
+            return False
+        if video_id not in self._local:
+            self._add_remote(*fetched)
+        return True
+
+    def _add_remote(self, video_id: str, version: int, data: Dict[str, Any],
+                    revisions: Dict[int, int], prepared: Any):
+        self._local[video_id] = self.refresh(video_id, None, data, revisions, prepared)
+        self._versions[video_id] = version
+
+    def apply_remote(self, videos: Iterable[Tuple[str, int, Dict[str, Any], Dict[int, int], Any]]):
+        """套用 fetch_changes 讀出的影片變動"""
+        for video_id, version, data, revisions, prepared in videos:
+            if video_id not in self._local:
+                self._add_remote(video_id, version, data, revisions, prepared)
+                continue
+            self._remote[video_id] = (version, data, revisions, prepared)
+            self._apply_pending_remote(video_id)
+
+    def _apply_pending_remote(self, video_id: str):
+        if self._pending.get(video_id):
+            return
+        remote = self._remote.pop(video_id, None)
+        if remote is None:
+            return
+        version, data, revisions, prepared = remote
+        if version <= self._versions.get(video_id, 0):
+            # 自己的寫入，或在本地寫入完成前讀到的舊版本
+            return
+        self._local[video_id] = self.refresh(video_id, self._local.get(video_id), data, revisions, prepared)
+        self._versions[video_id] = version
+
+    def note_write(self, video_id: str, versions: Tuple[Optional[int], int]):
+        """
+        記錄本地寫入後的 version
+
+        寫入前的 version 與本地已知相同時直接採用新 version（不必重新載入自己的寫入）；
+        否則期間有其他 worker 寫入，保留舊值讓下一次變動輪詢時重新載入。
+        """
+        before, after = versions
+        if before is None or self._versions.get(video_id) == before:
+            self._versions[video_id] = after
+
+    def write(self, video_id: str, fn: Callable[..., Tuple[Optional[int], int]], *args: Any):
+        """
+        在寫入執行緒上執行會變更影片 version 的寫入 fn(*args)，完成後於事件迴圈記錄 version
+
+        沒有執行中的事件迴圈時（例如腳本）直接同步寫入。
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.note_write(video_id, fn(*args))
+            return
+        self._pending[video_id] = self._pending.get(video_id, 0) + 1
+        future = self.cluster.defer(fn, *args)
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._written, video_id, f))
+
+    def _written(self, video_id: str, future: Future):
+        self._pending[video_id] -= 1
+        if not self._pending[video_id]:
+            del self._pending[video_id]
+        error = future.exception()
+        if error is not None:
+            if self.on_error:
+                self.on_error(error)
+        else:
+            self.note_write(video_id, future.result())
+        self._apply_pending_remote(video_id)
+
+    def persist(self, video_id: str):
+        data = self._local.get(video_id)
+        if data is not None:
+            # 在事件迴圈序列化（之後本地資料可能繼續被修改），寫入交給寫入執行緒
+            self.write(video_id, self.cluster.save_encoded, video_id,
+                       json.dumps(self.encode(data), ensure_ascii=False))
+
+    def __getitem__(self, video_id: str) -> Dict[str, Any]:
+        return self._local[video_id]
+
+    def __contains__(self, video_id) -> bool:
+        return video_id in self._local
+
+    def __setitem__(self, video_id: str, data: Dict[str, Any]):
+        self._local[video_id] = data
+        self.persist(video_id)
+
+    def __delitem__(self, video_id: str):
+        del self._local[video_id]
+        self._versions.pop(video_id, None)
+        self._remote.pop(video_id, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._local))
+
+    def __len__(self) -> int:
+        return len(self._local)
@@ -0,0 +1,276 @@
+"""
+欄位式字幕儲存 - 以平行陣列取代每條字幕一個 dict，降低長影片常駐記憶體
+
+- id: array('q')；start_time / end_time: array('d')
+- 原文：所有字幕的 UTF-8 文字接在同一個 bytearray，另以 array('Q') 記錄每條的起始位移
+- 翻譯：另一個獨立的文字緩衝區與 (位移, 長度) 欄位，未翻譯為 -1，不再複製原文與時間戳；
+  覆寫翻譯時不長於原翻譯則就地寫入，否則附加到尾端，被取代的位元組超過緩衝區一半時重新整理
+
+每條字幕約 48 位元組加上文字本身（dict 版本約 300 位元組，翻譯再複製一份）。
+讀取時才建立 dict（store[i]、迭代、切片），因此可直接交給既有的 build_srt、搜尋索引等函式；
+API 回應可用 to_columns() 以欄位陣列輸出，省去逐條建立 dict。
+"""
+import hashlib
+import itertools
+from array import array
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# 翻譯緩衝區中被取代的位元組超過此數量且超過一半時重新整理
+COMPACT_MIN_BYTES = 64 * 1024
+
+# 所有 CueStore 共用的 revision 序號：整份字幕被替換後也不會與舊內容的 revision 相同
+_revisions = itertools.count(1)
+
+
+class CueStore(Sequence):
+    """
+    字幕列表（依加入順序，通常即 id 與時間順序）
+
+    revision 在任何修改（新增字幕、寫入或清除翻譯）時遞增，供快取判斷內容是否改變；
+    text_revision 只在原文改變（新增字幕）時遞增，供以原文計算的結果（筆記、翻譯）判斷是否需要重算。
+    序號在行程內全域唯一，因此可直接作為快取與 ETag 的版本。
+    """
+
+    def __init__(self, subtitles: Iterable[Dict[str, Any]] = ()):
+        self.ids = array("q")
+        self.starts = array("d")
+        self.ends = array("d")
+        self._text = bytearray()
+        self._text_offsets = array("Q", [0])
+        self._translation = bytearray()
+        self._translation_spans = array("q")
+        self._translation_garbage = 0
+        self._id_map: Optional[Dict[int, int]] = None
+        self._hash: Optional[Tuple[int, str]] = None
+        self.translated_count = 0
+        self.revision = next(_revisions)
+        self.text_revision = self.revision
+        self.translated = TranslatedCues(self)
+        self.extend(subtitles)
+
+    def append(self, subtitle: Dict[str, Any]):
+        """加入一條字幕（{id, start_time, end_time, text}）"""
+        self.ids.append(subtitle["id"])
+        self.starts.append(subtitle["start_time"])
+        self.ends.append(subtitle["end_time"])
+        self._text += subtitle["text"].encode("utf-8")
+        self._text_offsets.append(len(self._text))
+        self._translation_spans.extend((-1, 0))
+        self.revision = self.text_revision = next(_revisions)
+
+    def extend(self, subtitles: Iterable[Dict[str, Any]]):
+        for subtitle in subtitles:
+            self.append(subtitle)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.cue(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("字幕索引超出範圍")
+        return self.cue(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.cue(i)
+
+    def cue(self, i: int) -> Dict[str, Any]:
+        return {
+            "id": self.ids[i],
+            "start_time": self.starts[i],
+            "end_time": self.ends[i],
+            "text": self.text(i),
+        }
+
+    def text(self, i: int) -> str:
+        return self._text[self._text_offsets[i]:self._text_offsets[i + 1]].decode("utf-8")
+
+    def texts(self) -> Iterator[str]:
+        """依序產生所有原文（不建立 dict）"""
+        offsets = self._text_offsets
+        for i in range(len(self)):
+            yield self._text[offsets[i]:offsets[i + 1]].decode("utf-8")
+
+    def position(self, cue_id: int) -> Optional[int]:
+        """字幕 id 對應的位置；id 連續遞增時直接換算，否則建立對照表"""
+        if not self.ids:
+            return None
+        pos = cue_id - self.ids[0]
+        if 0 <= pos < len(self.ids) and self.ids[pos] == cue_id:
+            return pos
+        if self._id_map is None or len(self._id_map) != len(self.ids):
+            self._id_map = {cid: i for i, cid in enumerate(self.ids)}
+        return self._id_map.get(cue_id)
+
+    def translation(self, i: int) -> Optional[str]:
+        offset, length = self._translation_spans[2 * i], self._translation_spans[2 * i + 1]
+        if offset < 0:
+            return None
+        return self._translation[offset:offset + length].decode("utf-8")
+
+    def set_translation(self, cue_id: int, text: str) -> bool:
+        """寫入字幕翻譯（翻譯批次可不依序完成）；id 不存在時回傳 False"""
+        i = self.position(cue_id)
+        if i is None:
+            return False
+        spans = self._translation_spans
+        offset, length = spans[2 * i], spans[2 * i + 1]
+        data = text.encode("utf-8")
+        if offset >= 0 and len(data) <= length:
+            # 就地覆寫原翻譯的位置
+            self._translation[offset:offset + len(data)] = data
+            self._translation_garbage += length - len(data)
+        else:
+            if offset < 0:
+                self.translated_count += 1
+            else:
+                self._translation_garbage += length
+            spans[2 * i] = len(self._translation)
+            self._translation += data
+        spans[2 * i + 1] = len(data)
+        if (self._translation_garbage > COMPACT_MIN_BYTES
+                and self._translation_garbage * 2 > len(self._translation)):
+            self._compact_translations()
+        self.revision = next(_revisions)
+        return True
+
+    def _compact_translations(self):
+        """依字幕順序重建翻譯緩衝區，移除被取代的位元組"""
+        spans = self._translation_spans
+        buffer = bytearray()
+        for i in range(len(self)):
+            offset, length = spans[2 * i], spans[2 * i + 1]
+            if offset >= 0:
+                spans[2 * i] = len(buffer)
+                buffer += self._translation[offset:offset + length]
+        self._translation = buffer
+        self._translation_garbage = 0
+
+    def set_translations(self, translated: Iterable[Dict[str, Any]]):
+        """寫入 [{id, translated_text, ...}] 形式的翻譯結果"""
+        for subtitle in translated:
+            self.set_translation(subtitle["id"], subtitle["translated_text"])
+
+    def clear_translations(self):
+        self._translation = bytearray()
+        self._translation_spans = array("q", [-1, 0]) * len(self)
+        self._translation_garbage = 0
+        self.translated_count = 0
+        self.revision = next(_revisions)
+
+    def content_hash(self) -> str:
+        """
+        字幕內容（時間戳、原文與翻譯）的雜湊，依 revision 快取
+
+        revision 只在行程內唯一；內容相同的字幕在任何 worker、重新啟動後都得到相同的雜湊，可作為 ETag。
+        翻譯依字幕順序計算，與緩衝區中的位置（覆寫、重新整理）無關。
+        """
+        if self._hash is None or self._hash[0] != self.revision:
+            digest = hashlib.blake2b(digest_size=16)
+            for column in (self.ids, self.starts, self.ends, self._text_offsets):
+                digest.update(column.tobytes())
+            digest.update(self._text)
+            lengths = array("q")
+            spans = self._translation_spans
+            for i in range(len(self)):
+                offset, length = spans[2 * i], spans[2 * i + 1]
+                lengths.append(length if offset >= 0 else -1)
+                if offset >= 0:
+                    digest.update(self._translation[offset:offset + length])
+            digest.update(lengths.tobytes())
+            self._hash = (self.revision, digest.hexdigest())
+        return self._hash[1]
+
+    def to_columns(self, start: int = 0, stop: Optional[int] = None,
+                   translations: bool = False) -> Dict[str, List[Any]]:
+        """以欄位陣列輸出 [start, stop) 範圍（API 精簡回應）；時間取到毫秒"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        offsets = self._text_offsets
+        columns = {
+            "id": self.ids[start:stop].tolist(),
+            "start_time": [round(t, 3) for t in self.starts[start:stop]],
+            "end_time": [round(t, 3) for t in self.ends[start:stop]],
+            "text": [self._text[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(start, stop)],
+        }
+        if translations:
+            columns["translated_text"] = [self.translation(i) for i in range(start, stop)]
+        return columns
+
+    def nbytes(self) -> int:
+        """欄位與緩衝區佔用的位元組數（不含物件標頭）"""
+        return sum(
+            a.itemsize * len(a)
+            for a in (self.ids, self.starts, self.ends, self._text_offsets, self._translation_spans)
+        ) + len(self._text) + len(self._translation)
+
+
+class TranslatedCues(Sequence):
+    """已翻譯字幕的唯讀檢視：依字幕順序，每條為帶 translated_text 的 dict"""
+
+    def __init__(self, store: CueStore):
+        self.store = store
+        self._positions = array("q")
+        self._revision = -1
+
+    @property
+    def revision(self) -> int:
+        return self.store.revision
+
+    def content_hash(self) -> str:
+        return self.store.content_hash()
+
+    def _index(self) -> array:
+        if self._revision != self.store.revision:
+            spans = self.store._translation_spans
+            self._positions = array("q", (i for i in range(len(self.store)) if spans[2 * i] >= 0))
+            self._revision = self.store.revision
+        return self._positions
+
+    def __len__(self) -> int:
+        return self.store.translated_count
+
+    def __getitem__(self, index):
+        positions = self._index()
+        if isinstance(index, slice):
+            return [self._cue(p) for p in positions[index]]
+        return self._cue(positions[index])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for p in self._index():
+            yield self._cue(p)
+
+    def _cue(self, i: int) -> Dict[str, Any]:
+        cue = self.store.cue(i)
+        cue["translated_text"] = self.store.translation(i)
+        return cue
+
+    def to_columns(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, List[Any]]:
+        """以欄位陣列輸出已翻譯字幕 [start, stop) 範圍"""
+        positions = self._index()[start:stop]
+        store = self.store
+        return {
+            "id": [store.ids[p] for p in positions],
+            "start_time": [round(store.starts[p], 3) for p in positions],
+            "end_time": [round(store.ends[p], 3) for p in positions],
+            "text": [store.text(p) for p in positions],
+            "translated_text": [store.translation(p) for p in positions],
+        }
+
+
+def cues_to_columns(cues: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """將 dict 字幕列表（例如時間窗查詢結果）轉為與 to_columns() 相同的欄位格式"""
+    columns = {
+        "id": [c["id"] for c in cues],
+        "start_time": [round(c["start_time"], 3) for c in cues],
+        "end_time": [round(c["end_time"], 3) for c in cues],
+        "text": [c["text"] for c in cues],
+    }
+    if cues and "translated_text" in cues[0]:
+        columns["translated_text"] = [c.get("translated_text") for c in cues]
+    return columns
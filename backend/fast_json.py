@@ -0,0 +1,103 @@
+"""
+快速 JSON 序列化 - 已安裝 orjson 時使用，否則退回標準 json 模組
+
+- dumps / dumps_text：API 回應與 WebSocket 推送共用的序列化函式（輸出皆為不跳脫非 ASCII 的精簡 JSON）；loads 反序列化
+- FastJSONResponse：作為 FastAPI 的預設回應類別
+- EncodedResponseCache：依內容 revision 快取已序列化的回應，內容未變時重複請求不再序列化
+"""
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # 選用依賴
+    orjson = None
+
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# 回應快取預設上限：64MB
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any) -> bytes:
+        """序列化為 UTF-8 JSON 位元組"""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+
+    def dumps_text(obj: Any) -> str:
+        """序列化為 JSON 字串（WebSocket 文字訊框）"""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        """序列化為 UTF-8 JSON 位元組"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps_text(obj: Any) -> str:
+        """序列化為 JSON 字串（WebSocket 文字訊框）"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """以 dumps 序列化的 JSONResponse"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedResponseCache:
+    """
+    已序列化回應的 LRU 快取
+
+    每個鍵只保留一個 revision 的內容：revision 不同即視為失效並在下次 put 時取代。
+    總大小超過 max_bytes 時淘汰最久未使用的項目。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, bytes]]" = OrderedDict()
+
+    def get(self, key: Hashable, revision: Any) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != revision:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, revision: Any, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        self.discard(key)
+        self._entries[key] = (revision, body)
+        self.used_bytes += len(body)
+        while self.used_bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.used_bytes -= len(evicted)
+
+    def discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.used_bytes -= len(entry[1])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": BACKEND,
+            "entries": len(self._entries),
+            "used_bytes": self.used_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,151 @@
+"""
+增量轉錄 - 重新上傳剪輯過的影片時，沿用舊版本未變動區段的字幕，只轉錄變動的區段
+
+以 audio_fingerprint.align 的對齊結果規劃：
+- 完整落在對齊區段內的舊字幕平移時間戳後直接沿用（連同既有翻譯）
+- 跨越區段邊界的舊字幕不沿用，其時間併入變動區段重新轉錄，避免切斷語句
+- 其餘未涵蓋的時間即為變動區段，只有這些區段會呼叫 Whisper API
+"""
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from audio_fingerprint import align, load_fingerprints, shared_ratio
+
+
+logger = logging.getLogger(__name__)
+
+MIN_SHARED_RATIO = 0.05       # 完全相同的子指紋比例低於此值時不視為同一內容（不相關音訊約 1%）
+MIN_MATCHED_RATIO = 0.3       # 對齊區段至少需涵蓋新版本的比例，否則直接完整轉錄
+MIN_CHANGED_SECONDS = 0.5     # 短於此長度的未涵蓋時間（剪輯點的空隙）不送出轉錄
+
+
+def find_source(fingerprint_path: str,
+                candidates: Dict[Any, str]) -> Optional[Tuple[Any, List[Dict[str, float]], float]]:
+    """
+    在已轉錄的舊版本中尋找與新版本同一內容者並對齊
+
+    Args:
+        fingerprint_path: 新版本的子指紋檔案
+        candidates: {來源鍵: 子指紋檔案路徑}
+
+    Returns:
+        (來源鍵, 對齊區段, 新版本長度秒數)；沒有足夠相符的來源時回傳 None
+    """
+    new, hop_seconds, duration = load_fingerprints(fingerprint_path)
+    best_key, best_ratio, best_hashes = None, MIN_SHARED_RATIO, None
+    for key, path in candidates.items():
+        try:
+            old, old_hop, _ = load_fingerprints(path)
+        except (OSError, ValueError, KeyError):
+            continue
+        if abs(old_hop - hop_seconds) > 1e-6:
+            continue
+        ratio = shared_ratio(old, new)
+        if ratio >= best_ratio:
+            best_key, best_ratio, best_hashes = key, ratio, old
+    if best_hashes is None:
+        return None
+
+    segments = align(best_hashes, new, hop_seconds)
+    matched = sum(seg["end"] - seg["start"] for seg in segments)
+    if not duration or matched / duration < MIN_MATCHED_RATIO:
+        logger.info("來源 %s 相符比例不足（%.0f%%），改為完整轉錄", best_key, 100 * matched / max(duration, 1e-9))
+        return None
+    return best_key, segments, duration
+
+
+def plan_reuse(segments: List[Dict[str, float]], subtitles: List[Dict[str, Any]],
+               translated_subtitles: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+    """
+    依對齊區段規劃沿用的字幕與需要重新轉錄的變動區段
+
+    Returns:
+        {
+            reused: 沿用的字幕（新版時間，依時間排序；有翻譯者帶 translated_text）,
+            changed: 變動區段 [(start, end), ...],
+            reused_seconds, changed_seconds
+        }
+    """
+    translations = {t["id"]: t["translated_text"] for t in translated_subtitles if "translated_text" in t}
+    ordered = sorted(subtitles, key=lambda s: s["start_time"])
+    reused = []
+    covered = []
+    for segment in segments:
+        shift = segment["offset"]
+        lo, hi = segment["start"], segment["end"]
+        old_lo, old_hi = lo + shift, hi + shift
+        inside = []
+        for cue in ordered:
+            if cue["end_time"] <= old_lo or cue["start_time"] >= old_hi:
+                continue
+            if cue["start_time"] < old_lo:
+                lo = max(lo, cue["end_time"] - shift)
+            elif cue["end_time"] > old_hi:
+                hi = min(hi, cue["start_time"] - shift)
+            else:
+                inside.append(cue)
+        if lo >= hi:
+            continue
+        covered.append((lo, hi))
+        for cue in inside:
+            start, end = cue["start_time"] - shift, cue["end_time"] - shift
+            if start < lo or end > hi:
+                continue
+            item = {"start_time": start, "end_time": end, "text": cue["text"]}
+            if cue["id"] in translations:
+                item["translated_text"] = translations[cue["id"]]
+            reused.append(item)
+
+    changed = []
+    cursor = 0.0
+    for lo, hi in sorted(covered) + [(duration, duration)]:
+        if lo - cursor >= MIN_CHANGED_SECONDS:
+            changed.append((cursor, lo))
+        cursor = max(cursor, hi)
+
+    reused.sort(key=lambda s: s["start_time"])
+    return {
+        "reused": reused,
+        "changed": changed,
+        "reused_seconds": sum(hi - lo for lo, hi in covered),
+        "changed_seconds": sum(hi - lo for lo, hi in changed),
+    }
+
+
+def iter_incremental(client, audio_path: str,
+                     plan: Dict[str, Any]) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    依時間順序產生字幕批次：沿用的字幕直接產生，變動區段逐段呼叫 Whisper API
+
+    Yields:
+        (字幕列表, 沿用字幕中已有的翻譯)；id 依時間連續編號，與完整轉錄的結果格式相同
+    """
+    reused = plan["reused"]
+    position = 0
+    next_id = 1
+
+    def take_reused(until: float):
+        nonlocal position, next_id
+        subtitles, translations = [], []
+        while position < len(reused) and reused[position]["start_time"] < until:
+            cue = reused[position]
+            subtitle = {"id": next_id, "start_time": cue["start_time"],
+                        "end_time": cue["end_time"], "text": cue["text"]}
+            subtitles.append(subtitle)
+            if "translated_text" in cue:
+                translations.append({**subtitle, "translated_text": cue["translated_text"]})
+            position += 1
+            next_id += 1
+        return subtitles, translations
+
+    for start, end in plan["changed"]:
+        batch = take_reused(start)
+        if batch[0]:
+            yield batch
+        for subtitles in client.transcribe_audio_range(audio_path, start, end, next_id):
+            next_id += len(subtitles)
+            yield subtitles, []
+
+    batch = take_reused(float("inf"))
+    if batch[0]:
+        yield batch
@@ -0,0 +1,192 @@
+"""
+准入控制壓力測試 - 同時送出大量轉錄任務，比較不設限與准入控制下的任務延遲
+
+每個情境使用新的共用狀態資料庫（單一 worker），預先寫入指向同一個合成 WAV 的影片，
+不需要 FFmpeg；轉錄請求送往本地 mock OpenAI 伺服器（延遲隨音訊長度增加，可設定速率限制）。
+一次送出 --jobs 個 POST /transcribe/{id}/tracks，量測：
+- 接受與被拒絕（429）的任務數、Retry-After
+- 已接受任務從送出到完成的延遲分佈與失敗數
+- 對外 API 准入池的最大佇列深度
+
+不設限時所有任務同時進行、彼此拖慢，每個任務的延遲都接近全部完成的時間；
+准入控制下超出佇列的任務立即收到 429，已接受任務的延遲維持在上限內。
+
+使用方式：
+    python loadtest_admission.py --jobs 40 --api-concurrency 4 --api-queue 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmark import BACKEND_DIR, free_port, percentile, wait_ready
+from cluster import ClusterState
+
+
+def make_wav(path: Path, seconds: float, sample_rate: int = 8000):
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+
+
+def seed(db_path: str, audio_path: Path, jobs: int) -> List[str]:
+    """建立尚未轉錄的合成影片（共用同一個 WAV）"""
+    cluster = ClusterState(db_path, "loadtest")
+    video_ids = []
+    for n in range(jobs):
+        video_id = f"admit{n:04d}"
+        cluster.save_video(video_id, {
+            "video_path": f"/nonexistent/{video_id}.mp4",
+            "audio_path": str(audio_path),
+            "filename": f"{video_id}.mp4",
+            "media_info": {"tracks": []},
+            "tracks": {},
+            "transcription_status": "pending",
+        })
+        video_ids.append(video_id)
+    return video_ids
+
+
+async def run_job(client: httpx.AsyncClient, base_url: str, video_id: str, timeout: float) -> Dict[str, Any]:
+    """送出轉錄任務並等待完成"""
+    start = time.perf_counter()
+    response = await client.post(f"{base_url}/transcribe/{video_id}/tracks", params={"incremental": "false"})
+    if response.status_code == 429:
+        return {"status": "rejected", "retry_after": int(response.headers["Retry-After"])}
+    response.raise_for_status()
+    while time.perf_counter() - start < timeout:
+        await asyncio.sleep(0.2)
+        tracks = (await client.get(f"{base_url}/tracks/{video_id}")).json()["tracks"]
+        status = tracks[0]["transcription_status"]
+        if status in ("completed", "failed"):
+            return {"status": status, "seconds": time.perf_counter() - start}
+    return {"status": "timeout"}
+
+
+async def poll_admission(client: httpx.AsyncClient, base_url: str, peaks: Dict[str, int], stop: asyncio.Event):
+    while not stop.is_set():
+        stats = (await client.get(f"{base_url}/admission/stats")).json()
+        for name, pool in stats.items():
+            peaks[name] = max(peaks.get(name, 0), pool["waiting"])
+        await asyncio.sleep(0.1)
+
+
+async def run_scenario(name: str, admission_env: Dict[str, str], mock_url: str, args) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix=f"loadtest-admission-{name}-"))
+    audio_path = workdir / "audio.wav"
+    make_wav(audio_path, args.audio_seconds)
+    db_path = str(workdir / "cluster_state.db")
+    video_ids = seed(db_path, audio_path, args.jobs)
+
+    port = free_port()
+    env = {
+        **os.environ,
+        **admission_env,
+        "WORKERS": "1",
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "CLUSTER_DB": db_path,
+        "SEARCH_DB": str(workdir / "search_index.db"),
+        "OPENAI_API_KEY": "mock-key",
+        "OPENAI_BASE_URL": mock_url,
+        "STORAGE_DROP_AUDIO": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "main.py")], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL if not args.verbose else None,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(f"{base_url}/ready", timeout=60.0)
+        peaks: Dict[str, int] = {}
+        stop = asyncio.Event()
+        limits = httpx.Limits(max_connections=args.jobs + 4)
+        async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+            poller = asyncio.create_task(poll_admission(client, base_url, peaks, stop))
+            start = time.perf_counter()
+            results = await asyncio.gather(*(run_job(client, base_url, video_id, args.timeout)
+                                             for video_id in video_ids))
+            wall = time.perf_counter() - start
+            stop.set()
+            await poller
+            admission = (await client.get(f"{base_url}/admission/stats")).json()
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    seconds = [r["seconds"] for r in results if r["status"] == "completed"]
+    retry_after = [r["retry_after"] for r in results if r["status"] == "rejected"]
+    return {
+        "scenario": name,
+        "submitted": len(results),
+        "completed": len(seconds),
+        "rejected": len(retry_after),
+        "failed": sum(1 for r in results if r["status"] in ("failed", "timeout")),
+        "job_seconds": {
+            "p50": round(percentile(seconds, 50), 2) if seconds else None,
+            "p95": round(percentile(seconds, 95), 2) if seconds else None,
+            "max": round(max(seconds), 2) if seconds else None,
+        },
+        "retry_after_median": statistics.median(retry_after) if retry_after else None,
+        "wall_seconds": round(wall, 2),
+        "peak_waiting": peaks,
+        "api_pool": admission["api"],
+    }
+
+
+async def main(args):
+    mock_port = free_port()
+    mock = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "mock_openai_server.py"), "--port", str(mock_port),
+         "--latency", "0.05", "--transcription-seconds-per-minute", str(args.seconds_per_minute),
+         "--rate-limit", str(args.upstream_rate_limit)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    mock_url = f"http://127.0.0.1:{mock_port}/v1"
+    try:
+        await wait_ready(f"http://127.0.0.1:{mock_port}/mock/stats")
+        unbounded = str(args.jobs * 100)
+        scenarios = [
+            await run_scenario("unbounded", {
+                "ADMISSION_API_CONCURRENCY": unbounded, "ADMISSION_API_QUEUE": unbounded,
+            }, mock_url, args),
+            await run_scenario("admission", {
+                "ADMISSION_API_CONCURRENCY": str(args.api_concurrency),
+                "ADMISSION_API_QUEUE": str(args.api_queue),
+            }, mock_url, args),
+        ]
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    print(json.dumps({"config": vars(args), "scenarios": scenarios}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="准入控制壓力測試")
+    parser.add_argument("--jobs", type=int, default=40, help="同時送出的轉錄任務數")
+    parser.add_argument("--audio-seconds", type=float, default=1200.0, help="每個任務的音訊長度（300 秒一個時間窗）")
+    parser.add_argument("--seconds-per-minute", type=float, default=0.3, help="mock 轉錄延遲（每分鐘音訊秒數）")
+    parser.add_argument("--upstream-rate-limit", type=float, default=0.0, help="mock 每秒請求數上限（0 = 不限制）")
+    parser.add_argument("--api-concurrency", type=int, default=4)
+    parser.add_argument("--api-queue", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=600.0, help="單一任務等待完成的秒數")
+    parser.add_argument("--verbose", action="store_true", help="顯示後端輸出")
+    asyncio.run(main(parser.parse_args()))
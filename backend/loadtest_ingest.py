@@ -0,0 +1,129 @@
+"""
+多路串流接收壓力測試 - 合成音訊 + 本地 mock Realtime 伺服器
+
+使用方式：
+    python loadtest_ingest.py --streams 300 --seconds 20 --speed 1.0
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import struct
+import time
+
+import uvicorn
+
+from mock_openai_server import MockConfig, create_app
+from realtime_client import RealtimeTranscriptionClient
+from stream_ingest import StreamIngestService, TCP_READ_SIZE
+
+
+def synthetic_pcm(seconds: float, sample_rate: int = 24000, freq: float = 220.0) -> bytes:
+    """產生 16-bit mono 正弦波 PCM"""
+    total = int(seconds * sample_rate)
+    step = 2 * math.pi * freq / sample_rate
+    return struct.pack(f"<{total}h", *(int(8000 * math.sin(i * step)) for i in range(total)))
+
+
+async def run_client(host: str, port: int, stream_id: str, pcm: bytes, speed: float, sample_rate: int) -> dict:
+    """模擬一個 TCP 音訊來源，以 speed 倍速即時發送"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"{stream_id}\n".encode("utf-8"))
+    await writer.drain()
+    reply = (await reader.readline()).decode("utf-8").strip()
+    if reply != "OK":
+        writer.close()
+        return {"stream_id": stream_id, "accepted": False}
+
+    chunk_seconds = TCP_READ_SIZE / 2 / sample_rate
+    start = time.perf_counter()
+    for offset in range(0, len(pcm), TCP_READ_SIZE):
+        writer.write(pcm[offset:offset + TCP_READ_SIZE])
+        await writer.drain()
+        # 依照即時速率發送
+        target = start + (offset // TCP_READ_SIZE + 1) * chunk_seconds / speed
+        delay = target - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    writer.close()
+    return {"stream_id": stream_id, "accepted": True, "send_seconds": time.perf_counter() - start}
+
+
+async def main(args):
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+
+    # 啟動 mock Realtime 伺服器
+    mock_app = create_app(MockConfig(latency=args.latency, segment_seconds=args.segment_seconds))
+    mock_server = uvicorn.Server(uvicorn.Config(mock_app, host="127.0.0.1", port=args.mock_port, log_level="warning"))
+    mock_task = asyncio.create_task(mock_server.serve())
+    while not mock_server.started:
+        await asyncio.sleep(0.05)
+
+    realtime_url = f"ws://127.0.0.1:{args.mock_port}/v1/realtime"
+    first_subtitle_at = {}
+
+    def on_subtitle(stream_id, subtitle):
+        first_subtitle_at.setdefault(stream_id, time.perf_counter())
+
+    service = StreamIngestService(
+        max_streams=args.max_streams,
+        max_sessions=args.max_sessions,
+        queue_size=args.queue_size,
+        client_factory=lambda: RealtimeTranscriptionClient(realtime_url=realtime_url),
+        on_subtitle=on_subtitle,
+    )
+    server = await service.start_tcp_server("127.0.0.1", 0)
+    tcp_port = server.sockets[0].getsockname()[1]
+
+    pcm = synthetic_pcm(args.seconds)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_client("127.0.0.1", tcp_port, f"stream-{i}", pcm, args.speed, 24000)
+        for i in range(args.streams)
+    ))
+    send_done = time.perf_counter()
+    for stream in list(service.streams.values()):
+        await service.close_stream(stream.stream_id, wait=True)
+    elapsed = time.perf_counter() - start
+
+    await service.shutdown()
+    mock_server.should_exit = True
+    await mock_task
+
+    stats = service.stats()
+    accepted = sum(1 for r in results if r["accepted"])
+    first_latencies = sorted(t - start for t in first_subtitle_at.values())
+    report = {
+        "streams": args.streams,
+        "accepted_streams": accepted,
+        "audio_seconds_per_stream": args.seconds,
+        "speed": args.speed,
+        "wall_seconds": round(elapsed, 3),
+        "send_seconds": round(send_done - start, 3),
+        "drain_seconds": round(elapsed - (send_done - start), 3),
+        "realtime_factor": round(accepted * args.seconds / elapsed, 2),
+        "received_chunks": stats["received_chunks"],
+        "dropped_chunks": stats["dropped_chunks"],
+        "drop_ratio": round(stats["dropped_chunks"] / max(1, stats["received_chunks"]), 4),
+        "subtitles": stats["subtitles"],
+        "rejected_streams": stats["rejected_streams"],
+        "first_subtitle_p50": round(first_latencies[len(first_latencies) // 2], 3) if first_latencies else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多路串流接收壓力測試")
+    parser.add_argument("--streams", type=int, default=100, help="同時串流數")
+    parser.add_argument("--seconds", type=float, default=10.0, help="每個串流的音訊長度（秒）")
+    parser.add_argument("--speed", type=float, default=1.0, help="發送倍速（1.0 = 即時）")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock 伺服器轉錄延遲（秒）")
+    parser.add_argument("--segment-seconds", type=float, default=3.0)
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--max-streams", type=int, default=500)
+    parser.add_argument("--max-sessions", type=int, default=200)
+    parser.add_argument("--queue-size", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,172 @@
+"""
+多 worker 擴展壓力測試 - 以不同 worker 數啟動後端，量測字幕查詢吞吐量是否隨 worker 數成長
+
+每個情境使用新的共用狀態資料庫，預先寫入合成影片與字幕（含翻譯），不需要 FFmpeg 或 OpenAI。
+請求混合時間窗查詢（隨機時間窗，大多無法命中回應快取）、時間點查詢與整份字幕（可命中快取），
+由多個客戶端行程同時送出，避免壓力來源本身成為瓶頸。
+
+使用方式：
+    python loadtest_workers.py --workers 1,2,4 --videos 20 --subtitles 3000 --seconds 15
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmark import BACKEND_DIR, free_port, peak_rss_mb, summarize, wait_ready
+from bench_ws_frames import synthetic_subtitles
+from cluster import ClusterState
+
+
+def seed(db_path: str, videos: int, subtitles: int) -> list:
+    """在共用狀態中建立已轉錄完成的合成影片"""
+    cluster = ClusterState(db_path, "loadtest")
+    video_ids = []
+    for n in range(videos):
+        video_id = f"load{n:04d}"
+        cluster.save_video(video_id, {
+            "video_path": f"/nonexistent/{video_id}.mp4",
+            "audio_path": f"/nonexistent/{video_id}.wav",
+            "filename": f"{video_id}.mp4",
+            "media_info": {"tracks": []},
+            "tracks": {},
+            "transcription_status": "completed",
+        })
+        cues = synthetic_subtitles(subtitles)
+        for cue in cues:
+            cue["translated_text"] = "翻譯 " + cue["text"]
+        cluster.add_cues(video_id, 0, cues)
+        video_ids.append(video_id)
+    return video_ids
+
+
+async def drive(base_url: str, video_ids: list, duration: float, concurrency: int,
+                max_time: float, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    samples, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    def next_path() -> str:
+        video_id = rng.choice(video_ids)
+        roll = rng.random()
+        if roll < 0.6:
+            start = rng.uniform(0, max_time)
+            return f"/subtitles/{video_id}?from={start:.2f}&to={start + 60:.2f}&language=traditional"
+        if roll < 0.9:
+            return f"/subtitles/{video_id}/at?t={rng.uniform(0, max_time):.2f}"
+        return f"/subtitles/{video_id}?encoding=compact"
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(base_url + next_path())
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return {"samples": samples, "errors": errors}
+
+
+def client_process(args_tuple):
+    return asyncio.run(drive(*args_tuple))
+
+
+async def run_scenario(workers: int, args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix=f"loadtest-w{workers}-"))
+    db_path = str(workdir / "cluster_state.db")
+    video_ids = seed(db_path, args.videos, args.subtitles)
+    max_time = args.subtitles * 3.0
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "WORKERS": str(workers),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "CLUSTER_DB": db_path,
+        "SEARCH_DB": str(workdir / "search_index.db"),
+        "OPENAI_API_KEY": "mock-key",
+        "LOG_LEVEL": "WARNING",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "main.py")], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL if not args.verbose else None,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(f"{base_url}/openapi.json", timeout=60.0)
+        # 暖機：讓每個 worker 都載入過影片與字幕
+        await asyncio.get_running_loop().run_in_executor(
+            None, client_process, (base_url, video_ids, args.warmup, args.concurrency, max_time, 0)
+        )
+
+        per_process = max(1, args.concurrency // args.client_processes)
+        jobs = [(base_url, video_ids, args.seconds, per_process, max_time, i + 1)
+                for i in range(args.client_processes)]
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.client_processes) as pool:
+            results = pool.map(client_process, jobs)
+        wall = time.perf_counter() - start
+
+        samples = [s for r in results for s in r["samples"]]
+        summary = summarize(samples, sum(r["errors"] for r in results), wall)
+        summary["workers"] = workers
+        summary["supervisor_peak_rss_mb"] = peak_rss_mb(proc.pid)
+        return summary
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def main(args):
+    counts = [int(x) for x in args.workers.split(",") if x]
+    scenarios = []
+    for workers in counts:
+        print(f"情境: {workers} 個 worker", file=sys.stderr)
+        scenarios.append(await run_scenario(workers, args))
+
+    baseline = scenarios[0]["throughput_rps"] or None
+    for scenario in scenarios:
+        if baseline:
+            scenario["speedup"] = round(scenario["throughput_rps"] / baseline, 2)
+    print(json.dumps({
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "scenarios": scenarios,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多 worker 擴展壓力測試")
+    parser.add_argument("--workers", default="1,2,4", help="worker 數（逗號分隔）")
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--subtitles", type=int, default=3000, help="每部影片的字幕數")
+    parser.add_argument("--seconds", type=float, default=15.0, help="每個情境的量測時間")
+    parser.add_argument("--warmup", type=float, default=3.0, help="暖機時間")
+    parser.add_argument("--concurrency", type=int, default=64, help="同時進行的請求數")
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="客戶端行程數")
+    parser.add_argument("--verbose", action="store_true", help="顯示後端輸出")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,166 @@
+"""
+結構化日誌 - 分級、取樣與非阻塞的佇列式輸出
+
+- 各模組以 logging.getLogger(__name__) 取得 logger，訊息使用 %-格式延遲參數，
+  等級未啟用時不做任何字串格式化
+- 輸出經由 QueueHandler 放入有界佇列，由背景執行緒（QueueListener）格式化並寫入，
+  呼叫端不會阻塞在 stdout/檔案寫入上；佇列滿時丟棄並計數
+- 每個 chunk / 每條字幕這類高頻事件以 Sampler 取樣，只記錄每 N 筆中的一筆
+- LOG_FORMAT=json 時每行輸出一個 JSON 物件，extra 欄位（video_id、stream_id …）一併輸出
+
+環境變數：
+    LOG_LEVEL        日誌等級（預設 INFO）
+    LOG_FORMAT       text 或 json（預設 text）
+    LOG_SAMPLE_EVERY 高頻事件取樣間隔（預設 50，1 = 全部記錄）
+"""
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional
+
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_SAMPLE_EVERY = 50
+
+# LogRecord 的內建屬性，其餘屬性視為結構化欄位（來自 extra=）
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def sample_every() -> int:
+    try:
+        return max(1, int(os.getenv("LOG_SAMPLE_EVERY", DEFAULT_SAMPLE_EVERY)))
+    except ValueError:
+        return DEFAULT_SAMPLE_EVERY
+
+
+class Sampler:
+    """
+    計數式取樣：每 every 次呼叫回傳一次 True（第一次必定為 True）
+
+    用法：
+        if logger.isEnabledFor(logging.DEBUG) and sampler():
+            logger.debug("發送進度 %d chunks", chunks)
+    先檢查等級，等級未啟用時連計數都省略。
+    """
+
+    __slots__ = ("every", "_counter")
+
+    def __init__(self, every: Optional[int] = None):
+        self.every = every or sample_every()
+        self._counter = itertools.count()  # next() 在 CPython 中為原子操作
+
+    def __call__(self) -> bool:
+        return next(self._counter) % self.every == 0
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+class JsonFormatter(logging.Formatter):
+    """每筆日誌輸出為單行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update(_extra_fields(record))
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """人類可讀格式，extra 欄位以 key=value 附加在訊息後"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    不在呼叫端格式化的 QueueHandler
+
+    標準 QueueHandler.prepare() 會在呼叫端執行緒格式化訊息；這裡直接傳遞
+    LogRecord，格式化與寫入都交給 QueueListener 的背景執行緒。佇列滿時丟棄。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      stream=None, queue_size: int = DEFAULT_QUEUE_SIZE):
+    """
+    設定根 logger：有界佇列 + 背景輸出執行緒（可重複呼叫，只會設定一次）
+
+    Args:
+        level: 日誌等級，預設讀取 LOG_LEVEL
+        fmt: text 或 json，預設讀取 LOG_FORMAT
+        stream: 輸出目標，預設 stderr
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """停止背景輸出執行緒，寫出佇列中剩餘的日誌"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+
+
+def dropped_records() -> int:
+    """因佇列已滿而丟棄的日誌筆數"""
+    return _queue_handler.dropped if _queue_handler else 0
@@ -1,21 +1,75 @@
 """
 FastAPI 主程式 - 影片即時字幕生成服務
 """
-from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
+import logging
 import os
 import uuid
+import mimetypes
 import asyncio
+import contextlib
+import functools
+import time
 from pathlib import Path
-from typing import Dict, Optional
+from urllib.parse import quote
+from typing import Dict, List, Optional, Tuple
 
-from audio_extractor import extract_audio
-from whisper_client import WhisperTranscriptionClient
-from translator import translate_to_traditional_chinese
-from note_generator import generate_bilingual_notes
+from audio_extractor import probe_media, extract_audio_renditions, WHISPER_SEGMENT_SECONDS
+from stream_ingest import StreamFailedError, StreamIngestService, StreamLimitError
+from subtitle_hub import SubtitleHub
+from video_streaming import range_file_response, remux_faststart, segment_hls, HLS_PLAYLIST, REMUX_MODES
+from subtitle_index import drop_index, get_index
+from search_index import SearchIndex, KIND_TEXT, KIND_TRANSLATED
+from subtitle_frames import (
+    FrameBatcher, encode_frames, encode_translation_frames, ENCODINGS, ENCODING_JSON, ENCODING_COMPACT
+)
+from translation_pipeline import TranslationPipeline
+from subtitle_export import build_srt
+from storage import StorageManager, delete_paths, parse_size
+from cue_store import CueStore, TranslatedCues, cues_to_columns
+from result_cache import ResultCache
+from model_router import TASK_NOTES, TASK_TRANSCRIBE, TASK_TRANSLATE, get_router
+from admission import (
+    AdmissionController, AdmissionRejected, Ticket, UploadAdmissionMiddleware, POOL_API, POOL_EXTRACT, POOL_UPLOAD
+)
+from cluster import (
+    ClusterState, SharedVideos, resolve_workers,
+    LEASE_SECONDS, POLL_SECONDS, TRANSIENT_EVENT_SECONDS, EVENT_MESSAGE, EVENT_RESET, EVENT_CLOSE
+)
+import fast_json
+import tracing
+from logging_setup import configure_logging, shutdown_logging
+# whisper_client / translator / note_generator（openai）與 waveform / audio_fingerprint / incremental（numpy）
+# 在第一次使用處才載入，縮短冷啟動時間
+
+logger = logging.getLogger(__name__)
+
+# 預設回應類別：已安裝 orjson 時以其序列化
+app = FastAPI(title="Video Subtitle API", default_response_class=fast_json.FastJSONResponse)
+
+
+
+def admission_response(e: AdmissionRejected) -> Response:
+    return fast_json.FastJSONResponse(
+        {"detail": str(e), "pool": e.pool, "reason": e.reason, "retry_after": e.retry_after},
+        status_code=429, headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+# 准入控制：上傳 I/O、音訊提取（FFmpeg / CPU）與對外 API 呼叫各自的並行上限與有界等待佇列
+# （ADMISSION_<POOL>_CONCURRENCY / _QUEUE / _MAX_WAIT），無法在時限內處理的請求回傳 429 + Retry-After。
+# 上傳在接收本文之前就先取得名額；中介層加在 CORS 之前，429 回應同樣帶有 CORS 標頭
+admission = AdmissionController.from_env()
+app.add_middleware(UploadAdmissionMiddleware, pool=admission.pools[POOL_UPLOAD], paths={"/upload"},
+                   on_reject=admission_response, precheck=[admission.pools[POOL_EXTRACT]])
+
+
+@app.exception_handler(AdmissionRejected)
+async def handle_admission_rejected(request: Request, e: AdmissionRejected):
+    return admission_response(e)
 
-app = FastAPI(title="Video Subtitle API")
 
 # CORS 設定
 app.add_middleware(
@@ -26,183 +80,1258 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 建立必要的目錄
+# 資料目錄（啟動時建立，匯入本模組不做磁碟 I/O）
 UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
 AUDIO_DIR = Path("audio_cache")
-AUDIO_DIR.mkdir(exist_ok=True)
+STREAM_DIR = Path("stream_cache")
+
+# 儲存空間管理：各目錄以影片 id 分片子目錄，依 STORAGE_<NAME>_QUOTA / STORAGE_<NAME>_TTL 淘汰
+storage = StorageManager.from_env({"uploads": UPLOAD_DIR, "audio": AUDIO_DIR, "stream": STREAM_DIR})
+storage_wakeup = asyncio.Event()
+storage.on_release = storage_wakeup.set
+STORAGE_SWEEP_SECONDS = 60
+# 轉錄完成後刪除 WAV 與 Whisper 分段（需要時再由原始影片重新提取）；設為 0 則保留
+STORAGE_DROP_AUDIO = os.getenv("STORAGE_DROP_AUDIO", "1") != "0"
+_audio_locks: Dict[str, asyncio.Lock] = {}
+
+# 上傳後背景重新封裝模式：faststart / hls（未設定則不處理）
+VIDEO_REMUX = os.getenv("VIDEO_REMUX", "")
+
+DEFAULT_TRACK = 0
+
+# 多 worker 部署（WORKERS > 1 時由啟動程式設定 CLUSTER_DB）：影片資料、字幕、任務租約與字幕廣播
+# 透過共用的 SQLite 狀態同步，任一 worker 都能處理任一影片的請求與 WebSocket 連線
+CLUSTER_DB = os.getenv("CLUSTER_DB")
+cluster: Optional[ClusterState] = ClusterState(CLUSTER_DB) if CLUSTER_DB else None
+# 音訊軌的轉錄狀態欄位：本 worker 正在轉錄時以本地為準，不被共用狀態覆蓋
+TRACK_STATE_KEYS = {"transcription_status", "is_transcribing", "incremental",
+                    "fingerprint_path", "audio_path", "audio_renditions"}
+# 本地字幕對應的共用狀態 revision：{(video_id, 音訊軌): revision}
+_cue_revisions: Dict[Tuple[str, int], int] = {}
+
+
+def _encode_video(video_data: dict) -> dict:
+    """影片資料寫入共用狀態的形式（字幕另存於 cues 表）"""
+    record = {key: value for key, value in video_data.items() if key not in ("subtitles", "tracks")}
+    record["tracks"] = {
+        str(track): {key: value for key, value in track_data.items() if key != "subtitles"}
+        for track, track_data in video_data.get("tracks", {}).items()
+    }
+    return record
+
+
+def _load_cue_store(video_id: str, track: int) -> CueStore:
+    """（背景讀取執行緒）由共用狀態重建音訊軌的字幕（含翻譯）"""
+    store = CueStore()
+    translations = []
+    for cue_id, start_time, end_time, text, translated_text in cluster.load_cues(video_id, track):
+        store.append({"id": cue_id, "start_time": start_time, "end_time": end_time, "text": text})
+        if translated_text is not None:
+            translations.append((cue_id, translated_text))
+    for cue_id, translated_text in translations:
+        store.set_translation(cue_id, translated_text)
+    return store
+
+
+def _prepare_video(video_id: str, record: dict, revisions: Dict[int, int]) -> dict:
+    """
+    （背景讀取執行緒）讀取 _refresh_video 需要的共用狀態
+
+    Returns:
+        {"cues": {音訊軌: 字幕 revision 改變（或本地尚無此影片）而重新載入的字幕},
+         "orphaned": {租約已逾時的轉錄中音訊軌}}
+    """
+    reload = video_id not in video_storage
+    tracks = {DEFAULT_TRACK: record}
+    tracks.update({int(track): data for track, data in record.get("tracks", {}).items()})
+    cues, orphaned = {}, set()
+    for track, fields in tracks.items():
+        topic = _track_topic(video_id, track)
+        if topic in transcription_tasks:
+            continue
+        if reload or _cue_revisions.get((video_id, track)) != revisions.get(track, 0):
+            cues[track] = _load_cue_store(video_id, track)
+        # 租約逾時（負責的 worker 中途結束）的轉錄視為未在進行，可重新啟動
+        if fields.get("is_transcribing") and cluster.holder(f"job:{topic}") is None:
+            orphaned.add(track)
+    return {"cues": cues, "orphaned": orphaned}
+
+
+def _refresh_video(video_id: str, local: Optional[dict], record: dict, revisions: Dict[int, int],
+                   prepared: dict) -> dict:
+    """
+    以共用狀態就地更新本地影片資料（SharedVideos 載入其他 worker 建立或更新的影片時呼叫）
+    
+    本 worker 正在轉錄的音訊軌保留本地的字幕與轉錄狀態；字幕 revision 改變的音訊軌換成
+    _prepare_video 已載入的字幕。不查詢資料庫。
+    """
+    tracks = {int(track): data for track, data in record.pop("tracks", {}).items()}
+    if local is None:
+        local = {"tracks": {}}
+    for track in [DEFAULT_TRACK] + sorted(tracks):
+        if track == DEFAULT_TRACK:
+            target, fields = local, record
+        else:
+            target, fields = local["tracks"].setdefault(track, {}), tracks[track]
+        topic = _track_topic(video_id, track)
+        running = topic in transcription_tasks
+        for key in list(target):
+            if key not in fields and key not in ("subtitles", "tracks") and not (running and key in TRACK_STATE_KEYS):
+                del target[key]
+        for key, value in fields.items():
+            if not (running and key in TRACK_STATE_KEYS):
+                target[key] = value
+        if running:
+            continue
+        # 讀取時字幕未改變（不在 cues 中）則保留本地字幕
+        if track in prepared["cues"]:
+            target["subtitles"] = prepared["cues"][track]
+            _cue_revisions[(video_id, track)] = revisions.get(track, 0)
+        if track in prepared["orphaned"]:
+            target["is_transcribing"] = False
+    return local
+
 
 # 儲存影片和轉錄資料
-video_storage: Dict[str, dict] = {}
+# 預設音訊軌的字幕直接存在影片資料中，其餘音訊軌存在 video_storage[id]["tracks"][軌號]
+def _log_cluster_error(error: BaseException):
+    logger.error("共用狀態寫入失敗: %s", error)
+
+
+def _defer_cluster(fn, *args):
+    """將共用狀態寫入交給寫入執行緒（依提交順序執行），失敗時記錄錯誤"""
+    cluster.defer(fn, *args).add_done_callback(
+        lambda future: future.exception() and _log_cluster_error(future.exception())
+    )
+
+
+def _index(fn, *args):
+    """將檢索索引寫入交給索引的寫入執行緒（依提交順序執行），失敗時記錄錯誤"""
+    search_index.defer(fn, *args).add_done_callback(
+        lambda future: future.exception() and logger.error("檢索索引寫入失敗: %s", future.exception())
+    )
+
+
+video_storage: Dict[str, dict] = (
+    SharedVideos(cluster, _refresh_video, _encode_video, prepare=_prepare_video, on_error=_log_cluster_error)
+    if cluster else {}
+)
+
+# 已序列化的 /subtitles 回應，依字幕 revision 快取（RESPONSE_CACHE_BYTES 設定上限，例如 128M）
+subtitle_responses = fast_json.EncodedResponseCache(
+    parse_size(os.getenv("RESPONSE_CACHE_BYTES")) or fast_json.DEFAULT_CACHE_BYTES
+)
+
+# 筆記與翻譯結果，以字幕原文 revision、模型與提示詞版本為鍵（同時的相同請求共用一次計算）
+llm_results = ResultCache(int(os.getenv("RESULT_CACHE_ENTRIES", "256")))
+
+# 全文檢索索引（跨所有影片的字幕、翻譯與筆記）
+search_index = SearchIndex(os.getenv("SEARCH_DB", "search_index.db"))
+
+# 就緒檢查（/ready）的各項狀態：pending / ready / failed: 原因
+# 服務啟動不等待這些工作，負載平衡器與自動擴展應以 /ready 判斷何時導入流量
+readiness: Dict[str, str] = {"storage": "pending", "model_clients": "pending"}
+
+# 字幕廣播中心與背景轉錄任務（以音訊軌的廣播主題為鍵）
+subtitle_hub = SubtitleHub()
+transcription_tasks: Dict[str, asyncio.Task] = {}
+# 已套用的共用廣播事件序號與影片變動序號（stamp）
+_cluster_seq = 0
+_video_stamp = 0
+_cluster_sync_lock = asyncio.Lock()
+
+
+def _relay_to_cluster(kind: str, topic: str, variants: Optional[dict], retain: bool, droppable: bool):
+    """本地發布的轉錄廣播寫入共用事件表（即時串流只在接收的 worker 上推送，不轉送）"""
+    if topic.startswith("ingest:"):
+        return
+    payload = fast_json.dumps_text(variants) if variants is not None else None
+    _defer_cluster(cluster.publish, topic, kind, payload, retain, droppable)
+
+
+if cluster:
+    subtitle_hub.relay = _relay_to_cluster
+    storage.shared = cluster
+
+
+def _persist_video(video_id: str):
+    """多 worker 部署時將本地修改的影片資料寫回共用狀態"""
+    if cluster:
+        video_storage.persist(video_id)
+
+
+def _share_cues(video_id: str, track: int, subtitles: List[dict]):
+    if cluster:
+        video_storage.write(video_id, cluster.add_cues, video_id, track, subtitles)
+
+
+def _share_translations(video_id: str, track: int, translated: List[Tuple[int, str]], replace: bool = False):
+    if cluster:
+        video_storage.write(video_id, cluster.set_translations, video_id, track, translated, replace)
+
+
+async def _video_exists(video_id: str) -> bool:
+    """影片是否存在；多 worker 部署時其他 worker 剛建立、尚未輪詢到的影片在背景執行緒載入"""
+    if video_id in video_storage:
+        return True
+    return cluster is not None and await video_storage.load(video_id)
+
+
+def _fetch_cluster_changes(seq: int, stamp: int, limit: int = 1000):
+    """（背景讀取執行緒）讀取 seq 之後的廣播事件與 stamp 之後其他 worker 建立或更新的影片"""
+    return cluster.poll(seq, limit), video_storage.fetch_changes(stamp)
+
+
+async def sync_cluster():
+    """
+    套用其他 worker 的更新：影片變動就地更新本地副本，尚未套用的廣播事件轉發到本地字幕廣播中心
+
+    資料庫讀取在共用狀態的背景讀取執行緒執行，事件迴圈只套用結果。
+    """
+    global _cluster_seq, _video_stamp
+    async with _cluster_sync_lock:
+        while True:
+            events, (stamp, videos) = await asyncio.wrap_future(
+                cluster.fetch(_fetch_cluster_changes, _cluster_seq, _video_stamp)
+            )
+            _video_stamp = stamp
+            video_storage.apply_remote(videos)
+            for seq, topic, origin, kind, retain, droppable, variants in events:
+                _cluster_seq = seq
+                if origin == cluster.worker_id:
+                    continue
+                if kind == EVENT_MESSAGE:
+                    subtitle_hub.publish_variants(topic, fast_json.loads(variants), retain=retain,
+                                                  droppable=droppable, relay=False)
+                elif kind == EVENT_RESET:
+                    subtitle_hub.reset(topic, relay=False)
+                elif kind == EVENT_CLOSE:
+                    subtitle_hub.close_topic(topic, relay=False)
+            if len(events) < 1000:
+                return
+
+
+async def run_cluster_listener():
+    """
+    輪詢共用狀態的更新，並定期續約本 worker 持有的租約、回報已套用的事件序號、清除不再需要的事件
+
+    續約、回報與清除都在寫入執行緒執行，不阻塞事件迴圈。
+    """
+    next_renew = next_prune = 0.0
+    while True:
+        try:
+            await sync_cluster()
+            now = time.monotonic()
+            if now >= next_renew:
+                for name in await asyncio.wrap_future(cluster.defer(cluster.renew_all)):
+                    logger.warning("租約已被其他 worker 接手: %s", name)
+                _defer_cluster(cluster.ack, _cluster_seq)
+                next_renew = now + LEASE_SECONDS / 3
+            if now >= next_prune:
+                _defer_cluster(cluster.prune_events)
+                next_prune = now + TRANSIENT_EVENT_SECONDS
+        except Exception as e:
+            logger.error("共用狀態同步失敗: %s", e)
+        await asyncio.sleep(POLL_SECONDS)
+
+# 多路即時串流接收服務
+ingest_pipelines: Dict[str, TranslationPipeline] = {}
+
+
+def handle_ingest_subtitle(stream_id: str, subtitle: dict):
+    """即時串流產生字幕：推送給該串流的連線，並視需要送入翻譯管線"""
+    subtitle_hub.publish_variants(f"ingest:{stream_id}", encode_frames([subtitle]))
+    pipeline = ingest_pipelines.get(stream_id)
+    if pipeline:
+        pipeline.submit([subtitle])
+
+
+ingest_service = StreamIngestService(
+    max_streams=int(os.getenv("INGEST_MAX_STREAMS", "500")),
+    max_sessions=int(os.getenv("INGEST_MAX_SESSIONS", "200")),
+    on_subtitle=handle_ingest_subtitle,
+    retain_seconds=float(os.getenv("INGEST_RETAIN_SECONDS", "300")),
+)
+
+
+@app.on_event("startup")
+async def start_logging():
+    """設定結構化日誌（LOG_LEVEL / LOG_FORMAT / LOG_SAMPLE_EVERY）"""
+    configure_logging()
+
+
+@app.on_event("startup")
+async def start_ingest_tcp_server():
+    """若設定 INGEST_TCP_PORT，啟動原始 TCP 串流接收伺服器"""
+    tcp_port = os.getenv("INGEST_TCP_PORT")
+    if tcp_port:
+        # 多 worker 時各 worker 共用同一個埠（SO_REUSEPORT，由核心分配連線）
+        await ingest_service.start_tcp_server(port=int(tcp_port), reuse_port=cluster is not None)
+
+
+@app.on_event("startup")
+async def start_cluster_listener():
+    """多 worker 部署：套用既有的廣播事件（晚啟動的 worker 也有完整快照）並開始輪詢"""
+    if cluster:
+        await sync_cluster()
+        app.state.cluster_listener = asyncio.create_task(run_cluster_listener())
+
+
+@app.on_event("shutdown")
+async def stop_cluster_listener():
+    listener = getattr(app.state, "cluster_listener", None)
+    if listener:
+        listener.cancel()
+        await asyncio.wrap_future(cluster.defer(cluster.release_all))
+        await asyncio.get_event_loop().run_in_executor(None, cluster.close)
+
+
+@app.on_event("startup")
+async def start_storage_sweeper():
+    """啟動背景清理任務（先建立資料目錄並重建儲存帳目，不延遲服務啟動）"""
+    app.state.storage_sweeper = asyncio.create_task(run_storage_sweeper())
+
+
+@app.on_event("shutdown")
+async def stop_storage_sweeper():
+    sweeper = getattr(app.state, "storage_sweeper", None)
+    if sweeper:
+        sweeper.cancel()
+
+
+@app.on_event("shutdown")
+async def close_search_index():
+    """等待尚未完成的檢索索引寫入"""
+    await asyncio.get_event_loop().run_in_executor(None, search_index.close)
+
+
+def _prepare_storage():
+    """建立資料目錄、重建儲存帳目（包含先前執行留下的檔案）並開啟檢索索引"""
+    storage.create_roots()
+    storage.scan()
+    search_index.open()
+
+
+async def run_storage_sweeper():
+    """定期（或被喚醒時）淘汰超過配額、TTL 或已標記可丟棄的項目"""
+    loop = asyncio.get_event_loop()
+    try:
+        await loop.run_in_executor(None, _prepare_storage)
+    except Exception as e:
+        readiness["storage"] = f"failed: {e}"
+        raise
+    readiness["storage"] = "ready"
+    while True:
+        try:
+            await asyncio.wait_for(storage_wakeup.wait(), STORAGE_SWEEP_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        storage_wakeup.clear()
+        if cluster:
+            # 多 worker 部署時只由持有清理租約的 worker 淘汰，並先重新掃描以納入其他 worker 新增的檔案
+            if not await asyncio.wrap_future(cluster.defer(cluster.acquire, "storage-sweeper")):
+                continue
+            await loop.run_in_executor(None, storage.scan)
+            shared_pinned, shared_expendable = await asyncio.wrap_future(cluster.fetch(storage.shared_marks))
+        else:
+            shared_pinned, shared_expendable = set(), set()
+        victims = storage.select_victims(shared_pinned=shared_pinned, shared_expendable=shared_expendable)
+        if not victims:
+            continue
+        # 選出到刪除之間可能有轉錄開始使用這些檔案：持有各影片的音訊鎖直到刪除完成
+        # （ensure_audio 在鎖內確認檔案存在，之後才使用），並在鎖內重新確認進行中的工作
+        async with contextlib.AsyncExitStack() as locks:
+            for owner in sorted({entry.owner for _, entry in victims}):
+                await locks.enter_async_context(_audio_locks.setdefault(owner, asyncio.Lock()))
+            if cluster:
+                shared_pinned = await asyncio.wrap_future(cluster.fetch(cluster.pinned))
+            victims = storage.release_pinned(victims, shared_pinned)
+            await loop.run_in_executor(None, delete_paths, [entry.path for _, entry in victims])
+        for area, entry in victims:
+            logger.info("已清除 %s: %s（%d bytes）", area, entry.path, entry.size,
+                        extra={"video_id": entry.owner})
+            _forget_artifact(entry.owner, entry.path)
+
+
+def _forget_artifact(video_id: str, path: str):
+    """
+    被淘汰的衍生項目不再由影片資料引用（波形於下次請求時重新計算）
+
+    被淘汰的影片已久未使用，其字幕時間索引也一併移除（下次查詢時重建）。
+    """
+    drop_index(video_id, tracks=True)
+    video_data = video_storage.get(video_id)
+    if not video_data:
+        return
+    for track_data in [video_data] + list(video_data.get("tracks", {}).values()):
+        if track_data.get("fingerprint_path") == path:
+            track_data.pop("fingerprint_path")
+    if video_data.get("waveform_path") == path:
+        video_data.pop("waveform_path")
+        video_data["waveform_status"] = "evicted"
+    if path in (video_data.get("stream_path"), video_data.get("hls_dir")):
+        video_data.pop("stream_path", None)
+        video_data.pop("hls_dir", None)
+        video_data["remux_status"] = "evicted"
+    _persist_video(video_id)
+
+
+def _register_renditions(video_id: str, results: list):
+    """登記提取出的 WAV 與 Whisper 分段目錄"""
+    for result in results:
+        storage.add("audio", video_id, result["pcm"]["path"])
+        storage.add("audio", video_id, result["whisper"]["dir"])
+
+
+async def ensure_audio(video_id: str, track: int = DEFAULT_TRACK):
+    """
+    確認音訊軌的 WAV 與 Whisper 分段存在
+    
+    轉錄完成後或被淘汰而清除的衍生音訊，會由原始影片重新提取（只提取該音訊軌）。
+    原始影片也已清除時拋出 FileNotFoundError。
+    """
+    video_data = video_storage[video_id]
+    track_data = _track_data(video_data, track)
+    async with _audio_locks.setdefault(video_id, asyncio.Lock()):
+        whisper = track_data.get("audio_renditions", {}).get("whisper")
+        if os.path.exists(track_data["audio_path"]) and (not whisper or os.path.isdir(whisper["dir"])):
+            storage.touch(track_data["audio_path"])
+            return
+        if not os.path.exists(video_data["video_path"]):
+            raise FileNotFoundError("原始影片已清除，無法重新產生音訊")
+        
+        renditions = video_data["audio_renditions"]
+        loop = asyncio.get_event_loop()
+        async with admission.pools[POOL_EXTRACT].slot(reject=False):
+            with tracing.span("extract_audio.regenerate", video_id, track=track):
+                extracted = await loop.run_in_executor(
+                    None, tracing.run_in_context(
+                        extract_audio_renditions, video_data["video_path"], renditions["pcm"]["path"],
+                        renditions["whisper"]["dir"], WHISPER_SEGMENT_SECONDS, video_data.get("media_info"), [track]
+                    )
+                )
+        result = extracted["tracks"][0]
+        track_data["audio_path"] = result["pcm"]["path"]
+        track_data["audio_renditions"] = {"pcm": result["pcm"], "whisper": result["whisper"]}
+        _register_renditions(video_id, extracted["tracks"])
+        storage.regenerations += 1
+        _persist_video(video_id)
+
+
+def _load_api_modules() -> Dict[str, str]:
+    """載入 API 客戶端模組（首次匯入 openai），回傳各任務未設定路由時的預設模型"""
+    import whisper_client
+    import translator
+    import note_generator
+    return {
+        TASK_TRANSCRIBE: whisper_client.TRANSCRIPTION_MODEL,
+        TASK_TRANSLATE: translator.TRANSLATION_MODEL,
+        TASK_NOTES: note_generator.NOTE_MODEL,
+    }
+
+
+async def warm_up_model_clients():
+    """預先建立各路由的 API 客戶端（連線池），完成後 /ready 才回報就緒"""
+    start = time.perf_counter()
+    try:
+        defaults = await asyncio.get_event_loop().run_in_executor(None, _load_api_modules)
+        routes = await get_router().warm_up(defaults)
+    except Exception as e:
+        readiness["model_clients"] = f"failed: {e}"
+        logger.error("API 客戶端預熱失敗: %s", e)
+        return
+    readiness["model_clients"] = "ready"
+    logger.info("API 客戶端預熱完成（%d 條路由，%.0f ms）", routes, (time.perf_counter() - start) * 1000)
+
+
+@app.on_event("startup")
+async def start_model_warm_up():
+    app.state.model_warm_up = asyncio.create_task(warm_up_model_clients())
+
+
+@app.on_event("shutdown")
+async def close_model_clients():
+    """關閉模型路由共用的 OpenAI 客戶端連線"""
+    app.state.model_warm_up.cancel()
+    await get_router().aclose()
+
+
+@app.on_event("shutdown")
+async def stop_ingest_service():
+    await ingest_service.shutdown()
+    if tracing.tracer.exporter:
+        tracing.tracer.exporter.shutdown()
+    shutdown_logging()
 
 
 @app.post("/upload")
-async def upload_video(file: UploadFile = File(...)):
-    """上傳影片並提取音訊"""
+async def upload_video(request: Request, file: UploadFile = File(...)):
+    """
+    上傳影片並提取音訊
+
+    接收與寫入本文佔用上傳名額，提取音訊佔用提取名額；任一資源的佇列已滿時回傳 429
+    （兩者都在接收本文之前由 UploadAdmissionMiddleware 檢查）。
+    """
     video_id = str(uuid.uuid4())
-    video_path = UPLOAD_DIR / f"{video_id}_{file.filename}"
+    video_path = storage.areas["uploads"].path_for(video_id, f"{video_id}_{file.filename}")
+    
+    tracing.event(video_id, "uploading", filename=file.filename)
     
     # 儲存影片
-    with open(video_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    with tracing.span("upload.write", video_id) as span:
+        with open(video_path, "wb") as f:
+            content = await file.read()
+            f.write(content)
+        span.set_attribute("bytes", len(content))
+    storage.add("uploads", video_id, video_path)
+    release_upload = getattr(request.state, "release_admission", None)
+    if release_upload:
+        release_upload()
     
-    # 提取音訊
-    audio_path = AUDIO_DIR / f"{video_id}.wav"
+    # 提取音訊：單次 FFmpeg 解碼同時產生 PCM 與 Whisper 分段，並保存 ffprobe 中繼資料
+    audio_path = storage.areas["audio"].path_for(video_id, f"{video_id}.wav")
+    whisper_dir = storage.areas["audio"].path_for(video_id, f"{video_id}_whisper")
     try:
-        extract_audio(str(video_path), str(audio_path))
+        loop = asyncio.get_event_loop()
+        async with admission.pools[POOL_EXTRACT].slot():
+            with tracing.span("probe_media", video_id):
+                media_info = await loop.run_in_executor(None, probe_media, str(video_path))
+            with tracing.span("extract_audio", video_id, duration=media_info["duration"]):
+                extracted = await loop.run_in_executor(
+                    None, tracing.run_in_context(
+                        extract_audio_renditions, str(video_path), str(audio_path), str(whisper_dir),
+                        WHISPER_SEGMENT_SECONDS, media_info
+                    )
+                )
         
+        _register_renditions(video_id, extracted["tracks"])
+        audio_tracks = [t for t in media_info["tracks"] if t["type"] == "audio"]
         video_storage[video_id] = {
             "video_path": str(video_path),
             "audio_path": str(audio_path),
             "filename": file.filename,
-            "subtitles": [],
-            "translated_subtitles": []
+            "media_info": extracted["media_info"],
+            "audio_renditions": extracted["renditions"],
+            "tracks": {
+                result["track"]: {
+                    "audio_path": result["pcm"]["path"],
+                    "audio_renditions": {"pcm": result["pcm"], "whisper": result["whisper"]},
+                    "language": audio_tracks[result["track"]].get("language"),
+                    "title": audio_tracks[result["track"]].get("title"),
+                    "subtitles": CueStore()
+                }
+                for result in extracted["tracks"][1:]
+            },
+            "subtitles": CueStore()
         }
+        _index(search_index.register_video, video_id, file.filename)
+        tracing.event(video_id, "uploaded")
+        
+        asyncio.create_task(compute_waveform(video_id))
+        if VIDEO_REMUX in REMUX_MODES:
+            asyncio.create_task(remux_video(video_id, VIDEO_REMUX))
         
         return {
             "video_id": video_id,
             "filename": file.filename,
+            "duration": media_info["duration"],
+            "audio_tracks": len(extracted["tracks"]),
             "message": "影片上傳成功"
         }
+    except AdmissionRejected:
+        tracing.event(video_id, "upload_rejected")
+        # 未處理的上傳檔案優先淘汰
+        storage.mark_expendable(video_path)
+        raise
     except Exception as e:
+        tracing.event(video_id, "upload_failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"音訊提取失敗: {str(e)}")
 
 
-@app.get("/video/{video_id}")
-async def get_video(video_id: str):
-    """取得影片檔案"""
-    if video_id not in video_storage:
+async def remux_video(video_id: str, mode: str):
+    """背景重新封裝影片（faststart MP4 或 HLS 區段），完成後以各自的 URL 提供（見 /video/{id}/streams）"""
+    video_data = video_storage[video_id]
+    video_data["remux_status"] = "running"
+    _persist_video(video_id)
+    loop = asyncio.get_event_loop()
+    try:
+        async with admission.pools[POOL_EXTRACT].slot(reject=False):
+            with storage.in_use(video_id), tracing.span("remux", video_id, mode=mode):
+                if mode == "hls":
+                    hls_dir = storage.areas["stream"].path_for(video_id, video_id)
+                    await loop.run_in_executor(None, segment_hls, video_data["video_path"], str(hls_dir))
+                    storage.add("stream", video_id, hls_dir)
+                    video_data["hls_dir"] = str(hls_dir)
+                else:
+                    faststart_path = storage.areas["stream"].path_for(video_id, f"{video_id}.mp4")
+                    await loop.run_in_executor(None, remux_faststart, video_data["video_path"], str(faststart_path))
+                    storage.add("stream", video_id, faststart_path)
+                    video_data["stream_path"] = str(faststart_path)
+        video_data["remux_status"] = "completed"
+    except Exception as e:
+        video_data["remux_status"] = "failed"
+        logger.error("影片重新封裝失敗: %s", e, extra={"video_id": video_id})
+    _persist_video(video_id)
+
+
+async def compute_waveform(video_id: str):
+    """背景計算波形峰值金字塔（由已提取的 PCM WAV，不需重新解碼影片）"""
+    video_data = video_storage[video_id]
+    video_data["waveform_status"] = "running"
+    _persist_video(video_id)
+    waveform_path = storage.areas["audio"].path_for(video_id, f"{video_id}.wvpk")
+    loop = asyncio.get_event_loop()
+    from waveform import build_waveform
+    try:
+        with storage.in_use(video_id), tracing.span("waveform", video_id):
+            await ensure_audio(video_id)
+            async with admission.pools[POOL_EXTRACT].slot(reject=False):
+                video_data["waveform"] = await loop.run_in_executor(
+                    None, build_waveform, video_data["audio_path"], str(waveform_path)
+                )
+        storage.add("audio", video_id, waveform_path)
+        video_data["waveform_path"] = str(waveform_path)
+        video_data["waveform_status"] = "completed"
+    except Exception as e:
+        video_data["waveform_status"] = "failed"
+        logger.error("波形計算失敗: %s", e, extra={"video_id": video_id})
+    _persist_video(video_id)
+
+
+@app.get("/waveform/{video_id}")
+async def get_waveform_info(video_id: str):
+    """取得波形中繼資料（各層級的解析度與分塊數）"""
+    if not await _video_exists(video_id):
+        raise HTTPException(status_code=404, detail="影片不存在")
+    
+    video_data = video_storage[video_id]
+    status = video_data.get("waveform_status", "pending")
+    if status == "evicted":
+        # 波形檔已被清除：背景重新計算
+        video_data["waveform_status"] = status = "running"
+        asyncio.create_task(compute_waveform(video_id))
+    if status != "completed":
+        return {"status": status}
+    return {"status": status, **video_data["waveform"]}
+
+
+@app.get("/waveform/{video_id}/{level}/{tile}")
+async def get_waveform_tile(video_id: str, level: int, tile: int):
+    """
+    取得波形分塊：int8 的 (min, max) 交錯陣列，每塊最多 1024 組
+    
+    層級 0 解析度最高，每往上一層解析度減半；內容不會改變，可長期快取。
+    """
+    if not await _video_exists(video_id):
         raise HTTPException(status_code=404, detail="影片不存在")
     
-    video_path = video_storage[video_id]["video_path"]
-    if not os.path.exists(video_path):
+    waveform_path = video_storage[video_id].get("waveform_path")
+    if not waveform_path:
+        raise HTTPException(status_code=404, detail="波形尚未產生")
+    
+    storage.touch(waveform_path)
+    from waveform import WaveformFile
+    with WaveformFile(waveform_path) as waveform:
+        data = waveform.tile(level, tile)
+    if data is None:
+        raise HTTPException(status_code=404, detail="波形分塊不存在")
+    
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
+def _video_file_response(request: Request, video_path: Optional[str]) -> Response:
+    if not video_path or not os.path.exists(video_path):
         raise HTTPException(status_code=404, detail="影片檔案不存在")
+    storage.touch(video_path)
+    media_type = mimetypes.guess_type(video_path)[0] or "application/octet-stream"
+    return range_file_response(request, video_path, media_type)
+
+
+@app.get("/video/{video_id}")
+async def get_video(video_id: str, request: Request):
+    """
+    取得原始上傳的影片檔案（支援 Range、ETag、Last-Modified）
     
-    return FileResponse(video_path)
+    重新封裝的版本有自己的 URL，此 URL 的內容與 ETag 不會在播放中途改變。
+    """
+    if not await _video_exists(video_id):
+        raise HTTPException(status_code=404, detail="影片不存在")
+    return _video_file_response(request, video_storage[video_id]["video_path"])
 
 
-@app.websocket("/ws/transcribe/{video_id}")
-async def websocket_transcribe(websocket: WebSocket, video_id: str):
-    """WebSocket 端點：使用 Whisper API 轉錄"""
-    await websocket.accept()
+@app.get("/video/{video_id}/streams")
+async def get_video_streams(video_id: str):
+    """列出影片可用的播放版本；新的播放工作階段可改用 faststart 或 HLS 版本"""
+    if not await _video_exists(video_id):
+        raise HTTPException(status_code=404, detail="影片不存在")
+    video_data = video_storage[video_id]
+    return {
+        "remux_status": video_data.get("remux_status"),
+        "original": f"/video/{video_id}",
+        "faststart": f"/video/{video_id}/faststart" if video_data.get("stream_path") else None,
+        "hls": f"/video/{video_id}/hls/{HLS_PLAYLIST}" if video_data.get("hls_dir") else None,
+    }
+
+
+@app.get("/video/{video_id}/faststart")
+async def get_video_faststart(video_id: str, request: Request):
+    """取得 faststart 重新封裝的 MP4（VIDEO_REMUX=faststart 完成後；播放可立即開始）"""
+    if not await _video_exists(video_id):
+        raise HTTPException(status_code=404, detail="影片不存在")
+    return _video_file_response(request, video_storage[video_id].get("stream_path"))
+
+
+@app.get("/video/{video_id}/hls/{filename}")
+async def get_video_hls(video_id: str, filename: str, request: Request):
+    """取得 HLS 播放清單或區段"""
+    if not await _video_exists(video_id):
+        raise HTTPException(status_code=404, detail="影片不存在")
+    
+    hls_dir = video_storage[video_id].get("hls_dir")
+    if not hls_dir or "/" in filename or "\\" in filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="HLS 檔案不存在")
+    
+    path = os.path.join(hls_dir, filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="HLS 檔案不存在")
+    storage.touch(hls_dir)
     
+    if filename.endswith(".m3u8"):
+        return range_file_response(request, path, "application/vnd.apple.mpegurl")
+    # 區段內容不會改變，可長期快取
+    return range_file_response(request, path, "video/mp2t", cache_control="public, max-age=31536000, immutable")
+
+
+def _track_data(video_data: dict, track: int) -> Optional[dict]:
+    """
+    取得音訊軌的資料（audio_path、audio_renditions、subtitles（含翻譯欄位的 CueStore）、轉錄狀態）
+    
+    預設軌即影片資料本身，其餘音訊軌存放在 video_data["tracks"]；不存在時回傳 None。
+    """
+    if track == DEFAULT_TRACK:
+        return video_data
+    return video_data.get("tracks", {}).get(track)
+
+
+def _track_topic(video_id: str, track: int) -> str:
+    """音訊軌的字幕廣播主題（同時作為轉錄任務與字幕索引的鍵）"""
+    return video_id if track == DEFAULT_TRACK else f"{video_id}:track{track}"
+
+
+# 已結束主題的快照每個訊框的字幕數
+SNAPSHOT_FRAME_CUES = 500
+
+
+def _topic_snapshot(topic: str) -> List[Dict[str, dict]]:
+    """
+    由字幕儲存重建已結束主題的快照：字幕、翻譯與完成訊息（各編碼版本）
+
+    主題進行中以廣播中心的保留訊息作為快照，結束後改由此函式產生，廣播中心不必長期保留訊框。
+    """
+    video_id, _, suffix = topic.partition(":track")
+    track = int(suffix) if suffix else DEFAULT_TRACK
     if video_id not in video_storage:
-        await websocket.send_json({"error": "影片不存在"})
-        await websocket.close()
-        return
+        return []
+    track_data = _track_data(video_storage[video_id], track)
+    if track_data is None:
+        return []
+    cues = track_data["subtitles"]
+    frames = [encode_frames(cues[i:i + SNAPSHOT_FRAME_CUES]) for i in range(0, len(cues), SNAPSHOT_FRAME_CUES)]
+    translated = cues.translated
+    frames += [encode_translation_frames(translated[i:i + SNAPSHOT_FRAME_CUES])
+               for i in range(0, len(translated), SNAPSHOT_FRAME_CUES)]
+    if track_data.get("transcription_status") == "completed":
+        completed = {"type": "completed", "message": "轉錄完成", "track": track}
+        if "incremental" in track_data:
+            completed["reused_cues"] = track_data["incremental"]["reused_cues"]
+        if translated:
+            completed["translated_count"] = len(translated)
+        frames.append({ENCODING_JSON: completed})
+    return frames
+
+
+subtitle_hub.snapshot = _topic_snapshot
+
+
+async def _require_track(video_id: str, track: int) -> dict:
+    if not await _video_exists(video_id):
+        raise HTTPException(status_code=404, detail="影片不存在")
+    track_data = _track_data(video_storage[video_id], track)
+    if track_data is None:
+        raise HTTPException(status_code=404, detail="音訊軌不存在")
+    return track_data
+
+
+async def _ensure_fingerprint(video_id: str, track: int) -> Optional[str]:
+    """計算影片音訊軌的指紋（已計算時直接回傳）；音訊檔已被淘汰時回傳 None"""
+    from audio_fingerprint import build_fingerprints
     
-    video_data = video_storage[video_id]
-    audio_path = video_data["audio_path"]
+    video_data = _track_data(video_storage[video_id], track)
+    if video_data.get("fingerprint_path"):
+        return video_data["fingerprint_path"]
+    audio_path = video_data.get("audio_path")
+    if not audio_path or not os.path.exists(audio_path):
+        return None
     
-    if not os.path.exists(audio_path):
-        await websocket.send_json({"error": "音訊檔案不存在"})
-        await websocket.close()
-        return
+    suffix = "" if track == DEFAULT_TRACK else f"_a{track}"
+    fingerprint_path = storage.areas["audio"].path_for(video_id, f"{video_id}{suffix}.fp.npz")
+    async with admission.pools[POOL_EXTRACT].slot(reject=False):
+        with storage.in_use(video_id), tracing.span("fingerprint", video_id, track=track):
+            await asyncio.get_event_loop().run_in_executor(
+                None, build_fingerprints, audio_path, str(fingerprint_path))
+    storage.add("audio", video_id, fingerprint_path)
+    video_data["fingerprint_path"] = str(fingerprint_path)
+    _persist_video(video_id)
+    return video_data["fingerprint_path"]
+
+
+async def prepare_incremental_plan(video_id: str, track: int) -> Optional[dict]:
+    """
+    在其他已轉錄的影片（含各音訊軌）中尋找同一內容的舊版本
     
-    # 檢查是否正在轉錄
-    if video_data.get("is_transcribing", False):
-        await websocket.send_json({
-            "type": "error",
-            "error": "轉錄正在進行中，請稍候"
-        })
-        await websocket.close()
-        return
+    先確認有可比對的候選，再計算指紋（候選尚無指紋時一併補算）；
+    找到時回傳增量轉錄計畫（沿用的字幕與變動區段），否則回傳 None（完整轉錄）。
+    """
+    from incremental import find_source, plan_reuse
+    
+    sources = []
+    for other_id, other in video_storage.items():
+        if other_id == video_id:
+            continue
+        for other_track in [DEFAULT_TRACK] + sorted(other.get("tracks", {})):
+            other_data = _track_data(other, other_track)
+            if (other_data.get("transcription_status") == "completed"
+                    and not other_data.get("is_transcribing")
+                    and (other_data.get("fingerprint_path") or other_data.get("audio_path"))):
+                sources.append((other_id, other_track))
+    if not sources:
+        return None
+    
+    if await _ensure_fingerprint(video_id, track) is None:
+        return None
+    candidates = {}
+    for source in sources:
+        fingerprint_path = await _ensure_fingerprint(*source)
+        if fingerprint_path:
+            candidates[source] = fingerprint_path
+    if not candidates:
+        return None
+    
+    video_data = _track_data(video_storage[video_id], track)
+    loop = asyncio.get_event_loop()
+    with tracing.span("incremental.align", video_id, track=track, candidates=len(candidates)):
+        found = await loop.run_in_executor(None, find_source, video_data["fingerprint_path"], candidates)
+    if found is None:
+        return None
+    
+    (source_id, source_track), segments, duration = found
+    source = _track_data(video_storage[source_id], source_track)
+    plan = plan_reuse(segments, source["subtitles"], source["subtitles"].translated, duration)
+    plan["source_video_id"] = source_id
+    plan["source_track"] = source_track
+    return plan
+
+
+async def run_transcription_job(ticket: Ticket, video_id: str, translate: bool = False,
+                                track: int = DEFAULT_TRACK, incremental: bool = True):
+    """
+    背景轉錄任務：結果透過字幕廣播中心推送給所有訂閱者
+    
+    音訊以時間窗分段轉錄，每段完成即推送；translate=True 時同時將
+    已產生的字幕送入翻譯管線，翻譯結果以 translations 訊框推送。
+    每個音訊軌是獨立的任務與廣播主題，可同時轉錄。
+    incremental=True 時若找到同一內容的舊版本，只轉錄變動區段，其餘沿用舊字幕與翻譯。
+    任務期間影片的檔案不會被淘汰；完成後 WAV 與 Whisper 分段標記為可丟棄（需要時再重新提取）。
+    ticket 為啟動時取得的對外 API 名額：輪到後才開始，轉錄完成（翻譯收尾前）即歸還。
+    """
+    video_data = _track_data(video_storage[video_id], track)
+    topic = _track_topic(video_id, track)
+    # 全文檢索只索引預設軌（字幕 id 在各軌之間會重複）
+    indexed = track == DEFAULT_TRACK
+    
+    def publish_subtitles(batch):
+        subtitle_hub.publish_variants(topic, encode_frames(batch), retain=True)
+    
+    def publish_translations(translated):
+        video_data["subtitles"].set_translations(translated)
+        _share_translations(video_id, track, [(t["id"], t["translated_text"]) for t in translated])
+        if indexed:
+            _index(search_index.add_cues, video_id, translated, KIND_TRANSLATED)
+        subtitle_hub.publish_variants(topic, encode_translation_frames(translated), retain=True)
+    
+    pipeline = TranslationPipeline(publish_translations, pool=admission.pools[POOL_API]) if translate else None
+    tracing.event(video_id, "transcription_running", track=track)
+    storage.pin(video_id)
     
     try:
-        # 標記為正在轉錄
-        video_data["is_transcribing"] = True
-        # 清空舊的字幕（防止重複）
-        video_data["subtitles"] = []
-        video_data["translated_subtitles"] = []
+        if ticket.queued:
+            subtitle_hub.publish(topic, {"type": "status", "message": "排隊等待轉錄..."}, droppable=True)
+        await ticket.wait()
         
-        # 通知前端開始轉錄
-        await websocket.send_json({
+        # 通知訂閱者開始轉錄
+        subtitle_hub.publish(topic, {
             "type": "status",
             "message": "正在使用 Whisper API 轉錄..."
-        })
+        }, droppable=True)
+        
+        await ensure_audio(video_id, track)
+        audio_path = video_data["audio_path"]
         
         # 建立 Whisper API 客戶端
+        from whisper_client import WhisperTranscriptionClient
         client = WhisperTranscriptionClient()
         
-        # 使用 Whisper API 轉錄（同步處理，但有精確時間戳）
-        # 在後台執行轉錄，避免阻塞
-        loop = asyncio.get_event_loop()
-        subtitles = await loop.run_in_executor(
-            None,
-            client.transcribe_audio_file,
-            audio_path
-        )
+        plan = None
+        if incremental:
+            try:
+                plan = await prepare_incremental_plan(video_id, track)
+            except Exception as e:
+                logger.warning("增量轉錄規劃失敗，改為完整轉錄: %s", e, extra={"video_id": video_id, "track": track})
         
-        # 儲存並發送所有字幕
-        for subtitle_data in subtitles:
-            video_data["subtitles"].append(subtitle_data)
+        # 使用 Whisper API 分段轉錄（同步處理，但有精確時間戳）
+        # 每個時間窗在後台執行，避免阻塞
+        loop = asyncio.get_event_loop()
+        whisper = video_data.get("audio_renditions", {}).get("whisper")
+        if plan:
+            # 同一內容的舊版本：沿用未變動區段的字幕，只轉錄變動區段
+            video_data["incremental"] = {
+                "source_video_id": plan["source_video_id"],
+                "source_track": plan["source_track"],
+                "reused_cues": len(plan["reused"]),
+                "reused_seconds": plan["reused_seconds"],
+                "transcribed_seconds": plan["changed_seconds"],
+            }
+            tracing.event(video_id, "incremental_plan", track=track, **video_data["incremental"])
+            _persist_video(video_id)
+            subtitle_hub.publish(topic, {
+                "type": "status",
+                "message": f"沿用舊版本 {len(plan['reused'])} 條字幕，只轉錄 {plan['changed_seconds']:.0f} 秒變動內容..."
+            }, droppable=True)
+            from incremental import iter_incremental
+            windows = iter_incremental(client, audio_path, plan)
+        elif whisper and whisper["segments"]:
+            # 使用上傳時已切好的 16kHz FLAC 分段，不需再讀取或編碼 WAV
+            windows = ((subtitles, []) for subtitles in client.transcribe_segments(whisper["segments"]))
+        else:
+            windows = ((subtitles, []) for subtitles in client.transcribe_audio_windows(audio_path))
+        batcher = FrameBatcher(publish_subtitles)
+        reused_translations = 0
+        with tracing.span("transcription", video_id, translate=translate, track=track):
+            while True:
+                batch = await loop.run_in_executor(None, tracing.run_in_context(next, windows, None))
+                if batch is None:
+                    break
+                subtitles, translations = batch
+                
+                # 儲存並以批次訊框廣播此時間窗的字幕
+                with tracing.span("publish_window", cues=len(subtitles)):
+                    for subtitle_data in subtitles:
+                        video_data["subtitles"].append(subtitle_data)
+                        batcher.add(subtitle_data)
+                    batcher.flush()
+                    _share_cues(video_id, track, subtitles)
+                    if indexed:
+                        _index(search_index.add_cues, video_id, subtitles, KIND_TEXT)
+                
+                if pipeline:
+                    # 沿用的字幕已有翻譯，只送出其餘字幕
+                    if translations:
+                        publish_translations(translations)
+                        reused_translations += len(translations)
+                        translated_ids = {t["id"] for t in translations}
+                        subtitles = [s for s in subtitles if s["id"] not in translated_ids]
+                    if subtitles:
+                        pipeline.submit(subtitles)
+            ticket.release()
             
-            # 發送到前端
-            await websocket.send_json({
-                "type": "subtitle",
-                "data": subtitle_data
-            })
+            if pipeline:
+                with tracing.span("translation_drain"):
+                    await pipeline.drain()
         
         # 轉錄完成
-        await websocket.send_json({
-            "type": "completed",
-            "message": "轉錄完成"
-        })
+        video_data["transcription_status"] = "completed"
+        tracing.event(video_id, "transcription_completed", track=track, subtitles=len(video_data["subtitles"]))
+        completed = {"type": "completed", "message": "轉錄完成", "track": track}
+        if plan:
+            completed["reused_cues"] = len(plan["reused"])
+        if pipeline:
+            completed["translated_count"] = pipeline.translated_count + reused_translations
+        subtitle_hub.publish(topic, completed, retain=True)
         # 筆記生成由前端調用 REST API /generate-notes 觸發
         
-    except WebSocketDisconnect:
-        pass
+        if STORAGE_DROP_AUDIO:
+            storage.mark_expendable(audio_path)
+            if whisper:
+                storage.mark_expendable(whisper["dir"])
+        
     except Exception as e:
-        try:
-            await websocket.send_json({
-                "type": "error",
-                "error": str(e)
-            })
-        except Exception:
-            pass
+        video_data["transcription_status"] = "failed"
+        tracing.event(video_id, "transcription_failed", track=track, error=str(e))
+        logger.error("轉錄失敗: %s", e, extra={"video_id": video_id, "track": track})
+        subtitle_hub.publish(topic, {
+            "type": "error",
+            "error": str(e)
+        })
     finally:
         # 清除轉錄標記
-        if video_id in video_storage:
-            video_storage[video_id]["is_transcribing"] = False
+        ticket.release()
+        storage.unpin(video_id)
+        video_data["is_transcribing"] = False
+        transcription_tasks.pop(topic, None)
+        subtitle_hub.close_topic(topic)
+        if cluster:
+            # 狀態與結束事件寫入後才釋放租約，其他 worker 看到租約釋放時已能取得完整結果
+            _persist_video(video_id)
+            _defer_cluster(cluster.release, f"job:{topic}")
 
 
-@app.post("/translate/{video_id}")
-async def translate_subtitles(video_id: str):
-    """翻譯字幕為繁體中文"""
-    if video_id not in video_storage:
+async def start_transcription_job(video_id: str, translate: bool = False, track: int = DEFAULT_TRACK,
+                                  incremental: bool = True) -> bool:
+    """
+    清空舊字幕並啟動背景轉錄任務
+    
+    多 worker 部署時只有取得該音訊軌任務租約的 worker 會執行（租約在寫入執行緒取得）；
+    回傳是否由本 worker 啟動。對外 API 佇列已滿時拋出 AdmissionRejected（不啟動任務）。
+    """
+    topic = _track_topic(video_id, track)
+    ticket = admission.pools[POOL_API].reserve()
+    if cluster:
+        acquired = await asyncio.wrap_future(cluster.defer(cluster.acquire, f"job:{topic}"))
+        # 等待租約期間本 worker 可能已啟動同一個任務（租約由自己持有時 acquire 同樣成功）
+        if not acquired or topic in transcription_tasks:
+            ticket.release()
+            return False
+    video_data = _track_data(video_storage[video_id], track)
+    # 標記為正在轉錄
+    video_data["is_transcribing"] = True
+    video_data["transcription_status"] = "running"
+    # 清空舊的字幕（防止重複），舊字幕的時間索引不再使用
+    video_data["subtitles"] = CueStore()
+    drop_index(topic)
+    video_data.pop("incremental", None)
+    subtitle_hub.reset(topic)
+    if track == DEFAULT_TRACK:
+        _index(search_index.clear_video, video_id, [KIND_TEXT, KIND_TRANSLATED])
+    tracing.event(video_id, "transcription_queued", translate=translate, track=track)
+    transcription_tasks[topic] = asyncio.create_task(
+        run_transcription_job(ticket, video_id, translate, track, incremental)
+    )
+    if cluster:
+        video_storage.write(video_id, cluster.reset_cues, video_id, track)
+        _persist_video(video_id)
+    return True
+
+
+@app.get("/tracks/{video_id}")
+async def get_tracks(video_id: str):
+    """列出影片的音訊軌與各軌的轉錄狀態"""
+    if not await _video_exists(video_id):
         raise HTTPException(status_code=404, detail="影片不存在")
     
     video_data = video_storage[video_id]
+    audio_tracks = [t for t in video_data.get("media_info", {}).get("tracks", []) if t["type"] == "audio"]
+    track_numbers = [DEFAULT_TRACK] + sorted(video_data.get("tracks", {}))
+    tracks = []
+    for track in track_numbers:
+        track_data = _track_data(video_data, track)
+        meta = audio_tracks[track] if track < len(audio_tracks) else {}
+        tracks.append({
+            "track": track,
+            "codec": meta.get("codec"),
+            "channels": meta.get("channels"),
+            "language": meta.get("language"),
+            "title": meta.get("title"),
+            "transcription_status": track_data.get("transcription_status", "pending"),
+            "subtitles": len(track_data["subtitles"]),
+            "translated_subtitles": track_data["subtitles"].translated_count,
+            "incremental": track_data.get("incremental"),
+        })
+    return {"tracks": tracks}
+
+
+@app.post("/transcribe/{video_id}/tracks")
+async def transcribe_all_tracks(video_id: str, translate: bool = False, restart: bool = False,
+                                incremental: bool = True):
+    """
+    同時轉錄所有音訊軌（每軌一個獨立任務）
+    
+    進度可透過 /ws/transcribe/{video_id}?track=N 訂閱，或以 /tracks/{video_id} 查詢。
+    """
+    if not await _video_exists(video_id):
+        raise HTTPException(status_code=404, detail="影片不存在")
+    
+    video_data = video_storage[video_id]
+    # 對外 API 佇列已滿時不再接受新的轉錄任務（429）
+    admission.pools[POOL_API].check()
+    started = []
+    for track in [DEFAULT_TRACK] + sorted(video_data.get("tracks", {})):
+        track_data = _track_data(video_data, track)
+        if track_data.get("is_transcribing"):
+            continue
+        if restart or track_data.get("transcription_status") != "completed":
+            if await start_transcription_job(video_id, translate, track, incremental):
+                started.append(track)
+    return {"started": started}
+
+
+@app.websocket("/ws/transcribe/{video_id}")
+async def websocket_transcribe(websocket: WebSocket, video_id: str, restart: bool = False,
+                               encoding: str = ENCODING_JSON, translate: bool = False,
+                               track: int = DEFAULT_TRACK, incremental: bool = True):
+    """
+    WebSocket 端點：訂閱影片的字幕串流
+    
+    第一個連線會啟動 Whisper 轉錄；轉錄期間加入的連線會先收到既有字幕快照，
+    再接收即時更新。轉錄完成後加入的連線直接收到完整字幕（restart=true 可重新轉錄）。
+    字幕以批次訊框推送，encoding=compact 時使用精簡陣列編碼；
+    啟動轉錄的連線帶 translate=true 時，繁體中文翻譯會與轉錄同時進行並一併推送。
+    track=N 訂閱（並轉錄）第 N 個音訊軌，各軌互不影響。
+    若先前上傳過同一內容（剪輯、裁切過的版本），只轉錄變動區段並沿用舊字幕（incremental=false 可停用）。
+    """
+    await websocket.accept()
+    
+    if encoding not in ENCODINGS:
+        encoding = ENCODING_JSON
+    
+    if not await _video_exists(video_id):
+        await websocket.send_text(fast_json.dumps_text({"error": "影片不存在"}))
+        await websocket.close()
+        return
+    
+    video_data = _track_data(video_storage[video_id], track)
+    if video_data is None:
+        await websocket.send_text(fast_json.dumps_text({"error": "音訊軌不存在"}))
+        await websocket.close()
+        return
+    
+    # 轉錄後清除的音訊會在任務開始時由原始影片重新提取，兩者皆不存在才無法轉錄
+    start_job = not video_data.get("is_transcribing", False) and (
+        restart or video_data.get("transcription_status") != "completed"
+    )
+    if start_job and not (os.path.exists(video_data["audio_path"])
+                          or os.path.exists(video_storage[video_id]["video_path"])):
+        await websocket.send_text(fast_json.dumps_text({"error": "音訊檔案不存在"}))
+        await websocket.close()
+        return
+    if start_job:
+        # 對外 API 佇列已滿時不啟動新的轉錄任務
+        try:
+            admission.pools[POOL_API].check()
+        except AdmissionRejected as e:
+            await websocket.send_text(fast_json.dumps_text({
+                "type": "error", "error": str(e), "retry_after": e.retry_after
+            }))
+            # 1013: Try Again Later
+            await websocket.close(code=1013)
+            return
+    
+    # 訂閱必須在啟動任務前完成，確保不遺漏任何訊息
+    topic = _track_topic(video_id, track)
+    if cluster:
+        # 先套用其他 worker 已發布的廣播，快照才會包含最新內容
+        await sync_cluster()
+    subscriber = subtitle_hub.subscribe(topic, encoding)
+    if start_job:
+        subtitle_hub.unsubscribe(subscriber)
+        if not await start_transcription_job(video_id, translate, track, incremental):
+            # 其他 worker 已取得任務租約：訂閱其轉送過來的廣播
+            await sync_cluster()
+        subscriber = subtitle_hub.subscribe(topic, encoding)
+    elif not video_data.get("is_transcribing", False):
+        # 已完成：只送出快照
+        subtitle_hub.unsubscribe(subscriber)
+        subscriber.closed = True
+        subscriber.queue.put_nowait(None)
+    
+    try:
+        async for payload in subscriber:
+            await websocket.send_text(payload)
+        
+        if subscriber.lagged:
+            await websocket.send_text(fast_json.dumps_text({
+                "type": "error",
+                "error": "連線速度過慢，已中斷字幕推送，請重新連線"
+            }))
+            await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        subtitle_hub.unsubscribe(subscriber)
+
+
+
+def _unchanged(track_data: dict, subtitles: CueStore, revision: int) -> bool:
+    """字幕原文自 revision 之後未變動（仍是同一份字幕且未新增）"""
+    return track_data["subtitles"] is subtitles and subtitles.text_revision == revision
+
+
+@app.post("/translate/{video_id}")
+async def translate_subtitles(video_id: str, track: int = DEFAULT_TRACK):
+    """
+    翻譯字幕為繁體中文
+    
+    結果以字幕原文 revision、模型與提示詞版本快取：原文未變動時直接回傳，
+    同時的相同請求共用同一次翻譯。
+    """
+    video_data = await _require_track(video_id, track)
     subtitles = video_data["subtitles"]
     
     if not subtitles:
         raise HTTPException(status_code=400, detail="尚無字幕可翻譯")
     
-    try:
+    from translator import translate_to_traditional_chinese, TRANSLATION_MODEL, TRANSLATION_PROMPT_VERSION
+    
+    revision = subtitles.text_revision
+    
+    async def compute():
+        # 以開始時的字幕計算；期間新增的字幕不在此次結果內
+        cue_ids, texts = subtitles.ids.tolist(), list(subtitles.texts())
         translated = []
-        for subtitle in subtitles:
-            translated_text = await translate_to_traditional_chinese(subtitle["text"])
-            translated_subtitle = {
-                **subtitle,
-                "translated_text": translated_text
-            }
-            translated.append(translated_subtitle)
-        
-        video_data["translated_subtitles"] = translated
+        async with admission.pools[POOL_API].slot():
+            with tracing.span("translate", video_id, cues=len(texts)):
+                for text in texts:
+                    translated.append(await translate_to_traditional_chinese(text))
         
-        return {
-            "message": "翻譯完成",
-            "translated_count": len(translated)
-        }
+        # 全部完成後才替換翻譯欄位（失敗時保留原有翻譯）
+        subtitles.clear_translations()
+        for cue_id, translated_text in zip(cue_ids, translated):
+            subtitles.set_translation(cue_id, translated_text)
+        _share_translations(video_id, track, list(zip(cue_ids, translated)), replace=True)
+        if track == DEFAULT_TRACK:
+            _index(search_index.replace_cues, video_id, subtitles.translated[:], KIND_TRANSLATED)
+        return len(translated)
+    
+    key = ("translate", video_id, track, revision,
+           get_router().signature(TASK_TRANSLATE, TRANSLATION_MODEL), TRANSLATION_PROMPT_VERSION)
+    try:
+        # 計算期間原文有變動（新增字幕或重新轉錄）時，結果不對應鍵中的 revision，不快取
+        translated_count = await llm_results.get_or_compute(
+            key, compute, cache_if=lambda _: _unchanged(video_data, subtitles, revision)
+        )
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"翻譯失敗: {str(e)}")
+    
+    return {
+        "message": "翻譯完成",
+        "translated_count": translated_count
+    }
 
 
 @app.post("/generate-notes/{video_id}")
 async def generate_video_notes(video_id: str):
-    """生成雙語版本影片筆記"""
-    if video_id not in video_storage:
+    """
+    生成雙語版本影片筆記
+    
+    結果以字幕原文 revision、模型與提示詞版本快取：原文未變動時直接回傳，
+    同時的相同請求共用同一次生成。
+    """
+    if not await _video_exists(video_id):
         raise HTTPException(status_code=404, detail="影片不存在")
     
     video_data = video_storage[video_id]
@@ -211,46 +1340,176 @@ async def generate_video_notes(video_id: str):
     if not subtitles:
         raise HTTPException(status_code=400, detail="尚無字幕可生成筆記")
     
-    # 組合所有字幕文字
-    full_text = " ".join([s["text"] for s in subtitles])
+    from note_generator import generate_bilingual_notes_with_status, NOTE_MODEL, NOTE_PROMPT_VERSION
+    
+    revision = subtitles.text_revision
     
+    async def compute():
+        # 組合所有字幕文字
+        full_text = " ".join(subtitles.texts())
+        async with admission.pools[POOL_API].slot():
+            with tracing.span("generate_notes", video_id, transcript_chars=len(full_text)):
+                bilingual_notes, failed = await generate_bilingual_notes_with_status(full_text)
+        # 兩種語言皆失敗時不覆寫既有筆記，也不重新索引
+        if len(failed) < len(bilingual_notes):
+            video_data["notes"] = bilingual_notes  # 儲存筆記
+            _persist_video(video_id)
+            _index(search_index.index_notes, video_id, bilingual_notes)
+        return {"notes": bilingual_notes, "failed": failed}
+    
+    key = ("notes", video_id, revision, get_router().signature(TASK_NOTES, NOTE_MODEL),
+           NOTE_PROMPT_VERSION)
     try:
-        bilingual_notes = await generate_bilingual_notes(full_text)
-        video_data["notes"] = bilingual_notes  # 儲存筆記
-        return {
-            "notes": bilingual_notes,
-            "message": "筆記生成完成"
-        }
+        # 任一語言生成失敗時（以另一版本替代或皆為 None）或生成期間原文有變動時不快取，下次重新生成
+        result = await llm_results.get_or_compute(
+            key, compute, cache_if=lambda result: (not result["failed"]
+                                                   and _unchanged(video_data, subtitles, revision))
+        )
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"筆記生成失敗: {str(e)}")
+    bilingual_notes = result["notes"]
+    
+    return {
+        "notes": bilingual_notes,
+        "message": "筆記生成完成"
+    }
+
+
+def _language_subtitles(video_data: dict, language: Optional[str]):
+    """原文為 CueStore 本身，翻譯為其已翻譯字幕的檢視"""
+    if language == "traditional":
+        return video_data["subtitles"].translated
+    return video_data["subtitles"]
+
+
+def _subtitles_payload(subtitles, encoding: str, **extra) -> dict:
+    """
+    字幕回應內容
+    
+    encoding=compact 時以欄位陣列輸出 {"columns": {id: [...], start_time: [...], ...}}。
+    subtitles 為 CueStore / 翻譯檢視時整份輸出，其餘為 dict 列表（分頁或時間窗結果）。
+    """
+    if encoding == ENCODING_COMPACT:
+        if isinstance(subtitles, (CueStore, TranslatedCues)):
+            columns = subtitles.to_columns()
+        else:
+            columns = cues_to_columns(subtitles)
+        return {"columns": columns, **extra}
+    return {"subtitles": list(subtitles), **extra}
 
 
 @app.get("/subtitles/{video_id}")
-async def get_subtitles(video_id: str, language: Optional[str] = "original"):
-    """取得字幕資料"""
-    if video_id not in video_storage:
-        raise HTTPException(status_code=404, detail="影片不存在")
+async def get_subtitles(
+    request: Request,
+    video_id: str,
+    language: Optional[str] = "original",
+    time_from: Optional[float] = Query(None, alias="from"),
+    time_to: Optional[float] = Query(None, alias="to"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    track: int = DEFAULT_TRACK,
+    encoding: str = ENCODING_JSON,
+):
+    """
+    取得字幕資料
     
-    video_data = video_storage[video_id]
+    指定 from/to（秒）時只回傳與該時間窗重疊的字幕，可搭配 offset/limit 分頁。
+    encoding=compact 時以欄位陣列回傳（較小且序列化較快）。
+    回應依字幕 revision 快取並帶 ETag：字幕未變動時直接回傳已序列化的內容（或 304）。
+    ETag 為字幕內容的雜湊，多 worker 部署時任一 worker 都能驗證其他 worker 發出的 ETag。
+    """
+    video_data = await _require_track(video_id, track)
+    subtitles = _language_subtitles(video_data, language)
     
-    if language == "traditional":
-        subtitles = video_data.get("translated_subtitles", [])
-    else:
-        subtitles = video_data["subtitles"]
+    etag = f'"{subtitles.content_hash()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
     
-    return {"subtitles": subtitles}
+    key = (video_id, track, language, encoding, time_from, time_to, offset, limit)
+    body = subtitle_responses.get(key, subtitles.revision)
+    if body is None:
+        body = fast_json.dumps(_query_subtitles(
+            video_id, track, language, subtitles, time_from, time_to, offset, limit, encoding
+        ))
+        subtitle_responses.put(key, subtitles.revision, body)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@app.get("/export/srt/{video_id}")
-async def export_srt(video_id: str, language: Optional[str] = "original"):
-    """匯出 SRT 字幕檔"""
-    if video_id not in video_storage:
-        raise HTTPException(status_code=404, detail="影片不存在")
+def _query_subtitles(video_id: str, track: int, language: Optional[str], subtitles,
+                     time_from: Optional[float], time_to: Optional[float],
+                     offset: int, limit: Optional[int], encoding: str) -> dict:
+    """整份、分頁或時間窗查詢的字幕回應內容"""
+    if time_from is None and time_to is None:
+        if offset or limit:
+            page = subtitles[offset:offset + limit if limit else None]
+            next_offset = offset + len(page) if offset + len(page) < len(subtitles) else None
+            return _subtitles_payload(page, encoding, next_offset=next_offset)
+        return _subtitles_payload(subtitles, encoding)
     
-    video_data = video_storage[video_id]
+    index = get_index(_track_topic(video_id, track), language or "original", subtitles)
+    window, next_offset = index.window(
+        time_from if time_from is not None else float("-inf"),
+        time_to if time_to is not None else float("inf"),
+        offset,
+        limit
+    )
+    return _subtitles_payload(window, encoding, next_offset=next_offset)
+
+
+@app.get("/subtitles/{video_id}/at")
+async def get_subtitles_at(
+    video_id: str,
+    t: float,
+    language: Optional[str] = "original",
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    track: int = DEFAULT_TRACK,
+    encoding: str = ENCODING_JSON,
+):
+    """取得指定時間點（秒）正在顯示的字幕"""
+    subtitles = _language_subtitles(await _require_track(video_id, track), language)
+    index = get_index(_track_topic(video_id, track), language or "original", subtitles)
+    cues, next_offset = index.at(t, offset, limit)
+    # 直接序列化，不經 FastAPI 逐層轉換
+    return fast_json.FastJSONResponse(_subtitles_payload(cues, encoding, next_offset=next_offset))
+
+
+@app.get("/search")
+async def search(
+    q: str,
+    video_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """全文檢索所有影片的字幕、翻譯與筆記，回傳影片、字幕與時間戳"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="請提供搜尋關鍵字")
+    
+    return await asyncio.get_event_loop().run_in_executor(
+        None, functools.partial(search_index.search, q, limit=limit, offset=offset, video_id=video_id)
+    )
+
+
+@app.get("/timeline/{video_id}")
+async def get_timeline(video_id: str):
+    """取得影片的處理時間軸（狀態事件與各階段耗時）"""
+    timeline = tracing.get_timeline(video_id)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="沒有此影片的追蹤資料")
+    
+    return timeline
+
+
+@app.get("/export/srt/{video_id}")
+async def export_srt(video_id: str, language: Optional[str] = "original", track: int = DEFAULT_TRACK):
+    """匯出 SRT 字幕檔（track 指定音訊軌）"""
+    video_data = await _require_track(video_id, track)
     
     if language == "traditional":
-        subtitles = video_data.get("translated_subtitles", [])
+        subtitles = video_data["subtitles"].translated
         text_key = "translated_text"
     else:
         subtitles = video_data["subtitles"]
@@ -260,38 +1519,175 @@ async def export_srt(video_id: str, language: Optional[str] = "original"):
         raise HTTPException(status_code=400, detail="尚無字幕可匯出")
     
     # 生成 SRT 內容
-    srt_content = ""
-    for idx, subtitle in enumerate(subtitles, 1):
-        start_time = format_timestamp(subtitle["start_time"])
-        end_time = format_timestamp(subtitle["end_time"])
-        text = subtitle.get(text_key, subtitle["text"])
-        
-        srt_content += f"{idx}\n"
-        srt_content += f"{start_time} --> {end_time}\n"
-        srt_content += f"{text}\n\n"
+    srt_content = build_srt(subtitles, text_key)
     
-    # 儲存 SRT 檔案
-    srt_path = UPLOAD_DIR / f"{video_id}_{language}.srt"
-    with open(srt_path, "w", encoding="utf-8") as f:
-        f.write(srt_content)
-    
-    return FileResponse(
-        srt_path,
+    # 直接回傳內容，不在 uploads/ 留下匯出檔（非預設軌的檔名加上軌號）
+    suffix = f"{language}" if track == DEFAULT_TRACK else f"track{track}_{language}"
+    filename = f"{video_storage[video_id]['filename']}_{suffix}.srt"
+    tracing.event(video_id, "export_srt", language=language, track=track, bytes=len(srt_content))
+    quoted = quote(filename)
+    if quoted != filename:
+        disposition = f"attachment; filename*=utf-8''{quoted}"
+    else:
+        disposition = f'attachment; filename="{filename}"'
+    return Response(
+        content=srt_content,
         media_type="text/plain",
-        filename=f"{video_data['filename']}_{language}.srt"
+        headers={"Content-Disposition": disposition}
     )
 
 
-def format_timestamp(seconds: float) -> str:
-    """將秒數轉換為 SRT 時間格式 (HH:MM:SS,mmm)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+@app.websocket("/ws/ingest/{stream_id}")
+async def websocket_ingest(websocket: WebSocket, stream_id: str, translate: bool = False,
+                           encoding: str = ENCODING_JSON):
+    """
+    WebSocket 端點：接收即時 PCM 串流（16-bit mono 24kHz，二進位訊息）
+    
+    字幕（及 translate=true 時的翻譯）會從同一個連線推送回來。
+    傳送文字訊息 {"type": "end"} 表示音訊結束，伺服器送完剩餘結果後以 completed 結束；
+    轉錄會話失敗時推送 error 後關閉連線（1011）。
+    """
+    await websocket.accept()
+    
+    if encoding not in ENCODINGS:
+        encoding = ENCODING_JSON
+    
+    try:
+        stream = ingest_service.open_stream(stream_id)
+    except (StreamLimitError, ValueError) as e:
+        await websocket.send_text(fast_json.dumps_text({"type": "error", "error": str(e)}))
+        # 1013: Try Again Later
+        await websocket.close(code=1013)
+        return
+    
+    topic = f"ingest:{stream_id}"
+    subscriber = subtitle_hub.subscribe(topic, encoding)
+    
+    if translate:
+        def publish_translations(translated):
+            stream.translated_subtitles.extend(translated)
+            subtitle_hub.publish_variants(topic, encode_translation_frames(translated))
+        
+        ingest_pipelines[stream_id] = TranslationPipeline(publish_translations, pool=admission.pools[POOL_API])
+    
+    async def forward_results():
+        async for payload in subscriber:
+            await websocket.send_text(payload)
+    
+    async def fail(error: str):
+        # 先送完已產生的字幕，再推送錯誤並關閉連線
+        subtitle_hub.publish(topic, {"type": "error", "error": error})
+        subtitle_hub.close_topic(topic)
+        await sender
+        await websocket.close(code=1011)
+    
+    sender = asyncio.create_task(forward_results())
+    ended = False
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            chunk = message.get("bytes")
+            if chunk:
+                try:
+                    await stream.put(chunk)
+                except StreamFailedError as e:
+                    await fail(str(e))
+                    break
+            elif message.get("text"):
+                try:
+                    control = fast_json.loads(message["text"])
+                except ValueError:
+                    continue
+                if isinstance(control, dict) and control.get("type") == "end":
+                    ended = True
+                    break
+        
+        if ended:
+            # 等待剩餘音訊轉錄與翻譯完成後再結束推送
+            stream.close()
+            if stream.task:
+                await asyncio.gather(stream.task, return_exceptions=True)
+            if stream.error is not None:
+                await fail(stream.error)
+                return
+            pipeline = ingest_pipelines.get(stream_id)
+            if pipeline:
+                await pipeline.drain()
+            subtitle_hub.publish(topic, {
+                "type": "completed",
+                "message": "轉錄完成",
+                "subtitle_count": len(stream.subtitles)
+            })
+            subtitle_hub.close_topic(topic)
+            await sender
+            await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        stream.close()
+        sender.cancel()
+        subtitle_hub.unsubscribe(subscriber)
+        ingest_pipelines.pop(stream_id, None)
+
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """各准入池的並行數、佇列深度、等待與服務時間、接受與拒絕次數"""
+    return admission.stats()
+
+
+@app.get("/ready")
+async def get_readiness():
+    """就緒檢查：資料目錄與檢索索引就緒、API 客戶端連線池建立完成後回傳 200，否則 503"""
+    ready = all(state == "ready" for state in readiness.values())
+    return fast_json.FastJSONResponse({"ready": ready, "checks": readiness}, status_code=200 if ready else 503)
+
+
+@app.get("/storage/stats")
+async def get_storage_stats():
+    """各儲存區的用量、配額、淘汰次數與音訊重新提取次數"""
+    return storage.stats()
+
+
+@app.get("/models/stats")
+async def get_model_stats():
+    """各任務的模型路由統計（延遲、錯誤、暫停狀態、成本與選擇原因）"""
+    return get_router().stats()
+
+
+@app.get("/ingest/stats")
+async def get_ingest_stats():
+    """取得串流接收服務統計"""
+    return ingest_service.stats()
+
+
+@app.get("/ingest/{stream_id}/subtitles")
+async def get_ingest_subtitles(stream_id: str):
+    """取得即時串流的字幕"""
+    stream = ingest_service.streams.get(stream_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="串流不存在")
+    
+    return {
+        "subtitles": stream.subtitles,
+        "translated_subtitles": stream.translated_subtitles,
+        "stats": stream.stats()
+    }
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    # WORKERS=auto 依 CPU 核心數啟動 worker 行程
+    workers = resolve_workers(os.getenv("WORKERS"))
+    # permessage-deflate：字幕訊框重複性高，壓縮可大幅減少傳輸量
+    if workers > 1:
+        # 各 worker 行程重新匯入 main，透過 CLUSTER_DB 共用狀態
+        os.environ.setdefault("CLUSTER_DB", "cluster_state.db")
+        uvicorn.run("main:app", host=host, port=port, workers=workers, ws_per_message_deflate=True)
+    else:
+        uvicorn.run(app, host=host, port=port, ws_per_message_deflate=True)
 
@@ -0,0 +1,319 @@
+"""
+本地 OpenAI mock 伺服器 - 供壓力測試與基準測試使用，不需 API Key
+
+模擬：
+- Whisper 轉錄 (POST /v1/audio/transcriptions，verbose_json)
+- Chat Completions (POST /v1/chat/completions，翻譯/批次翻譯/筆記)
+- Realtime API 轉錄會話 (WebSocket /v1/realtime)
+
+可設定延遲、錯誤率與速率限制（超過時回傳 429 + Retry-After）。
+
+使用方式：
+    python mock_openai_server.py --port 8765 --latency 0.2 --error-rate 0.01 --rate-limit 50
+    export OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+    export OPENAI_REALTIME_URL=ws://127.0.0.1:8765/v1/realtime
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import time
+import uuid
+import wave
+from typing import Optional
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+
+class MockConfig:
+    """mock 行為設定"""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        segment_seconds: float = 3.0,
+        sample_rate: int = 24000,
+        latency_jitter: float = 0.0,
+        transcription_seconds_per_minute: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency                  # 每次請求（及每段轉錄結果）的基本延遲（秒）
+        self.segment_seconds = segment_seconds  # 每累積多少秒音訊產生一段字幕
+        self.sample_rate = sample_rate
+        self.latency_jitter = latency_jitter    # 延遲隨機抖動上限（秒）
+        self.transcription_seconds_per_minute = transcription_seconds_per_minute  # 轉錄延遲隨音訊長度增加
+        self.error_rate = error_rate            # 回傳 500 的機率
+        self.rate_limit = rate_limit            # 每秒請求數上限（0 = 不限制）
+        self.random = random.Random(seed)
+
+
+class TokenBucket:
+    """簡單的權杖桶速率限制"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """取得一個權杖；不足時回傳需等待的秒數"""
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def _flac_duration(data: bytes) -> Optional[float]:
+    """由 FLAC 的 STREAMINFO 區塊取得長度（總樣本數未知時回傳 None）"""
+    # "fLaC" 之後第一個中繼資料區塊必為 STREAMINFO：4 位元組區塊標頭 + 34 位元組內容
+    if len(data) < 8 + 18 or data[:4] != b"fLaC" or data[4] & 0x7F != 0:
+        return None
+    # 內容第 10 位元組起的 64 位元：取樣率 20 | 聲道數-1 3 | 位元深度-1 5 | 總樣本數 36
+    packed = int.from_bytes(data[18:26], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & ((1 << 36) - 1)
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+def _audio_duration(data: bytes) -> float:
+    """上傳音訊的長度（WAV 與 FLAC；其他格式以 16kHz 16-bit mono 估算）"""
+    duration = _flac_duration(data)
+    if duration is not None:
+        return duration
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    except (wave.Error, EOFError):
+        return len(data) / 32000
+
+
+def _chat_content(body: dict) -> str:
+    """依提示內容產生對應的假回應"""
+    messages = body.get("messages", [])
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    wants_json = (body.get("response_format") or {}).get("type") == "json_object"
+
+    if wants_json and "translations" in system:
+        try:
+            texts = json.loads(user)
+        except ValueError:
+            texts = [user]
+        return json.dumps({"translations": [f"[譯] {t}" for t in texts]}, ensure_ascii=False)
+    if wants_json:
+        words = [w for w in user.split() if w.isalpha()][:10] or ["mock"]
+        return json.dumps({
+            "summary": f"Mock summary of {len(user)} characters.",
+            "key_points": ["point one", "point two", "point three"],
+            "keywords": words[:8],
+            "insights": "mock insights",
+        }, ensure_ascii=False)
+    return f"[譯] {user.split(chr(10))[-1]}"
+
+
+def create_app(config: MockConfig = None) -> FastAPI:
+    """建立 mock 伺服器 app"""
+    config = config or MockConfig()
+    app = FastAPI(title="Mock OpenAI API")
+    app.state.config = config
+    app.state.stats = {
+        "requests": 0,
+        "errors": 0,
+        "rate_limited": 0,
+        "transcriptions": 0,
+        "chat_completions": 0,
+        "realtime_sessions": 0,
+        "realtime_audio_bytes": 0,
+        "realtime_segments": 0,
+    }
+    bucket = TokenBucket(config.rate_limit) if config.rate_limit > 0 else None
+
+    async def simulate(extra_latency: float = 0.0):
+        """套用速率限制、錯誤率與延遲；回傳錯誤回應或 None"""
+        stats = app.state.stats
+        stats["requests"] += 1
+        if bucket is not None:
+            wait = bucket.take()
+            if wait > 0:
+                stats["rate_limited"] += 1
+                return JSONResponse(
+                    {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                    status_code=429,
+                    headers={"Retry-After": f"{wait:.3f}"},
+                )
+        delay = config.latency + extra_latency
+        if config.latency_jitter:
+            delay += config.random.uniform(0, config.latency_jitter)
+        await asyncio.sleep(delay)
+        if config.error_rate and config.random.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"error": {"message": "Mock server error", "type": "server_error"}},
+                status_code=500,
+            )
+        return None
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        data = await upload.read() if upload is not None else b""
+        duration = _audio_duration(data)
+
+        error = await simulate(duration / 60 * config.transcription_seconds_per_minute)
+        if error is not None:
+            return error
+        app.state.stats["transcriptions"] += 1
+
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + config.segment_seconds)
+            segments.append({
+                "id": len(segments),
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "text": f" synthetic segment {len(segments) + 1} at {start:.1f} seconds",
+            })
+            start = end
+        return {
+            "task": "transcribe",
+            "language": "english",
+            "duration": duration,
+            "text": " ".join(s["text"].strip() for s in segments),
+            "segments": segments,
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = await simulate()
+        if error is not None:
+            return error
+        app.state.stats["chat_completions"] += 1
+
+        content = _chat_content(body)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.websocket("/v1/realtime")
+    async def realtime(websocket: WebSocket):
+        await websocket.accept()
+        stats = app.state.stats
+        stats["realtime_sessions"] += 1
+
+        segment_bytes = int(config.segment_seconds * config.sample_rate) * 2
+        pending_bytes = 0
+        segment_index = 0
+        send_lock = asyncio.Lock()
+        emit_tasks = []
+
+        async def emit_segment(index: int, seconds: float):
+            await asyncio.sleep(config.latency)
+            item_id = f"item_{uuid.uuid4().hex[:12]}"
+            transcript = f"synthetic segment {index} ({seconds:.1f}s)"
+            async with send_lock:
+                await websocket.send_text(json.dumps({
+                    "type": "conversation.item.input_audio_transcription.delta",
+                    "item_id": item_id,
+                    "delta": transcript,
+                }))
+                await websocket.send_text(json.dumps({
+                    "type": "conversation.item.input_audio_transcription.completed",
+                    "item_id": item_id,
+                    "transcript": transcript,
+                }))
+            stats["realtime_segments"] += 1
+
+        try:
+            while True:
+                event = json.loads(await websocket.receive_text())
+                event_type = event.get("type")
+
+                if event_type == "session.update":
+                    async with send_lock:
+                        await websocket.send_text(json.dumps({"type": "session.updated", "session": event.get("session", {})}))
+
+                elif event_type == "input_audio_buffer.append":
+                    size = len(base64.b64decode(event.get("audio", "")))
+                    stats["realtime_audio_bytes"] += size
+                    pending_bytes += size
+                    while pending_bytes >= segment_bytes:
+                        pending_bytes -= segment_bytes
+                        segment_index += 1
+                        emit_tasks.append(asyncio.create_task(emit_segment(segment_index, config.segment_seconds)))
+
+                elif event_type == "input_audio_buffer.commit":
+                    if pending_bytes:
+                        segment_index += 1
+                        seconds = pending_bytes / 2 / config.sample_rate
+                        emit_tasks.append(asyncio.create_task(emit_segment(segment_index, seconds)))
+                        pending_bytes = 0
+                    await asyncio.gather(*emit_tasks, return_exceptions=True)
+                    await websocket.close()
+                    return
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in emit_tasks:
+                task.cancel()
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return app.state.stats
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """mock 伺服器的共用命令列參數"""
+    parser.add_argument("--latency", type=float, default=0.2, help="每次請求的基本延遲（秒）")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="延遲隨機抖動上限（秒）")
+    parser.add_argument("--segment-seconds", type=float, default=3.0, help="每段字幕對應的音訊長度（秒）")
+    parser.add_argument("--transcription-seconds-per-minute", type=float, default=0.5,
+                        help="每分鐘音訊額外增加的轉錄延遲（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回傳 500 的機率 (0-1)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="每秒請求數上限（0 = 不限制）")
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        segment_seconds=args.segment_seconds,
+        transcription_seconds_per_minute=args.transcription_seconds_per_minute,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地 OpenAI mock 伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,388 @@
+"""
+模型路由 - 依輸入長度、佇列深度、延遲目標與預算為每次請求選擇模型與端點
+
+- 路由（Route）：某個任務（轉錄 / 翻譯 / 筆記）可使用的「模型 + 端點」組合，附單位成本與延遲估計
+- 政策（Policy）：各任務的延遲目標（SLO）、佇列深度門檻與每小時預算
+- 每條路由記錄延遲與錯誤（EWMA），預估延遲由實際量測回饋；連續失敗的路由暫停使用一段時間
+- OpenAI 客戶端依端點共用，重複使用連線池；openai 套件在第一次建立客戶端時才載入（不拖慢啟動）
+
+單位：轉錄為音訊分鐘數、翻譯為字幕條數、筆記為逐字稿千字數；成本與 max_units 都以此計。
+
+設定以 JSON 提供（環境變數 MODEL_ROUTES：檔案路徑或 JSON 字串），同一任務的路由依偏好順序排列：
+    {
+      "routes": [
+        {"name": "whisper", "task": "transcribe", "model": "whisper-1", "cost": 0.006},
+        {"name": "local-whisper", "task": "transcribe", "model": "whisper-small",
+         "base_url": "http://gpu-box:8000/v1", "api_key_env": "LOCAL_API_KEY", "cost": 0, "max_concurrency": 4}
+      ],
+      "policies": {
+        "transcribe": {"slo_seconds": 30, "queue_threshold": 4, "budget_per_hour": 2.0, "prefer": "latency"}
+      }
+    }
+未設定路由的任務使用呼叫端的預設模型（OPENAI_API_KEY / OPENAI_BASE_URL 指定的端點）。
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+logger = logging.getLogger(__name__)
+
+TASK_TRANSCRIBE = "transcribe"
+TASK_TRANSLATE = "translate"
+TASK_NOTES = "notes"
+TASKS = (TASK_TRANSCRIBE, TASK_TRANSLATE, TASK_NOTES)
+
+# 佇列過深時的退路偏好
+PREFER_LATENCY = "latency"
+PREFER_COST = "cost"
+
+# 選擇原因（統計用）
+REASON_PREFERRED = "preferred"
+REASON_FALLBACK = "fallback"      # 偏好路由暫停、滿載或無法處理此輸入大小
+REASON_SLO = "slo"
+REASON_QUEUE = "queue"
+REASON_BUDGET = "budget"
+
+EWMA_ALPHA = 0.3
+BUDGET_WINDOW_SECONDS = 3600.0
+
+
+class Route:
+    """一個任務可使用的模型與端點"""
+
+    def __init__(self, name: str, task: str, model: str, base_url: Optional[str] = None,
+                 api_key_env: str = "OPENAI_API_KEY", cost: float = 0.0,
+                 latency: Optional[float] = None, max_units: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
+        if task not in TASKS:
+            raise ValueError(f"未知的任務類型: {task}")
+        self.name = name
+        self.task = task
+        self.model = model
+        self.base_url = base_url          # None 時使用 OPENAI_BASE_URL（或官方端點）
+        self.api_key_env = api_key_env
+        self.cost = cost                  # 每單位成本
+        self.latency = latency            # 尚無量測時的每次呼叫延遲估計（秒）
+        self.max_units = max_units        # 可處理的最大輸入（例如短音訊專用模型）
+        self.max_concurrency = max_concurrency
+
+        # 執行期統計（由 ModelRouter 在鎖內更新）
+        self.calls = 0
+        self.errors = 0
+        self.inflight = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.spent = 0.0
+        self.ewma_latency: Optional[float] = None
+        self.ewma_unit_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Route":
+        return cls(
+            name=data.get("name") or f"{data['task']}:{data['model']}",
+            task=data["task"],
+            model=data["model"],
+            base_url=data.get("base_url"),
+            api_key_env=data.get("api_key_env", "OPENAI_API_KEY"),
+            cost=float(data.get("cost", 0.0)),
+            latency=data.get("latency"),
+            max_units=data.get("max_units"),
+            max_concurrency=data.get("max_concurrency"),
+        )
+
+    def estimate(self, units: float) -> Optional[float]:
+        """預估延遲（秒）：有每單位量測時按單位數換算，否則使用每次呼叫的量測或設定值"""
+        if units > 0 and self.ewma_unit_latency is not None:
+            return self.ewma_unit_latency * units
+        if self.ewma_latency is not None:
+            return self.ewma_latency
+        return self.latency
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "task": self.task,
+            "model": self.model,
+            "base_url": self.base_url,
+            "cost": self.cost,
+            "calls": self.calls,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "error_rate": round(self.ewma_error_rate, 3),
+            "latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "cooldown_seconds": round(max(0.0, self.cooldown_until - now), 1),
+            "spent": round(self.spent, 4),
+        }
+
+
+class Policy:
+    """單一任務的路由政策"""
+
+    def __init__(self, slo_seconds: Optional[float] = None, queue_threshold: Optional[int] = None,
+                 budget_per_hour: Optional[float] = None, prefer: str = PREFER_LATENCY,
+                 error_threshold: int = 3, max_error_rate: float = 0.5, cooldown_seconds: float = 30.0):
+        if prefer not in (PREFER_LATENCY, PREFER_COST):
+            raise ValueError(f"未知的退路偏好: {prefer}")
+        self.slo_seconds = slo_seconds          # 預估延遲超過時改用較快的路由
+        self.queue_threshold = queue_threshold  # 進行中請求數達此值時視為佇列過深
+        self.budget_per_hour = budget_per_hour  # 最近一小時成本超過時改用最便宜的路由
+        self.prefer = prefer                    # 佇列過深時偏好較快或較便宜的路由
+        self.error_threshold = error_threshold  # 連續失敗幾次後暫停路由
+        self.max_error_rate = max_error_rate    # 錯誤率（EWMA）達此值時暫停路由
+        self.cooldown_seconds = cooldown_seconds
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Policy":
+        return cls(**data)
+
+
+class ModelRouter:
+    """
+    依政策為每次請求選擇路由，並回收延遲與錯誤統計
+
+    select() 與 attempt() 可在事件迴圈或執行緒池中呼叫（統計以鎖保護）。
+    """
+
+    def __init__(self, routes: Optional[List[Route]] = None, policies: Optional[Dict[str, Policy]] = None):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, List[Route]] = {task: [] for task in TASKS}
+        for route in routes or []:
+            self._routes[route.task].append(route)
+        self._policies = {task: (policies or {}).get(task) or Policy() for task in TASKS}
+        self._inflight = {task: 0 for task in TASKS}
+        self._spending: Dict[str, Deque[Tuple[float, float]]] = {task: deque() for task in TASKS}
+        self._decisions = {task: {} for task in TASKS}
+        self._clients: Dict[Tuple[Optional[str], str], "OpenAI"] = {}
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ModelRouter":
+        return cls(
+            [Route.from_dict(r) for r in config.get("routes", [])],
+            {task: Policy.from_dict(p) for task, p in config.get("policies", {}).items()},
+        )
+
+    def routes(self, task: str, default_model: str) -> List[Route]:
+        """任務的路由；未設定時建立使用預設模型的路由"""
+        routes = self._routes[task]
+        if not routes:
+            with self._lock:
+                if not routes:
+                    routes.append(Route(f"{task}:{default_model}", task, default_model))
+        return routes
+
+    def signature(self, task: str, default_model: str) -> Tuple[str, ...]:
+        """任務可能使用的模型（結果快取鍵的一部分：路由設定改變時舊結果失效）"""
+        return tuple(route.model for route in self.routes(task, default_model))
+
+    def select(self, task: str, default_model: str, units: float = 0.0,
+               queue_depth: Optional[int] = None) -> Route:
+        """
+        為一次請求選擇路由
+
+        Args:
+            task: 任務類型
+            default_model: 任務未設定路由時使用的模型
+            units: 輸入大小（轉錄為音訊分鐘數、翻譯為字幕條數、筆記為千字數）
+            queue_depth: 呼叫端的排隊數；省略時使用此任務進行中的請求數
+        """
+        routes = self.routes(task, default_model)
+        policy = self._policies[task]
+        now = time.monotonic()
+        with self._lock:
+            fitting = [r for r in routes if r.max_units is None or units <= r.max_units] or routes
+            available = [
+                r for r in fitting
+                if r.cooldown_until <= now and (r.max_concurrency is None or r.inflight < r.max_concurrency)
+            ] or fitting
+            depth = self._inflight[task] if queue_depth is None else queue_depth
+
+            def latency_key(r: Route):
+                estimate = r.estimate(units)
+                return (estimate if estimate is not None else 0.0, r.cost)
+
+            def cost_key(r: Route):
+                return (r.cost, latency_key(r)[0])
+
+            if policy.budget_per_hour is not None and \
+                    self._spent(task, now) + available[0].cost * units > policy.budget_per_hour:
+                route, reason = min(available, key=cost_key), REASON_BUDGET
+            elif policy.queue_threshold is not None and depth >= policy.queue_threshold:
+                route = min(available, key=latency_key if policy.prefer == PREFER_LATENCY else cost_key)
+                reason = REASON_QUEUE
+            elif policy.slo_seconds is not None:
+                within = [r for r in available if (r.estimate(units) or 0.0) <= policy.slo_seconds]
+                route = within[0] if within else min(available, key=latency_key)
+                reason = REASON_PREFERRED if route is available[0] else REASON_SLO
+            else:
+                route, reason = available[0], REASON_PREFERRED
+            if reason == REASON_PREFERRED and route is not routes[0]:
+                reason = REASON_FALLBACK
+
+            decisions = self._decisions[task]
+            decisions[reason] = decisions.get(reason, 0) + 1
+        if reason != REASON_PREFERRED and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("路由 %s → %s（%s，佇列 %d）", task, route.name, reason, depth)
+        return route
+
+    @contextmanager
+    def attempt(self, route: Route, units: float = 0.0) -> Iterator[Route]:
+        """包住一次 API 呼叫，記錄延遲與錯誤；成本在呼叫開始時計入（同時送出的請求不會一起超出預算）"""
+        cost = route.cost * units
+        with self._lock:
+            route.inflight += 1
+            self._inflight[route.task] += 1
+            if cost:
+                route.spent += cost
+                self._spending[route.task].append((time.monotonic(), cost))
+        start = time.perf_counter()
+        try:
+            yield route
+        except Exception:
+            self._record(route, time.perf_counter() - start, units, ok=False)
+            raise
+        except BaseException:
+            # 取消不算路由錯誤
+            self._record(route, None, units, ok=False)
+            raise
+        self._record(route, time.perf_counter() - start, units, ok=True)
+
+    def _record(self, route: Route, elapsed: Optional[float], units: float, ok: bool):
+        policy = self._policies[route.task]
+        now = time.monotonic()
+        with self._lock:
+            route.inflight -= 1
+            self._inflight[route.task] -= 1
+            if elapsed is None:
+                return
+            route.calls += 1
+            route.ewma_error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - route.ewma_error_rate)
+            if not ok:
+                route.errors += 1
+                route.consecutive_errors += 1
+                # 暫停期滿後再失敗（計數與錯誤率仍高）會立即再次暫停
+                if route.consecutive_errors >= policy.error_threshold or \
+                        (route.calls >= policy.error_threshold and route.ewma_error_rate >= policy.max_error_rate):
+                    route.cooldown_until = now + policy.cooldown_seconds
+                    logger.warning("路由 %s 失敗（連續 %d 次，錯誤率 %.2f），暫停 %.0f 秒", route.name,
+                                   route.consecutive_errors, route.ewma_error_rate, policy.cooldown_seconds)
+                return
+            route.consecutive_errors = 0
+            route.ewma_latency = elapsed if route.ewma_latency is None else \
+                route.ewma_latency + EWMA_ALPHA * (elapsed - route.ewma_latency)
+            if units > 0:
+                per_unit = elapsed / units
+                route.ewma_unit_latency = per_unit if route.ewma_unit_latency is None else \
+                    route.ewma_unit_latency + EWMA_ALPHA * (per_unit - route.ewma_unit_latency)
+
+    def _spent(self, task: str, now: float) -> float:
+        """最近一小時的成本（需持有鎖）"""
+        spending = self._spending[task]
+        while spending and spending[0][0] < now - BUDGET_WINDOW_SECONDS:
+            spending.popleft()
+        return sum(cost for _, cost in spending)
+
+    def client(self, route: Route) -> "OpenAI":
+        """路由端點的同步客戶端（依端點共用）"""
+        key = (route.base_url, route.api_key_env)
+        client = self._clients.get(key)
+        if client is None:
+            from openai import OpenAI
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = OpenAI(api_key=_api_key(route), base_url=route.base_url)
+        return client
+
+    def async_client(self, route: Route) -> "AsyncOpenAI":
+        """路由端點的非同步客戶端（依事件迴圈與端點共用）"""
+        clients = self._async_clients.setdefault(asyncio.get_running_loop(), {})
+        key = (route.base_url, route.api_key_env)
+        client = clients.get(key)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = clients[key] = AsyncOpenAI(api_key=_api_key(route), base_url=route.base_url)
+        return client
+
+    async def warm_up(self, defaults: Dict[str, str]) -> int:
+        """
+        預先建立各任務所有路由的同步與非同步客戶端（就緒檢查前呼叫）
+
+        Args:
+            defaults: {任務: 未設定路由時使用的模型}
+
+        Returns:
+            路由數
+        """
+        routes = [route for task, model in defaults.items() for route in self.routes(task, model)]
+        # 首次載入 openai 約需數百毫秒，在執行緒中進行以免阻塞事件迴圈
+        await asyncio.to_thread(lambda: [self.client(route) for route in routes])
+        for route in routes:
+            self.async_client(route)
+        return len(routes)
+
+    async def aclose(self):
+        """關閉此路由器建立的客戶端（替換路由器或關閉服務時呼叫）"""
+        for client in self._async_clients.pop(asyncio.get_running_loop(), {}).values():
+            await client.close()
+        for client in self._clients.values():
+            client.close()
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                task: {
+                    "inflight": self._inflight[task],
+                    "spent_last_hour": round(self._spent(task, now), 4),
+                    "decisions": dict(self._decisions[task]),
+                    "routes": {route.name: route.stats(now) for route in self._routes[task]},
+                }
+                for task in TASKS
+            }
+
+
+def _api_key(route: Route) -> str:
+    api_key = os.getenv(route.api_key_env)
+    if not api_key:
+        raise ValueError(f"{route.api_key_env} 環境變數未設定")
+    return api_key
+
+
+def load_config(value: Optional[str]) -> Dict[str, Any]:
+    """MODEL_ROUTES：JSON 字串或 JSON 檔案路徑"""
+    if not value:
+        return {}
+    if value.lstrip().startswith("{"):
+        return json.loads(value)
+    with open(value, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_router() -> ModelRouter:
+    """取得行程共用的路由器（首次使用時依 MODEL_ROUTES 建立）"""
+    global _router
+    if _router is None:
+        _router = ModelRouter.from_config(load_config(os.getenv("MODEL_ROUTES")))
+    return _router
+
+
+def configure(router: ModelRouter):
+    """替換行程共用的路由器（基準測試或測試用）"""
+    global _router
+    _router = router
@@ -3,11 +3,16 @@
 """
 import os
 import json
-from openai import OpenAI
+from typing import List, Tuple
 
+import tracing
+from model_router import TASK_NOTES, get_router
 
-# 筆記生成使用的模型
+
+# 筆記生成使用的模型（未設定筆記路由時）
 NOTE_MODEL = "gpt-4o-mini"  # 輕量模型，速度快、成本低
+# 提示詞版本：修改提示詞時遞增，使先前快取的筆記失效
+NOTE_PROMPT_VERSION = 1
 
 
 async def generate_notes(transcript_text: str, language: str = "original") -> dict:
@@ -25,7 +30,10 @@ async def generate_notes(transcript_text: str, language: str = "original") -> di
     if not api_key:
         raise ValueError("OPENAI_API_KEY 環境變數未設定")
     
-    client = OpenAI(api_key=api_key)
+    # 依逐字稿長度與負載選擇模型與端點
+    router = get_router()
+    units = len(transcript_text) / 1000
+    route = router.select(TASK_NOTES, NOTE_MODEL, units=units)
     
     # 根據語言選擇系統提示
     if language == "traditional":
@@ -55,21 +63,24 @@ async def generate_notes(transcript_text: str, language: str = "original") -> di
 請確保回應是有效的 JSON 格式。"""
     
     try:
-        response = client.chat.completions.create(
-            model=NOTE_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": f"請為以下影片轉錄文字生成筆記：\n\n{transcript_text}"
-                }
-            ],
-            temperature=0.7,
-            response_format={"type": "json_object"}
-        )
+        with router.attempt(route, units), \
+                tracing.span("openai.chat.completions", purpose="notes", language=language,
+                             model=route.model, route=route.name):
+            response = await router.async_client(route).chat.completions.create(
+                model=route.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": system_prompt
+                    },
+                    {
+                        "role": "user",
+                        "content": f"請為以下影片轉錄文字生成筆記：\n\n{transcript_text}"
+                    }
+                ],
+                temperature=0.7,
+                response_format={"type": "json_object"}
+            )
         
         notes_json = response.choices[0].message.content
         notes = json.loads(notes_json)
@@ -90,6 +101,17 @@ async def generate_bilingual_notes(transcript_text: str) -> dict:
     Returns:
         包含 original 和 traditional 兩個版本的字典
     """
+    result, _ = await generate_bilingual_notes_with_status(transcript_text)
+    return result
+
+
+async def generate_bilingual_notes_with_status(transcript_text: str) -> Tuple[dict, List[str]]:
+    """
+    生成雙語版本的筆記，並回傳生成失敗的語言
+    
+    Returns:
+        (筆記字典, 失敗的語言列表)；失敗的語言以另一版本替代，兩者皆失敗時皆為 None
+    """
     # 並行生成兩種版本
     import asyncio
     
@@ -105,6 +127,7 @@ async def generate_bilingual_notes(transcript_text: str) -> dict:
         "original": original_notes if not isinstance(original_notes, Exception) else None,
         "traditional": traditional_notes if not isinstance(traditional_notes, Exception) else None
     }
+    failed = [language for language, notes in result.items() if notes is None]
     
     # 如果原文生成失敗但繁中成功，使用繁中作為備用
     if result["original"] is None and result["traditional"] is not None:
@@ -113,5 +136,4 @@ async def generate_bilingual_notes(transcript_text: str) -> dict:
     elif result["traditional"] is None and result["original"] is not None:
         result["traditional"] = result["original"]
     
-    return result
-
+    return result, failed
@@ -5,22 +5,36 @@ import asyncio
 import websockets
 import json
 import base64
+import logging
 import os
 import wave
-from typing import AsyncIterator, Dict, Any
+from typing import AsyncIterator, Awaitable, Dict, Any, Optional
+
+from logging_setup import Sampler
+
+
+logger = logging.getLogger(__name__)
+
+# 高頻事件（每個音訊 chunk、每條字幕）的取樣器，所有會話共用
+_progress_sampler = Sampler()
+_cue_sampler = Sampler()
+
+# Realtime API 端點（可透過環境變數指向本地 mock 伺服器）
+DEFAULT_REALTIME_URL = "wss://api.openai.com/v1/realtime?model=gpt-realtime-mini-2025-10-06"
 
 
 class RealtimeTranscriptionClient:
     """OpenAI Realtime API 轉錄客戶端"""
     
-    def __init__(self):
+    def __init__(self, realtime_url: Optional[str] = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY 環境變數未設定")
         
-        self.realtime_url = "wss://api.openai.com/v1/realtime?model=gpt-realtime-mini-2025-10-06"
+        self.realtime_url = realtime_url or os.getenv("OPENAI_REALTIME_URL", DEFAULT_REALTIME_URL)
         self.sample_rate = 24000
         self.chunk_size = 4096
+        self.drain_timeout = 10.0  # 音訊送完後等待剩餘轉錄結果的最長閒置時間（秒）
         self._audio_send_progress = None  # 用於追蹤音訊發送進度
     
     async def transcribe_audio_file(self, audio_path: str) -> AsyncIterator[Dict[str, Any]]:
@@ -34,78 +48,111 @@ class RealtimeTranscriptionClient:
             字幕資料字典: {start_time, end_time, text}
         """
         # 先獲取音訊檔案資訊
-        import wave
         with wave.open(audio_path, 'rb') as wav_file:
             sample_rate = wav_file.getframerate()
             total_frames = wav_file.getnframes()
             audio_duration = total_frames / sample_rate
-            print(f"音訊檔案資訊: {audio_duration:.2f} 秒, {total_frames} frames, {sample_rate} Hz")
+            logger.info("音訊檔案資訊: %.2f 秒, %d frames, %d Hz", audio_duration, total_frames, sample_rate)
         
-        async with websockets.connect(
+        async with self._connect() as websocket:
+            await self._configure_session(websocket)
+            async for subtitle in self._run_session(
+                websocket, self._send_audio_data(websocket, audio_path)
+            ):
+                yield subtitle
+    
+    async def transcribe_stream(self, audio_chunks: AsyncIterator[bytes],
+                                sample_rate: int = 24000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        轉錄即時 PCM 串流（16-bit mono）並產生字幕
+        
+        Args:
+            audio_chunks: 非同步產生 PCM 位元組的迭代器，結束即代表串流結束
+            sample_rate: 串流採樣率 (預設 24000 Hz)
+            
+        Yields:
+            字幕資料字典: {id, start_time, end_time, text}
+        """
+        async with self._connect() as websocket:
+            await self._configure_session(websocket)
+            async for subtitle in self._run_session(
+                websocket, self._send_audio_stream(websocket, audio_chunks, sample_rate)
+            ):
+                yield subtitle
+    
+    def _connect(self):
+        """建立 Realtime API WebSocket 連接"""
+        return websockets.connect(
             self.realtime_url,
             additional_headers={
                 "Authorization": f"Bearer {self.api_key}",
                 "OpenAI-Beta": "realtime=v1"
             }
-        ) as websocket:
-            # 配置轉錄會話
-            # 對於預錄檔案，使用較寬鬆的 VAD 設定以確保完整轉錄
-            session_config = {
-                "type": "session.update",
-                "session": {
-                    "input_audio_transcription": {
-                        "model": "whisper-1"
-                    },
-                    "turn_detection": {
-                        "type": "server_vad",
-                        "threshold": 0.3,  # 降低閾值，更容易檢測語音
-                        "prefix_padding_ms": 500,  # 增加前綴填充
-                        "silence_duration_ms": 1000  # 增加靜音持續時間，避免過早分段
-                    }
+        )
+    
+    async def _configure_session(self, websocket):
+        """配置轉錄會話"""
+        # 對於預錄檔案，使用較寬鬆的 VAD 設定以確保完整轉錄
+        session_config = {
+            "type": "session.update",
+            "session": {
+                "input_audio_transcription": {
+                    "model": "whisper-1"
+                },
+                "turn_detection": {
+                    "type": "server_vad",
+                    "threshold": 0.3,  # 降低閾值，更容易檢測語音
+                    "prefix_padding_ms": 500,  # 增加前綴填充
+                    "silence_duration_ms": 1000  # 增加靜音持續時間，避免過早分段
                 }
             }
-            await websocket.send(json.dumps(session_config))
-            print("轉錄會話已配置")
-            
-            # 使用 Queue 來收集轉錄結果
-            subtitle_queue = asyncio.Queue()
-            send_complete = asyncio.Event()
-            receive_complete = asyncio.Event()
-            error_occurred = asyncio.Event()
-            error_message = [None]
-            
-            # 啟動發送任務
-            async def send_wrapper():
-                try:
-                    await self._send_audio_data(websocket, audio_path)
-                    # 發送結束訊號，告訴 API 音訊已全部發送
-                    try:
-                        await websocket.send(json.dumps({
-                            "type": "input_audio_buffer.commit"
-                        }))
-                        print("已發送所有音訊資料並提交")
-                    except websockets.exceptions.ConnectionClosed:
-                        print("連接已關閉，無法發送 commit")
-                    send_complete.set()
-                except Exception as e:
-                    error_message[0] = str(e)
-                    error_occurred.set()
-                    send_complete.set()
-            
-            # 啟動接收任務
-            async def receive_wrapper():
+        }
+        await websocket.send(json.dumps(session_config))
+        logger.debug("轉錄會話已配置")
+    
+    async def _run_session(self, websocket, send_coro: Awaitable[None]) -> AsyncIterator[Dict[str, Any]]:
+        """同時執行音訊發送與轉錄接收，並依序 yield 字幕"""
+        # 使用 Queue 來收集轉錄結果
+        subtitle_queue = asyncio.Queue()
+        send_complete = asyncio.Event()
+        receive_complete = asyncio.Event()
+        error_occurred = asyncio.Event()
+        error_message = [None]
+        
+        # 啟動發送任務
+        async def send_wrapper():
+            try:
+                await send_coro
+                # 發送結束訊號，告訴 API 音訊已全部發送
                 try:
-                    async for subtitle in self._receive_transcriptions(websocket):
-                        await subtitle_queue.put(subtitle)
-                    receive_complete.set()
-                except Exception as e:
-                    error_message[0] = str(e)
-                    error_occurred.set()
-                    receive_complete.set()
-            
-            send_task = asyncio.create_task(send_wrapper())
-            receive_task = asyncio.create_task(receive_wrapper())
-            
+                    await websocket.send(json.dumps({
+                        "type": "input_audio_buffer.commit"
+                    }))
+                    logger.debug("已發送所有音訊資料並提交")
+                except websockets.exceptions.ConnectionClosed:
+                    logger.warning("連接已關閉，無法發送 commit")
+                send_complete.set()
+            except Exception as e:
+                error_message[0] = str(e)
+                error_occurred.set()
+                send_complete.set()
+        
+        # 啟動接收任務
+        async def receive_wrapper():
+            try:
+                async for subtitle in self._receive_transcriptions(websocket):
+                    await subtitle_queue.put(subtitle)
+                receive_complete.set()
+            except Exception as e:
+                error_message[0] = str(e)
+                error_occurred.set()
+                receive_complete.set()
+        
+        send_task = asyncio.create_task(send_wrapper())
+        receive_task = asyncio.create_task(receive_wrapper())
+        
+        idle_since = None
+        try:
             # 持續 yield 字幕，直到接收完成
             while True:
                 # 檢查是否有錯誤
@@ -124,8 +171,16 @@ class RealtimeTranscriptionClient:
                         subtitle_queue.get(),
                         timeout=0.5
                     )
+                    idle_since = None
                     yield subtitle
                 except asyncio.TimeoutError:
+                    # 音訊已送完但伺服器遲遲不關閉連接時，主動結束會話
+                    if send_complete.is_set() and not receive_complete.is_set():
+                        loop_time = asyncio.get_running_loop().time()
+                        if idle_since is None:
+                            idle_since = loop_time
+                        elif loop_time - idle_since >= self.drain_timeout:
+                            await websocket.close()
                     # 如果 queue 為空，檢查是否應該結束
                     if send_complete.is_set() and receive_complete.is_set():
                         # 再檢查一次 queue 是否真的為空
@@ -135,10 +190,39 @@ class RealtimeTranscriptionClient:
                         except asyncio.QueueEmpty:
                             break
                     continue
-            
+        finally:
             # 等待任務完成（確保清理）
+            if not send_task.done():
+                send_task.cancel()
             await asyncio.gather(send_task, receive_task, return_exceptions=True)
     
+    async def _send_audio_stream(self, websocket, audio_chunks: AsyncIterator[bytes], sample_rate: int):
+        """發送即時 PCM 串流到 Realtime API，並追蹤時間進度"""
+        # 串流的 chunk 大小不固定，改以「樣本數」作為進度單位
+        self._audio_send_progress = {
+            "chunks_sent": 0,
+            "time_per_chunk": 1.0 / sample_rate,
+            "current_time": 0.0
+        }
+        samples_sent = 0
+        
+        try:
+            async for audio_data in audio_chunks:
+                if not audio_data:
+                    continue
+                
+                event = {
+                    "type": "input_audio_buffer.append",
+                    "audio": base64.b64encode(audio_data).decode('utf-8')
+                }
+                await websocket.send(json.dumps(event))
+                
+                samples_sent += len(audio_data) // 2  # 16-bit PCM
+                self._audio_send_progress["chunks_sent"] = samples_sent
+                self._audio_send_progress["current_time"] = samples_sent / sample_rate
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.info("WebSocket 連接已關閉: %s", e)
+    
     async def _send_audio_data(self, websocket, audio_path: str):
         """發送音訊資料到 Realtime API，並追蹤時間進度"""
         try:
@@ -162,7 +246,7 @@ class RealtimeTranscriptionClient:
                 # 計算每個 chunk 對應的時間（秒）
                 time_per_chunk = frames_per_chunk / sample_rate
                 
-                print(f"開始發送音訊: 總共 {total_frames} frames ({total_frames/sample_rate:.2f} 秒), {total_bytes} 位元組")
+                logger.info("開始發送音訊: 總共 %d frames (%.2f 秒), %d 位元組", total_frames, total_frames / sample_rate, total_bytes)
                 
                 # 將時間追蹤資訊存儲在類別變數中，供接收函數使用
                 self._audio_send_progress = {
@@ -196,26 +280,25 @@ class RealtimeTranscriptionClient:
                         self._audio_send_progress["chunks_sent"] = chunks_sent
                         self._audio_send_progress["current_time"] = chunks_sent * time_per_chunk
                         
-                        # 每發送 50 個 chunks 顯示進度
-                        if chunks_sent % 50 == 0:
-                            progress = (bytes_sent / total_bytes) * 100
-                            current_time = chunks_sent * time_per_chunk
-                            print(f"發送進度: {progress:.1f}% ({chunks_sent} chunks, {current_time:.2f}s)")
+                        # 取樣記錄進度（DEBUG 未啟用時不計算也不格式化）
+                        if logger.isEnabledFor(logging.DEBUG) and _progress_sampler():
+                            logger.debug("發送進度: %.1f%% (%d chunks, %.2fs)",
+                                         bytes_sent / total_bytes * 100, chunks_sent, chunks_sent * time_per_chunk)
                     except websockets.exceptions.ConnectionClosed:
                         # WebSocket 已關閉，停止發送
-                        print(f"WebSocket 連接已關閉，已發送 {bytes_sent}/{total_bytes} 位元組 ({chunks_sent} chunks)")
+                        logger.warning("WebSocket 連接已關閉，已發送 %d/%d 位元組 (%d chunks)", bytes_sent, total_bytes, chunks_sent)
                         break
                     
                     # 小延遲避免發送過快導致緩衝區溢出
                     await asyncio.sleep(0.001)  # 1ms 延遲
                 
-                print(f"音訊發送完成: {bytes_sent}/{total_bytes} 位元組 ({chunks_sent} chunks, {chunks_sent * time_per_chunk:.2f}s)")
+                logger.info("音訊發送完成: %d/%d 位元組 (%d chunks, %.2fs)", bytes_sent, total_bytes, chunks_sent, chunks_sent * time_per_chunk)
         
         except websockets.exceptions.ConnectionClosed as e:
             # 連接關閉是正常的（當接收完成時）
-            print(f"WebSocket 連接已關閉: {e}")
+            logger.info("WebSocket 連接已關閉: %s", e)
         except Exception as e:
-            print(f"發送音訊時出錯: {e}")
+            logger.error("發送音訊時出錯: %s", e)
             raise
     
     async def _receive_transcriptions(self, websocket) -> AsyncIterator[Dict[str, Any]]:
@@ -305,7 +388,9 @@ class RealtimeTranscriptionClient:
                             "text": transcript.strip()
                         }
                         
-                        print(f"字幕 {subtitle_id}: {subtitle_data['start_time']:.2f}s - {subtitle_data['end_time']:.2f}s ({len(transcript)} 字)")
+                        if logger.isEnabledFor(logging.DEBUG) and _cue_sampler():
+                            logger.debug("字幕 %d: %.2fs - %.2fs (%d 字)", subtitle_id,
+                                         subtitle_data["start_time"], subtitle_data["end_time"], len(transcript))
                         
                         yield subtitle_data
                         
@@ -330,13 +415,13 @@ class RealtimeTranscriptionClient:
                     error = event.get("error", {})
                     error_msg = error.get("message", "未知錯誤")
                     error_type = error.get("type", "")
-                    print(f"API 錯誤 [{error_type}]: {error_msg}")
+                    logger.error("API 錯誤 [%s]: %s", error_type, error_msg)
                     # 不立即 raise，讓接收繼續進行
         
         except websockets.exceptions.ConnectionClosed:
             # 連接關閉是正常的
             pass
         except Exception as e:
-            print(f"接收轉錄時出錯: {e}")
+            logger.error("接收轉錄時出錯: %s", e)
             raise
 
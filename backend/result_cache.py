@@ -0,0 +1,78 @@
+"""
+LLM 結果快取 - 以字幕文字 revision、模型與提示詞版本為鍵記住筆記與翻譯結果
+
+- 相同的鍵直接回傳已完成的結果，不再呼叫 API
+- 相同的鍵同時有多個請求時共用同一個進行中的計算（single-flight）；
+  計算在獨立的 task 中執行，個別請求取消不會中斷其他等待者
+- 計算失敗不快取，下一個請求重新計算
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+class ResultCache:
+    """有上限（LRU）的非同步結果快取"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._results: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key not in self._results:
+            return None
+        self._results.move_to_end(key)
+        return self._results[key]
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                             cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        取得鍵對應的結果；沒有時執行 compute（同一個鍵同時只執行一次）
+
+        Args:
+            key: 快取鍵（應包含內容 revision、模型與提示詞版本）
+            compute: 產生結果的協程函式
+            cache_if: 判斷結果是否可快取（例如部分失敗的結果不快取）
+        """
+        if key in self._results:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t, cache_if))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task, cache_if):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if cache_if is not None and not cache_if(result):
+            return
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._results),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+        }
@@ -0,0 +1,279 @@
+"""
+全文檢索索引 - 以 SQLite FTS5 索引所有影片的字幕、翻譯與筆記
+
+CJK 文字沒有空白分詞，因此寫入前在每個中日韓字元兩側插入分隔字元（CJK_SEPARATOR，
+unicode61 分詞器視為分隔且不會出現在字幕中），每個字元成為獨立 token；摘錄時移除分隔字元即還原原文。
+查詢時把連續的 CJK 字元轉為片語查詢，即可精確比對任意長度的子字串。
+
+摘錄中的字幕原文先做 HTML 跳脫，之後才插入 <mark> 標記，字幕內容不會成為有效的 HTML。
+每筆索引內容的 rowid 另記在 entry_keys（以影片與種類建立索引），清除時依 rowid 刪除，
+不需掃描整個 FTS 資料表（video_id / kind 為 UNINDEXED 欄位）。
+
+寫入會取得 SQLite 的寫入鎖：在事件迴圈中以 defer() 交給專用的寫入執行緒依序執行。
+取代某種類的內容（replace_cues、index_notes）在單一交易內清除並寫入，檢索不會看到中間狀態。
+"""
+import html
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+# 中日韓統一表意文字、假名、韓文音節
+CJK_PATTERN = r"[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]"
+_CJK_CHAR = re.compile(f"({CJK_PATTERN})")
+# 舊版索引以空白包住每個 CJK 字元
+_LEGACY_CJK = re.compile(f" ({CJK_PATTERN}) ")
+_QUERY_TERMS = re.compile(f"{CJK_PATTERN}+|[\\w']+")
+
+# 索引內容種類
+KIND_TEXT = "text"
+KIND_TRANSLATED = "translated_text"
+KIND_SUMMARY = "summary"
+KIND_KEYWORDS = "keywords"
+
+SNIPPET_START = "\x01"
+SNIPPET_END = "\x02"
+CJK_SEPARATOR = "\x1f"
+
+# 索引內容格式版本（PRAGMA user_version）：1 起以 CJK_SEPARATOR 分隔 CJK 字元
+INDEX_FORMAT = 1
+
+
+def tokenize_cjk(text: str) -> str:
+    """在每個 CJK 字元兩側插入分隔字元，讓 unicode61 分詞器逐字建立 token（移除與分隔、摘錄標記衝突的控制字元）"""
+    text = text.replace(SNIPPET_START, "").replace(SNIPPET_END, "").replace(CJK_SEPARATOR, "")
+    return _CJK_CHAR.sub(CJK_SEPARATOR + r"\1" + CJK_SEPARATOR, text)
+
+
+def _restore_cjk(text: str) -> str:
+    """移除 tokenize_cjk 插入的分隔字元（其餘字元原樣保留）"""
+    return text.replace(CJK_SEPARATOR, "")
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    將使用者查詢轉為安全的 FTS5 MATCH 表達式
+
+    每個詞都加上引號避免語法注入；CJK 連續字元成為片語，
+    最後一個拉丁詞使用前綴比對，所有詞以 AND 結合。
+    """
+    terms = _QUERY_TERMS.findall(query)
+    if not terms:
+        return None
+    parts = []
+    for i, term in enumerate(terms):
+        if _CJK_CHAR.match(term):
+            parts.append('"' + " ".join(term) + '"')
+        else:
+            escaped = term.replace('"', '""')
+            parts.append(f'"{escaped}"' + ("*" if i == len(terms) - 1 else ""))
+    return " AND ".join(parts)
+
+
+class SearchIndex:
+    """跨影片全文檢索索引（執行緒安全）"""
+
+    def __init__(self, db_path: str = "search_index.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-writer")
+
+    def defer(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """在寫入執行緒上依提交順序執行 fn(*args)（例如 self.add_cues），不阻塞呼叫端"""
+        return self._writer.submit(fn, *args)
+
+    def open(self) -> sqlite3.Connection:
+        """開啟資料庫並建立資料表（第一次使用時，建立物件本身不做磁碟 I/O）"""
+        if self._conn is not None:
+            return self._conn
+        with self._open_lock:
+            if self._conn is None:
+                self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5(
+                body,
+                video_id UNINDEXED,
+                cue_id UNINDEXED,
+                kind UNINDEXED,
+                start_time UNINDEXED,
+                end_time UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                filename TEXT
+            );
+        """)
+        has_keys = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entry_keys'"
+        ).fetchone()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entry_keys (
+                entry_rowid INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                kind TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entry_keys_video ON entry_keys (video_id, kind);
+        """)
+        if not has_keys:
+            # 舊版資料庫：由既有索引內容建立對照表
+            conn.execute("INSERT INTO entry_keys SELECT rowid, video_id, kind FROM entries")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_FORMAT:
+            # 舊版以空白包住 CJK 字元（摘錄無法與原文的空白區分）：還原後改用分隔字元
+            rows = conn.execute("SELECT rowid, body FROM entries").fetchall()
+            conn.executemany(
+                "UPDATE entries SET body = ? WHERE rowid = ?",
+                [(tokenize_cjk(_LEGACY_CJK.sub(r"\1", body)), rowid) for rowid, body in rows]
+            )
+            conn.execute(f"PRAGMA user_version = {INDEX_FORMAT}")
+        conn.commit()
+        return conn
+
+    def register_video(self, video_id: str, filename: str):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO videos (video_id, filename) VALUES (?, ?)", (video_id, filename)
+        ))
+
+    def _write(self, fn: Callable[[sqlite3.Connection], None]):
+        """在單一寫入交易中執行（多 worker 共用同一個資料庫：BEGIN IMMEDIATE 先取得寫入鎖）"""
+        with self._lock:
+            conn = self.open()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                fn(conn)
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, video_id: str, kinds: Optional[List[str]]):
+        if kinds:
+            where, params = "video_id = ? AND kind IN (%s)" % ",".join("?" * len(kinds)), [video_id, *kinds]
+        else:
+            where, params = "video_id = ?", [video_id]
+        rowids = conn.execute(f"SELECT entry_rowid FROM entry_keys WHERE {where}", params).fetchall()
+        conn.executemany("DELETE FROM entries WHERE rowid = ?", rowids)
+        conn.execute(f"DELETE FROM entry_keys WHERE {where}", params)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, rows: List[tuple]):
+        """寫入索引內容並記錄 rowid（在 _write 的交易內：rowid 配置不會與其他行程衝突）"""
+        if not rows:
+            return
+        last = conn.execute("SELECT rowid FROM entries ORDER BY rowid DESC LIMIT 1").fetchone()
+        first = (last[0] if last else 0) + 1
+        conn.executemany(
+            "INSERT INTO entries (rowid, body, video_id, cue_id, kind, start_time, end_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(first + i, *row) for i, row in enumerate(rows)]
+        )
+        conn.executemany(
+            "INSERT INTO entry_keys (entry_rowid, video_id, kind) VALUES (?, ?, ?)",
+            [(first + i, row[1], row[3]) for i, row in enumerate(rows)]
+        )
+
+    def clear_video(self, video_id: str, kinds: Optional[List[str]] = None):
+        """移除影片的索引內容（可只移除指定種類）"""
+        self._write(lambda conn: self._delete(conn, video_id, kinds))
+
+    @staticmethod
+    def _cue_rows(video_id: str, subtitles: List[Dict[str, Any]], kind: str) -> List[tuple]:
+        return [
+            (tokenize_cjk(s[kind]), video_id, s["id"], kind, s["start_time"], s["end_time"])
+            for s in subtitles if s.get(kind)
+        ]
+
+    def add_cues(self, video_id: str, subtitles: List[Dict[str, Any]], kind: str = KIND_TEXT):
+        """增量加入字幕（kind 為 text 或 translated_text）"""
+        rows = self._cue_rows(video_id, subtitles, kind)
+        if rows:
+            self._write(lambda conn: self._insert(conn, rows))
+
+    def replace_cues(self, video_id: str, subtitles: List[Dict[str, Any]], kind: str = KIND_TEXT):
+        """以新字幕取代影片某種類的全部索引（單一交易）"""
+        rows = self._cue_rows(video_id, subtitles, kind)
+
+        def write(conn):
+            self._delete(conn, video_id, [kind])
+            self._insert(conn, rows)
+        self._write(write)
+
+    def index_notes(self, video_id: str, notes: Dict[str, Any]):
+        """索引雙語筆記的摘要與關鍵詞（單一交易取代先前的筆記索引）"""
+        rows = []
+        for version in ("original", "traditional"):
+            single = notes.get(version) or {}
+            if single.get("summary"):
+                rows.append((tokenize_cjk(single["summary"]), video_id, None, KIND_SUMMARY, None, None))
+            keywords = single.get("keywords") or []
+            if keywords:
+                rows.append((tokenize_cjk(" ".join(map(str, keywords))), video_id, None, KIND_KEYWORDS, None, None))
+
+        def write(conn):
+            self._delete(conn, video_id, [KIND_SUMMARY, KIND_KEYWORDS])
+            self._insert(conn, rows)
+        self._write(write)
+
+    def search(self, query: str, limit: int = 20, offset: int = 0,
+               video_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        全文檢索
+
+        Returns:
+            {"hits": [...], "took_ms": float}；每個 hit 包含影片、字幕 id、時間戳與摘錄
+        """
+        start = time.perf_counter()
+        match = build_match_query(query)
+        if match is None:
+            return {"hits": [], "took_ms": 0.0}
+
+        sql = """
+            SELECT e.video_id, v.filename, e.cue_id, e.kind, e.start_time, e.end_time,
+                   snippet(entries, 0, ?, ?, '…', 16), bm25(entries)
+            FROM entries e LEFT JOIN videos v ON v.video_id = e.video_id
+            WHERE entries MATCH ?
+        """
+        params: List[Any] = [SNIPPET_START, SNIPPET_END, match]
+        if video_id:
+            sql += " AND e.video_id = ?"
+            params.append(video_id)
+        sql += " ORDER BY bm25(entries) LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        with self._lock:
+            rows = self.open().execute(sql, params).fetchall()
+
+        hits = []
+        for vid, filename, cue_id, kind, start_time, end_time, snippet, score in rows:
+            snippet = html.escape(_restore_cjk(snippet)).replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+            hits.append({
+                "video_id": vid,
+                "filename": filename,
+                "cue_id": cue_id,
+                "kind": kind,
+                "start_time": start_time,
+                "end_time": end_time,
+                "snippet": snippet,
+                "score": round(-score, 4),
+            })
+        return {"hits": hits, "took_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    def close(self):
+        """等待已提交的寫入完成後關閉連線（之後再使用時重新開啟）"""
+        self._writer.submit(lambda: None).result()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,375 @@
+"""
+儲存空間管理 - uploads/、audio_cache/、stream_cache/ 的配額、淘汰與分片目錄
+
+每個儲存區（StorageArea）依影片 id 前兩個字元分片子目錄（最多 256 個），避免單一目錄
+累積大量檔案。每個檔案或目錄（Whisper 分段、HLS 區段）是一個項目，記錄大小、
+最後存取時間與所屬影片：
+
+- 配額：總大小超過 quota_bytes 時依最久未存取（LRU）淘汰
+- TTL：超過 ttl_seconds 未存取的項目淘汰
+- 可丟棄項目（可由原始影片重新產生的衍生檔，如轉錄完成後的 WAV）在所屬影片沒有進行中的工作時清除
+- 進行中的工作以 pin(owner) 標記，所屬影片的項目一律不淘汰
+
+選出淘汰項目只更新記憶體中的帳目（在事件迴圈中呼叫），實際刪除由 delete_paths 在背景執行緒進行。
+"""
+import logging
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+_SHARD = re.compile(r"^[0-9a-f]{2}$")
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_size(value: Optional[str]) -> Optional[int]:
+    """解析容量設定（例如 "500M"、"20G"）；未設定或 0 表示不限制"""
+    if not value:
+        return None
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", value, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"無效的容量設定: {value}")
+    size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+    return size or None
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """解析時間長度設定（例如 "3600"、"12h"、"7d"）；未設定或 0 表示不限制"""
+    if not value:
+        return None
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", value, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"無效的時間設定: {value}")
+    seconds = float(match.group(1)) * _DURATION_UNITS[match.group(2).lower()]
+    return seconds or None
+
+
+def disk_usage(path: str) -> int:
+    """檔案或目錄（遞迴）佔用的位元組數；不存在時為 0"""
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+    except OSError:
+        return 0
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def delete_paths(paths: List[str]):
+    """刪除檔案或目錄（已不存在者略過）"""
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("刪除失敗 %s: %s", path, e)
+
+
+def owner_of(name: str) -> str:
+    """由檔名推得所屬影片 id（<video_id>_xxx、<video_id>.xxx 或 <video_id>）"""
+    return name.split("_", 1)[0].split(".", 1)[0]
+
+
+@dataclass
+class StorageEntry:
+    path: str
+    owner: str
+    size: int
+    last_access: float
+    expendable: bool = False
+
+
+class StorageArea:
+    """單一目錄的儲存區：分片子目錄、配額與 TTL"""
+
+    def __init__(self, name: str, root: Path, quota_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries: Dict[str, StorageEntry] = {}
+        self.used_bytes = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def path_for(self, owner: str, name: str) -> Path:
+        """項目在分片子目錄中的路徑（必要時建立子目錄）"""
+        shard = self.root / owner[:2].lower()
+        shard.mkdir(parents=True, exist_ok=True)
+        return shard / name
+
+    def add(self, owner: str, path, expendable: bool = False) -> StorageEntry:
+        """登記（或更新）項目並計算大小"""
+        path = str(path)
+        self.discard(path)
+        entry = StorageEntry(path, owner, disk_usage(path), time.time(), expendable)
+        self.entries[path] = entry
+        self.used_bytes += entry.size
+        return entry
+
+    def discard(self, path) -> Optional[StorageEntry]:
+        """從帳目移除項目（不刪除檔案）"""
+        entry = self.entries.pop(str(path), None)
+        if entry:
+            self.used_bytes -= entry.size
+        return entry
+
+    def restore(self, entry: StorageEntry):
+        """將已選為淘汰、但尚未刪除的項目放回帳目"""
+        self.entries[entry.path] = entry
+        self.used_bytes += entry.size
+        self.evictions -= 1
+        self.evicted_bytes -= entry.size
+
+    def touch(self, path):
+        entry = self.entries.get(str(path))
+        if entry:
+            entry.last_access = time.time()
+
+    def mark_expendable(self, path) -> bool:
+        entry = self.entries.get(str(path))
+        if entry:
+            entry.expendable = True
+        return entry is not None
+
+    def over_quota(self) -> bool:
+        return self.quota_bytes is not None and self.used_bytes > self.quota_bytes
+
+    def scan(self):
+        """
+        重建帳目：登記根目錄與分片子目錄下的所有項目（舊版未分片的項目也一併納入）
+
+        已在帳目中的項目保留其最後存取時間與可丟棄標記。
+        """
+        previous = self.entries
+        self.entries = {}
+        self.used_bytes = 0
+        if not self.root.is_dir():
+            return
+        for item in self.root.iterdir():
+            children = item.iterdir() if item.is_dir() and _SHARD.match(item.name) else [item]
+            for child in children:
+                entry = self.add(owner_of(child.name), child)
+                try:
+                    entry.last_access = child.stat().st_mtime
+                except OSError:
+                    pass
+                known = previous.get(entry.path)
+                if known:
+                    entry.last_access = max(entry.last_access, known.last_access)
+                    entry.expendable = known.expendable
+
+    def select_victims(self, pinned, now: Optional[float] = None) -> List[StorageEntry]:
+        """
+        選出要淘汰的項目並從帳目移除
+
+        順序：可丟棄項目 → 超過 TTL → 依 LRU 直到不超過配額；pinned 影片的項目一律保留。
+        """
+        now = now or time.time()
+        candidates = sorted(
+            (e for e in self.entries.values() if e.owner not in pinned),
+            key=lambda e: e.last_access
+        )
+        victims = [
+            e for e in candidates
+            if e.expendable or (self.ttl_seconds is not None and now - e.last_access > self.ttl_seconds)
+        ]
+        chosen = {e.path for e in victims}
+        if self.quota_bytes is not None:
+            excess = self.used_bytes - sum(e.size for e in victims) - self.quota_bytes
+            for entry in candidates:
+                if excess <= 0:
+                    break
+                if entry.path not in chosen:
+                    victims.append(entry)
+                    excess -= entry.size
+
+        for entry in victims:
+            self.discard(entry.path)
+            self.evictions += 1
+            self.evicted_bytes += entry.size
+        return victims
+
+    def stats(self) -> Dict:
+        try:
+            free_bytes = shutil.disk_usage(self.root).free
+        except OSError:
+            free_bytes = None
+        return {
+            "root": str(self.root),
+            "used_bytes": self.used_bytes,
+            "entries": len(self.entries),
+            "expendable_entries": sum(1 for e in self.entries.values() if e.expendable),
+            "quota_bytes": self.quota_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+            "disk_free_bytes": free_bytes,
+        }
+
+
+class StorageManager:
+    """
+    管理多個儲存區與進行中工作的標記
+
+    on_release 會在某部影片的所有工作結束、或登記後超過配額時呼叫，用來喚醒清理任務。
+    多 worker 部署時 shared 為共用狀態（cluster.ClusterState），保留標記與可丟棄標記會同步給
+    負責清理的 worker；寫入由共用狀態的寫入執行緒執行，讀取以 shared_marks 在背景執行緒進行，
+    事件迴圈上的呼叫都不查詢資料庫。
+    """
+
+    def __init__(self, areas: Dict[str, StorageArea]):
+        self.areas = areas
+        self.regenerations = 0
+        self.on_release: Optional[Callable[[], None]] = None
+        self.shared = None
+        self._pins: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls, roots: Dict[str, Path]) -> "StorageManager":
+        """
+        依環境變數建立儲存區：STORAGE_<NAME>_QUOTA（例如 20G）、STORAGE_<NAME>_TTL（例如 7d）
+        """
+        areas = {}
+        for name, root in roots.items():
+            prefix = f"STORAGE_{name.upper()}"
+            areas[name] = StorageArea(
+                name, root,
+                quota_bytes=parse_size(os.getenv(f"{prefix}_QUOTA")),
+                ttl_seconds=parse_duration(os.getenv(f"{prefix}_TTL")),
+            )
+        return cls(areas)
+
+    def add(self, area: str, owner: str, path, expendable: bool = False):
+        self.areas[area].add(owner, path, expendable)
+        if self.areas[area].over_quota():
+            self._notify()
+
+    def touch(self, path):
+        for area in self.areas.values():
+            area.touch(path)
+
+    def mark_expendable(self, path):
+        """標記為可丟棄；所屬影片沒有進行中的工作時由下一次清理刪除"""
+        if self.shared is not None:
+            self.shared.mark_expendable(str(path))
+        for area in self.areas.values():
+            if area.mark_expendable(path):
+                if area.entries[str(path)].owner not in self._pins:
+                    self._notify()
+                return
+
+    def pin(self, owner: str):
+        if owner not in self._pins and self.shared is not None:
+            self.shared.pin(owner)
+        self._pins[owner] = self._pins.get(owner, 0) + 1
+
+    def unpin(self, owner: str):
+        count = self._pins.get(owner, 0) - 1
+        if count > 0:
+            self._pins[owner] = count
+        else:
+            self._pins.pop(owner, None)
+            if self.shared is not None:
+                self.shared.unpin(owner)
+            self._notify()
+
+    @contextmanager
+    def in_use(self, owner: str):
+        """工作期間保留影片的所有項目"""
+        self.pin(owner)
+        try:
+            yield
+        finally:
+            self.unpin(owner)
+
+    def is_pinned(self, owner: str) -> bool:
+        return owner in self._pins
+
+    def pinned_owners(self, shared_pinned: Iterable[str] = ()) -> set:
+        """有進行中工作的影片（多 worker 部署時加上 shared_pinned：其他 worker 的標記）"""
+        return set(self._pins).union(shared_pinned)
+
+    def shared_marks(self) -> Tuple[Set[str], Set[str]]:
+        """
+        讀取共用狀態中的保留標記與可丟棄標記：(影片 id, 路徑)
+
+        會查詢資料庫：多 worker 部署時在背景讀取執行緒呼叫（ClusterState.fetch），結果交給 select_victims。
+        """
+        if self.shared is None:
+            return set(), set()
+        return self.shared.pinned(), self.shared.expendable()
+
+    def select_victims(self, now: Optional[float] = None, shared_pinned: Iterable[str] = (),
+                       shared_expendable: Iterable[str] = ()) -> List[Tuple[str, StorageEntry]]:
+        """
+        所有儲存區中要淘汰的項目（已從帳目移除，需再呼叫 delete_paths 刪除）
+
+        shared_pinned / shared_expendable 為 shared_marks() 讀出的其他 worker 標記；本身不查詢資料庫。
+        選出到刪除之間影片可能開始新的工作：刪除前應以 release_pinned 重新確認。
+        """
+        pinned = self.pinned_owners(shared_pinned)
+        for path in shared_expendable:
+            for area in self.areas.values():
+                area.mark_expendable(path)
+        victims = [
+            (name, entry)
+            for name, area in self.areas.items()
+            for entry in area.select_victims(pinned, now)
+        ]
+        if self.shared is not None and victims:
+            self.shared.forget_expendable([entry.path for _, entry in victims])
+        return victims
+
+    def release_pinned(self, victims: List[Tuple[str, StorageEntry]],
+                       shared_pinned: Iterable[str] = ()) -> List[Tuple[str, StorageEntry]]:
+        """選出後才開始工作的影片項目放回帳目（不刪除），回傳其餘仍要刪除的項目"""
+        pinned = self.pinned_owners(shared_pinned)
+        remaining = []
+        for name, entry in victims:
+            if entry.owner not in pinned:
+                remaining.append((name, entry))
+                continue
+            self.areas[name].restore(entry)
+            if entry.expendable and self.shared is not None:
+                self.shared.mark_expendable(entry.path)
+        return remaining
+
+    def create_roots(self):
+        """建立各儲存區的根目錄（服務啟動時呼叫）"""
+        for area in self.areas.values():
+            area.root.mkdir(parents=True, exist_ok=True)
+
+    def scan(self):
+        for area in self.areas.values():
+            area.scan()
+
+    def stats(self) -> Dict:
+        return {
+            "areas": {name: area.stats() for name, area in self.areas.items()},
+            "pinned_videos": len(self._pins),
+            "regenerations": self.regenerations,
+        }
+
+    def _notify(self):
+        if self.on_release:
+            self.on_release()
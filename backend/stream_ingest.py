@@ -0,0 +1,295 @@
+"""
+多路即時音訊接收服務 - 同時將多個 PCM 串流排程到 Realtime API 會話
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Any
+
+import tracing
+from realtime_client import RealtimeTranscriptionClient
+
+
+logger = logging.getLogger(__name__)
+
+# 預設參數
+DEFAULT_MAX_STREAMS = 500          # 單一程序可同時接收的串流數
+DEFAULT_MAX_SESSIONS = 200         # 同時開啟的 Realtime API 會話數
+DEFAULT_QUEUE_CHUNKS = 50          # 每個串流的緩衝 chunk 數（約 100ms/chunk → 5 秒）
+DEFAULT_BACKPRESSURE_TIMEOUT = 0.2 # 佇列滿時等待消費者的時間（秒），逾時即丟棄最舊資料
+DEFAULT_RETAIN_SECONDS = 300.0     # 串流結束後保留字幕與統計的秒數，之後即移除
+TCP_READ_SIZE = 4800               # 24kHz 16-bit mono 的 100ms
+
+
+class StreamLimitError(Exception):
+    """串流數量已達上限"""
+
+
+class StreamFailedError(Exception):
+    """串流的轉錄會話已失敗，不再接收音訊"""
+
+
+class IngestStream:
+    """單一輸入串流：有界佇列 + 統計資訊"""
+
+    def __init__(self, stream_id: str, queue_size: int, sample_rate: int = 24000):
+        self.stream_id = stream_id
+        self.sample_rate = sample_rate
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.subtitles: List[Dict[str, Any]] = []
+        self.translated_subtitles: List[Dict[str, Any]] = []
+        self.received_chunks = 0
+        self.received_bytes = 0
+        self.dropped_chunks = 0
+        self.created_at = time.time()
+        self.closed = False
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def put(self, chunk: bytes, timeout: float = DEFAULT_BACKPRESSURE_TIMEOUT) -> bool:
+        """
+        放入一個 PCM chunk
+
+        佇列已滿時先等待 timeout 秒（對生產者施加背壓），
+        仍無空間則丟棄最舊的 chunk，確保延遲不會無限增長。
+
+        Returns:
+            True 表示未發生丟棄
+
+        Raises:
+            StreamFailedError: 轉錄會話已失敗（生產者應結束連線）
+        """
+        if self.error is not None:
+            raise StreamFailedError(self.error)
+        if self.closed:
+            return False
+        self.received_chunks += 1
+        self.received_bytes += len(chunk)
+
+        try:
+            self.queue.put_nowait(chunk)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        try:
+            await asyncio.wait_for(self.queue.put(chunk), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            pass
+
+        # 卸載負載：丟棄最舊的音訊，保留最新的
+        try:
+            self.queue.get_nowait()
+            self.dropped_chunks += 1
+        except asyncio.QueueEmpty:
+            pass
+        try:
+            self.queue.put_nowait(chunk)
+        except asyncio.QueueFull:
+            self.dropped_chunks += 1
+        return False
+
+    def close(self):
+        """
+        標記串流結束，已緩衝的音訊仍會送完
+
+        佇列有空間時放入 None 作為結束哨兵（喚醒等待中的消費者）；
+        佇列已滿時消費者不會在等待，iter_chunks 取完剩餘資料後即結束。
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """依序取出 chunk，直到遇到結束哨兵或串流已結束且佇列已空"""
+        while True:
+            if self.closed and self.queue.empty():
+                return
+            chunk = await self.queue.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def stats(self) -> dict:
+        return {
+            "stream_id": self.stream_id,
+            "received_chunks": self.received_chunks,
+            "received_bytes": self.received_bytes,
+            "dropped_chunks": self.dropped_chunks,
+            "queued_chunks": self.queue.qsize(),
+            "subtitles": len(self.subtitles),
+            "closed": self.closed,
+            "error": self.error,
+        }
+
+
+class StreamIngestService:
+    """
+    多路串流接收服務
+
+    每個串流擁有自己的有界佇列與一個消費任務；消費任務在取得
+    會話名額（semaphore）後將音訊送往 Realtime API。尚未取得名額
+    的串流會在佇列內緩衝，溢出時丟棄最舊的資料。
+
+    轉錄結束的串流保留 retain_seconds 秒供查詢字幕，之後從 streams 移除，
+    其計數併入服務累計值。
+    """
+
+    def __init__(
+        self,
+        max_streams: int = DEFAULT_MAX_STREAMS,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        queue_size: int = DEFAULT_QUEUE_CHUNKS,
+        client_factory: Callable[[], RealtimeTranscriptionClient] = RealtimeTranscriptionClient,
+        on_subtitle: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+        retain_seconds: float = DEFAULT_RETAIN_SECONDS,
+    ):
+        self.max_streams = max_streams
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.client_factory = client_factory
+        self.on_subtitle = on_subtitle
+        self.retain_seconds = retain_seconds
+        self.streams: Dict[str, IngestStream] = {}
+        self.rejected_streams = 0
+        # 已移除串流的累計計數
+        self._retired = {"received_chunks": 0, "dropped_chunks": 0, "subtitles": 0}
+        self._session_slots = asyncio.Semaphore(max_sessions)
+        self._active_sessions = 0
+        self._tcp_server: Optional[asyncio.AbstractServer] = None
+
+    def open_stream(self, stream_id: str, sample_rate: int = 24000) -> IngestStream:
+        """開啟新串流，超過上限時拋出 StreamLimitError"""
+        if stream_id in self.streams and not self.streams[stream_id].closed:
+            raise ValueError(f"串流已存在: {stream_id}")
+        if self.active_stream_count() >= self.max_streams:
+            self.rejected_streams += 1
+            raise StreamLimitError(f"串流數量已達上限 ({self.max_streams})")
+        if stream_id in self.streams:
+            # 同名串流已結束：以新串流取代
+            self._retire(self.streams[stream_id])
+
+        stream = IngestStream(stream_id, self.queue_size, sample_rate)
+        self.streams[stream_id] = stream
+        stream.task = asyncio.create_task(self._consume(stream))
+        return stream
+
+    async def close_stream(self, stream_id: str, wait: bool = False):
+        """結束串流；wait=True 時等待剩餘音訊轉錄完成"""
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            return
+        stream.close()
+        if wait and stream.task:
+            await asyncio.gather(stream.task, return_exceptions=True)
+
+    def active_stream_count(self) -> int:
+        return sum(1 for s in self.streams.values() if not s.closed)
+
+    async def _consume(self, stream: IngestStream):
+        """取得會話名額後將串流送往 Realtime API"""
+        async with self._session_slots:
+            self._active_sessions += 1
+            try:
+                client = self.client_factory()
+                with tracing.span("ingest.session", stream_id=stream.stream_id) as span:
+                    async for subtitle in client.transcribe_stream(stream.iter_chunks(), stream.sample_rate):
+                        stream.subtitles.append(subtitle)
+                        if self.on_subtitle:
+                            result = self.on_subtitle(stream.stream_id, subtitle)
+                            if asyncio.iscoroutine(result):
+                                await result
+                    span.set_attribute("subtitles", len(stream.subtitles))
+                    span.set_attribute("dropped_chunks", stream.dropped_chunks)
+            except Exception as e:
+                stream.error = str(e)
+                logger.error("串流轉錄失敗: %s", e, extra={"stream_id": stream.stream_id})
+            finally:
+                self._active_sessions -= 1
+                stream.close()
+                stream.finished_at = time.time()
+                asyncio.get_running_loop().call_later(self.retain_seconds, self._retire, stream)
+
+    def _retire(self, stream: IngestStream):
+        """將已結束的串流移出 streams，計數併入累計值"""
+        if self.streams.get(stream.stream_id) is not stream:
+            return
+        del self.streams[stream.stream_id]
+        self._retired["received_chunks"] += stream.received_chunks
+        self._retired["dropped_chunks"] += stream.dropped_chunks
+        self._retired["subtitles"] += len(stream.subtitles)
+
+    async def handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        原始 TCP 協定：第一行為 stream_id（UTF-8，以 \\n 結尾），之後為 16-bit mono PCM
+
+        讀取迴圈會因 put() 的背壓而暫停，進而透過 TCP 視窗減緩發送端。
+        轉錄會話失敗時回傳 "ERROR <原因>" 並關閉連線。
+        """
+        stream = None
+        try:
+            header = await reader.readline()
+            stream_id = header.decode("utf-8").strip()
+            if not stream_id:
+                return
+            try:
+                stream = self.open_stream(stream_id)
+            except (StreamLimitError, ValueError) as e:
+                writer.write(f"ERROR {e}\n".encode("utf-8"))
+                await writer.drain()
+                return
+            writer.write(b"OK\n")
+            await writer.drain()
+
+            while True:
+                chunk = await reader.read(TCP_READ_SIZE)
+                if not chunk:
+                    break
+                await stream.put(chunk)
+        except StreamFailedError as e:
+            writer.write(f"ERROR {e}\n".encode("utf-8"))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if stream is not None:
+                stream.close()
+            writer.close()
+
+    async def start_tcp_server(self, host: str = "0.0.0.0", port: int = 9000,
+                               reuse_port: bool = False) -> asyncio.AbstractServer:
+        """啟動原始 TCP 接收伺服器（reuse_port=True 時多個行程可監聽同一個埠）"""
+        self._tcp_server = await asyncio.start_server(self.handle_tcp, host, port, reuse_port=reuse_port)
+        return self._tcp_server
+
+    async def shutdown(self):
+        """關閉所有串流與 TCP 伺服器"""
+        if self._tcp_server:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        streams = list(self.streams.values())
+        for stream in streams:
+            stream.close()
+        tasks = [s.task for s in streams if s.task]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """服務整體統計"""
+        streams = list(self.streams.values())
+        return {
+            "active_streams": self.active_stream_count(),
+            "active_sessions": self._active_sessions,
+            "max_streams": self.max_streams,
+            "max_sessions": self.max_sessions,
+            "rejected_streams": self.rejected_streams,
+            "retained_streams": len(streams),
+            "received_chunks": self._retired["received_chunks"] + sum(s.received_chunks for s in streams),
+            "dropped_chunks": self._retired["dropped_chunks"] + sum(s.dropped_chunks for s in streams),
+            "subtitles": self._retired["subtitles"] + sum(len(s.subtitles) for s in streams),
+        }
@@ -0,0 +1,44 @@
+"""
+字幕匯出 - 產生 SRT / WebVTT 內容（API 匯出與批次處理共用）
+"""
+from typing import Any, Dict, List
+
+
+def format_timestamp(seconds: float) -> str:
+    """將秒數轉換為 SRT 時間格式 (HH:MM:SS,mmm)"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millis = int((seconds % 1) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def format_vtt_timestamp(seconds: float) -> str:
+    """將秒數轉換為 WebVTT 時間格式 (HH:MM:SS.mmm)"""
+    return format_timestamp(seconds).replace(",", ".")
+
+
+def build_srt(subtitles: List[Dict[str, Any]], text_key: str = "text") -> str:
+    """產生 SRT 內容；text_key 不存在時退回原文"""
+    parts = []
+    for idx, subtitle in enumerate(subtitles, 1):
+        text = subtitle.get(text_key, subtitle["text"])
+        parts.append(
+            f"{idx}\n"
+            f"{format_timestamp(subtitle['start_time'])} --> {format_timestamp(subtitle['end_time'])}\n"
+            f"{text}\n\n"
+        )
+    return "".join(parts)
+
+
+def build_vtt(subtitles: List[Dict[str, Any]], text_key: str = "text") -> str:
+    """產生 WebVTT 內容；text_key 不存在時退回原文"""
+    parts = ["WEBVTT\n\n"]
+    for idx, subtitle in enumerate(subtitles, 1):
+        text = subtitle.get(text_key, subtitle["text"])
+        parts.append(
+            f"{idx}\n"
+            f"{format_vtt_timestamp(subtitle['start_time'])} --> {format_vtt_timestamp(subtitle['end_time'])}\n"
+            f"{text}\n\n"
+        )
+    return "".join(parts)
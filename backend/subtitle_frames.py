@@ -0,0 +1,99 @@
+"""
+字幕推送訊框 - 將多條字幕合併成一個 WebSocket 訊框
+
+協定：
+- JSON 編碼（預設）: {"type": "subtitles", "data": [{id, start_time, end_time, text}, ...]}
+- 精簡編碼 (encoding=compact): {"type": "cues", "fields": [...], "data": [[id, start, end, text], ...]}
+- 翻譯結果: {"type": "translations", "data": [{id, translated_text}, ...]}
+  （精簡編碼: {"type": "translations", "fields": ["id", "translated_text"], "data": [[id, text], ...]}）
+"""
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+
+ENCODING_JSON = "json"
+ENCODING_COMPACT = "compact"
+ENCODINGS = (ENCODING_JSON, ENCODING_COMPACT)
+
+# 精簡編碼的欄位順序
+CUE_FIELDS = ["id", "start_time", "end_time", "text"]
+
+# 預設批次條件：累積 50 條或 100ms 即送出
+DEFAULT_MAX_BATCH = 50
+DEFAULT_MAX_DELAY = 0.1
+
+
+def subtitles_frame(subtitles: List[Dict[str, Any]]) -> dict:
+    """JSON 編碼的字幕批次訊框"""
+    return {"type": "subtitles", "data": subtitles}
+
+
+def cues_frame(subtitles: List[Dict[str, Any]]) -> dict:
+    """精簡陣列編碼的字幕批次訊框（time 取到毫秒）"""
+    return {
+        "type": "cues",
+        "fields": CUE_FIELDS,
+        "data": [
+            [s["id"], round(s["start_time"], 3), round(s["end_time"], 3), s["text"]]
+            for s in subtitles
+        ],
+    }
+
+
+def encode_frames(subtitles: List[Dict[str, Any]]) -> Dict[str, dict]:
+    """同一批字幕的所有編碼版本"""
+    return {
+        ENCODING_JSON: subtitles_frame(subtitles),
+        ENCODING_COMPACT: cues_frame(subtitles),
+    }
+
+
+def encode_translation_frames(translated: List[Dict[str, Any]]) -> Dict[str, dict]:
+    """同一批翻譯結果的所有編碼版本"""
+    return {
+        ENCODING_JSON: {
+            "type": "translations",
+            "data": [{"id": s["id"], "translated_text": s["translated_text"]} for s in translated],
+        },
+        ENCODING_COMPACT: {
+            "type": "translations",
+            "fields": ["id", "translated_text"],
+            "data": [[s["id"], s["translated_text"]] for s in translated],
+        },
+    }
+
+
+class FrameBatcher:
+    """
+    依數量或時間合併字幕
+
+    add() 累積字幕，達到 max_batch 條立即送出；否則在第一條進入後
+    max_delay 秒送出，避免即時來源（Realtime API）延遲過久。
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[List[Dict[str, Any]]], None],
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        self.emit = emit
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._buffer: List[Dict[str, Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, subtitle: Dict[str, Any]):
+        self._buffer.append(subtitle)
+        if len(self._buffer) >= self.max_batch:
+            self.flush()
+        elif self._timer is None and self.max_delay > 0:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self.emit(batch)
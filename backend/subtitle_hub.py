@@ -0,0 +1,194 @@
+"""
+字幕廣播中心 - 每個 video_id 一個 pub/sub 主題，訊息只序列化一次並推送給所有訂閱者
+
+同一則訊息可提供多種編碼版本（例如 JSON 與精簡陣列），每種版本最多序列化一次，
+訂閱者依自己的 encoding 取得對應版本。
+多 worker 部署時以 relay 將本地發布的訊息轉送給其他 worker（見 cluster.py）。
+保留訊息只在主題進行中存在；主題結束後的快照由 snapshot(topic) 從字幕儲存重建。
+"""
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+from fast_json import dumps_text
+
+
+# 每個訂閱者的即時訊息緩衝上限；超過代表消費過慢
+DEFAULT_SUBSCRIBER_QUEUE = 256
+DEFAULT_ENCODING = "json"
+
+
+def encode_message(message: dict) -> str:
+    """序列化推送訊息（已安裝 orjson 時以其序列化）"""
+    return dumps_text(message)
+
+
+class HubMessage:
+    """一則訊息及其各編碼版本的序列化快取"""
+
+    __slots__ = ("variants", "_payloads")
+
+    def __init__(self, variants: Dict[str, dict]):
+        self.variants = variants
+        self._payloads: Dict[str, str] = {}
+
+    def payload(self, encoding: str) -> str:
+        """取得指定編碼的序列化結果；沒有該版本時退回預設編碼"""
+        if encoding not in self.variants:
+            encoding = DEFAULT_ENCODING if DEFAULT_ENCODING in self.variants else next(iter(self.variants))
+        payload = self._payloads.get(encoding)
+        if payload is None:
+            payload = self._payloads[encoding] = encode_message(self.variants[encoding])
+        return payload
+
+
+class Subscriber:
+    """單一訂閱者：快照 + 有界即時佇列"""
+
+    def __init__(self, topic: str, snapshot: List[HubMessage], queue_size: int,
+                 encoding: str = DEFAULT_ENCODING):
+        self.topic = topic
+        self.snapshot = snapshot
+        self.encoding = encoding
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+        self.closed = False
+
+    def offer(self, payload: str, droppable: bool = False) -> bool:
+        """
+        非阻塞放入訊息
+
+        佇列已滿時：可丟棄的訊息（如狀態更新）直接略過，
+        其他訊息則將此訂閱者標記為落後並關閉，避免拖慢其他人。
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            if droppable:
+                return False
+            self.lagged = True
+            self._terminate()
+            return False
+
+    def _terminate(self):
+        """清空佇列並放入結束哨兵"""
+        self.closed = True
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                try:
+                    self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """先產生快照，再產生即時訊息，直到主題結束或訂閱者落後"""
+        snapshot, self.snapshot = self.snapshot, []
+        for message in snapshot:
+            yield message.payload(self.encoding)
+        while True:
+            payload = await self.queue.get()
+            if payload is None:
+                return
+            yield payload
+
+
+class SubtitleHub:
+    """
+    以 video_id 為主題的字幕廣播中心
+
+    relay(kind, topic, variants, retain, droppable) 在本地發布、重設或結束主題時呼叫
+    （kind 為 message / reset / close）；由其他 worker 轉來的訊息以 relay=False 發布，不再轉送。
+    snapshot(topic) 回傳已結束主題的快照訊息（各編碼版本的列表），close_topic 後不再保留訊息。
+    """
+
+    def __init__(self, subscriber_queue: int = DEFAULT_SUBSCRIBER_QUEUE):
+        self.subscriber_queue = subscriber_queue
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._history: Dict[str, List[HubMessage]] = {}
+        self.dropped_subscribers = 0
+        self.relay: Optional[Callable[[str, str, Optional[Dict[str, dict]], bool, bool], None]] = None
+        self.snapshot: Optional[Callable[[str], List[Dict[str, dict]]]] = None
+
+    def reset(self, topic: str, relay: bool = True):
+        """清除主題的保留訊息（重新轉錄時使用）"""
+        self._history[topic] = []
+        if relay and self.relay:
+            self.relay("reset", topic, None, False, False)
+
+    def subscribe(self, topic: str, encoding: str = DEFAULT_ENCODING) -> Subscriber:
+        """
+        訂閱主題
+
+        快照與訂閱在同一個同步步驟內完成，因此不會遺漏或重複訊息。
+        進行中的主題以保留訊息作為快照，其餘由 snapshot(topic) 產生。
+        """
+        history = self._history.get(topic)
+        if history is not None:
+            snapshot = list(history)
+        elif self.snapshot is not None:
+            snapshot = [HubMessage(variants) for variants in self.snapshot(topic)]
+        else:
+            snapshot = []
+        subscriber = Subscriber(topic, snapshot, self.subscriber_queue, encoding)
+        self._subscribers.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.topic]
+
+    def publish(self, topic: str, message: dict, retain: bool = False, droppable: bool = False,
+                relay: bool = True):
+        """
+        發布訊息到主題
+
+        Args:
+            topic: 主題（video_id）
+            message: 訊息內容
+            retain: 是否保留給之後加入的訂閱者作為快照
+            droppable: 訂閱者落後時是否可直接略過此訊息
+            relay: 是否轉送給其他 worker
+        """
+        self.publish_variants(topic, {DEFAULT_ENCODING: message}, retain=retain, droppable=droppable,
+                              relay=relay)
+
+    def publish_variants(self, topic: str, variants: Dict[str, dict],
+                         retain: bool = False, droppable: bool = False, relay: bool = True):
+        """發布具有多種編碼版本的訊息，每種版本只在有人需要時序列化一次"""
+        if relay and self.relay:
+            self.relay("message", topic, variants, retain, droppable)
+        message = HubMessage(variants)
+        if retain:
+            self._history.setdefault(topic, []).append(message)
+        for subscriber in list(self._subscribers.get(topic, ())):
+            payload = message.payload(subscriber.encoding)
+            if not subscriber.offer(payload, droppable=droppable) and subscriber.lagged:
+                self.dropped_subscribers += 1
+                self.unsubscribe(subscriber)
+
+    def close_topic(self, topic: str, relay: bool = True):
+        """結束主題的即時推送並捨棄保留訊息，所有訂閱者在送完已排隊的訊息後結束"""
+        if relay and self.relay:
+            self.relay("close", topic, None, False, False)
+        self._history.pop(topic, None)
+        for subscriber in list(self._subscribers.get(topic, ())):
+            try:
+                subscriber.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+                subscriber._terminate()
+            subscriber.closed = True
+        self._subscribers.pop(topic, None)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            return len(self._subscribers.get(topic, ()))
+        return sum(len(s) for s in self._subscribers.values())
@@ -0,0 +1,98 @@
+"""
+字幕時間索引 - 以 start_time 排序的區間索引，支援 O(log n) 時間點查詢與時間窗查詢
+
+索引依 (主題, 語言) 快取，最多 MAX_INDEXES 個（LRU）；字幕整個替換（重新轉錄）或影片被淘汰時以 drop_index 移除。
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cue_store import CueStore
+
+
+class SubtitleIndex:
+    """
+    字幕區間索引
+
+    依 start_time 排序，並維護 end_time 的前綴最大值：
+    與 [t_from, t_to] 重疊的字幕必定落在
+    [第一個前綴最大 end >= t_from, 最後一個 start <= t_to] 之間，
+    兩端皆可二分搜尋，查詢成本為 O(log n + k)。
+    """
+
+    def __init__(self, subtitles: Sequence[Dict[str, Any]]):
+        self.source = subtitles
+        self.size = len(subtitles)
+        self.revision = getattr(subtitles, "revision", None)
+        if isinstance(subtitles, CueStore):
+            # 欄位式儲存直接使用時間欄位，不建立 dict
+            starts, ends = subtitles.starts, subtitles.ends
+        else:
+            starts = array("d", (s["start_time"] for s in subtitles))
+            ends = array("d", (s["end_time"] for s in subtitles))
+        # 只保存排序後的位置與時間欄位，查詢結果才向來源取出字幕
+        self._order = array("q", sorted(range(self.size), key=lambda i: (starts[i], ends[i])))
+        self._starts = array("d", (starts[i] for i in self._order))
+        self._ends = array("d", (ends[i] for i in self._order))
+        self._max_ends = array("d")
+        running = float("-inf")
+        for i in self._order:
+            running = max(running, ends[i])
+            self._max_ends.append(running)
+
+    def is_current(self, subtitles: Sequence[Dict[str, Any]]) -> bool:
+        """索引是否仍對應目前的字幕列表（字幕只會附加、寫入翻譯或整個替換）"""
+        return (subtitles is self.source and len(subtitles) == self.size
+                and getattr(subtitles, "revision", None) == self.revision)
+
+    def _bounds(self, t_from: float, t_to: float) -> Tuple[int, int]:
+        lo = bisect_left(self._max_ends, t_from)
+        hi = bisect_right(self._starts, t_to)
+        return lo, hi
+
+    def window(self, t_from: float, t_to: float, offset: int = 0,
+               limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        取得與 [t_from, t_to] 重疊的字幕
+
+        Returns:
+            (字幕列表, 下一頁 offset；沒有更多時為 None)
+        """
+        lo, hi = self._bounds(t_from, t_to)
+        # 先以時間欄位篩選位置，只為回傳的這一頁向來源取出字幕
+        ends = self._ends
+        positions = [i for i in range(lo, hi) if ends[i] >= t_from]
+        stop = len(positions) if limit is None else min(len(positions), offset + limit)
+        results = [self.source[self._order[i]] for i in positions[offset:stop]]
+        return results, stop if stop < len(positions) else None
+
+    def at(self, t: float, offset: int = 0,
+           limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """取得時間點 t 正在顯示的字幕"""
+        return self.window(t, t, offset, limit)
+
+
+# 快取的索引數上限（每個索引保存一份字幕來源的參照）
+MAX_INDEXES = 256
+
+# (主題, language) -> 索引快取（LRU）；主題為 video_id 或 "<video_id>:track<N>"
+_indexes: "OrderedDict[Tuple[str, str], SubtitleIndex]" = OrderedDict()
+
+
+def get_index(video_id: str, language: str, subtitles: Sequence[Dict[str, Any]]) -> SubtitleIndex:
+    """取得（必要時重建）字幕索引"""
+    key = (video_id, language)
+    index = _indexes.get(key)
+    if index is None or not index.is_current(subtitles):
+        index = _indexes[key] = SubtitleIndex(subtitles)
+    _indexes.move_to_end(key)
+    while len(_indexes) > MAX_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+
+def drop_index(topic: str, tracks: bool = False):
+    """移除主題的索引；tracks=True 時一併移除影片各音訊軌（"<video_id>:track<N>"）的索引"""
+    for key in [k for k in _indexes if k[0] == topic or (tracks and k[0].startswith(topic + ":"))]:
+        del _indexes[key]
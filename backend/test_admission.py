@@ -0,0 +1,172 @@
+"""admission 測試：FIFO 交接、佇列已滿 / 預估等待 / 逾時拒絕、reserve、取消與上傳中介層"""
+import asyncio
+
+import pytest
+
+from admission import (
+    REASON_PREDICTED_WAIT,
+    REASON_QUEUE_FULL,
+    REASON_TIMEOUT,
+    AdmissionPool,
+    AdmissionRejected,
+    UploadAdmissionMiddleware,
+)
+
+
+def test_fifo_handoff():
+    async def main():
+        pool = AdmissionPool("api", limit=1, queue_size=10)
+        order = []
+
+        async def worker(i):
+            async with pool.slot():
+                order.append(i)
+                await asyncio.sleep(0.01)
+
+        holder = pool.slot()
+        tasks = [asyncio.ensure_future(worker(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        assert pool.waiting == 5
+        holder.release()
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2, 3, 4]
+        assert pool.active == 0 and pool.waiting == 0
+        assert pool.admitted == 6
+
+    asyncio.run(main())
+
+
+def test_queue_full_rejects_immediately():
+    async def main():
+        pool = AdmissionPool("upload", limit=1, queue_size=1)
+        holder = pool.slot()
+        queued = pool.slot()
+        assert queued.queued
+        with pytest.raises(AdmissionRejected) as info:
+            pool.slot()
+        assert info.value.reason == REASON_QUEUE_FULL
+        assert info.value.retry_after >= 1
+        assert pool.rejected[REASON_QUEUE_FULL] == 1
+
+        holder.release()
+        await queued.wait()
+        assert not queued.queued
+        queued.release()
+        assert not queued.queued
+        assert pool.active == 0
+
+    asyncio.run(main())
+
+
+def test_predicted_wait_rejects():
+    async def main():
+        pool = AdmissionPool("extract", limit=1, queue_size=10, max_wait=1.0)
+        pool.ewma_service = 0.6
+        holder = pool.slot()
+        pool.slot()
+        with pytest.raises(AdmissionRejected) as info:
+            pool.slot()
+        assert info.value.reason == REASON_PREDICTED_WAIT
+        # 背景工作不被拒絕，但計入佇列深度
+        background = pool.slot(reject=False)
+        assert pool.waiting == 2
+        background.release()
+        holder.release()
+
+    asyncio.run(main())
+
+
+def test_queue_timeout_rejects_and_leaves_queue():
+    async def main():
+        pool = AdmissionPool("api", limit=1, queue_size=10, max_wait=0.02)
+        holder = pool.slot()
+        ticket = pool.slot()
+        with pytest.raises(AdmissionRejected) as info:
+            await ticket.wait()
+        assert info.value.reason == REASON_TIMEOUT
+        assert pool.waiting == 0
+        holder.release()
+        assert pool.active == 0
+
+    asyncio.run(main())
+
+
+def test_reserve_waits_without_timeout():
+    async def main():
+        pool = AdmissionPool("extract", limit=1, queue_size=1, max_wait=0.01)
+        holder = pool.slot()
+        reserved = pool.reserve()
+        with pytest.raises(AdmissionRejected):
+            pool.reserve()
+
+        async def run():
+            async with reserved:
+                return "done"
+
+        task = asyncio.ensure_future(run())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        holder.release()
+        assert await task == "done"
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_passes_slot_on():
+    async def main():
+        pool = AdmissionPool("api", limit=1, queue_size=10)
+        holder = pool.slot()
+        first = pool.slot()
+        second = pool.slot()
+        waiting = asyncio.ensure_future(first.wait())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert pool.waiting == 1
+        holder.release()
+        await second.wait()
+        assert pool.active == 1
+        second.release()
+        assert pool.active == 0
+
+    asyncio.run(main())
+
+
+def _rejecting_app(responses):
+    def on_reject(error):
+        async def app(scope, receive, send):
+            responses.append(error.reason)
+        return app
+    return on_reject
+
+
+def test_upload_middleware_prechecks_before_slot():
+    async def main():
+        upload = AdmissionPool("upload", limit=1, queue_size=1)
+        extract = AdmissionPool("extract", limit=1, queue_size=0)
+        handled, rejected = [], []
+
+        async def app(scope, receive, send):
+            handled.append(scope["method"])
+            if "state" in scope:
+                scope["state"]["release_admission"]()
+
+        middleware = UploadAdmissionMiddleware(
+            app, upload, {"/upload"}, _rejecting_app(rejected), precheck=[extract]
+        )
+        scope = {"type": "http", "method": "POST", "path": "/upload"}
+
+        await middleware(dict(scope), None, None)
+        assert handled == ["POST"] and upload.active == 0
+
+        busy = extract.slot()
+        await middleware(dict(scope), None, None)
+        assert rejected == [REASON_QUEUE_FULL]
+        assert upload.active == 0 and upload.admitted == 1
+        busy.release()
+
+        await middleware({"type": "http", "method": "GET", "path": "/upload"}, None, None)
+        assert handled == ["POST", "GET"]
+
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""audio_fingerprint 測試：重新排列與加入雜訊後的新版本能對齊回舊版本"""
+import wave
+
+import numpy as np
+import pytest
+
+from audio_fingerprint import align, bit_errors, compute_fingerprints, shared_ratio
+
+RATE = 16000
+
+
+def _write_wav(path, samples):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(np.clip(samples, -32768, 32767).astype("<i2").tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def versions(tmp_path):
+    """舊版 40 秒；新版 = 舊版 10–30 秒 + 5 秒新內容 + 舊版 0–10 秒（加上輕微雜訊模擬重新編碼）"""
+    rng = np.random.default_rng(0)
+    old = rng.normal(0, 3000, RATE * 40)
+    new = np.concatenate([old[10 * RATE:30 * RATE], rng.normal(0, 3000, 5 * RATE), old[:10 * RATE]])
+    new = new + rng.normal(0, 300, len(new))
+    old_fp = compute_fingerprints(_write_wav(tmp_path / "old.wav", old))
+    new_fp = compute_fingerprints(_write_wav(tmp_path / "new.wav", new))
+    return old_fp, new_fp
+
+
+def test_compute_fingerprints_layout(versions):
+    (hashes, hop_seconds, duration), _ = versions
+    assert hashes.dtype == np.uint32
+    assert hop_seconds == pytest.approx(0.05)
+    assert duration == pytest.approx(40.0)
+    assert len(hashes) == pytest.approx(duration / hop_seconds, abs=50)
+
+
+def test_align_recovers_moved_sections(versions):
+    (old, hop_seconds, _), (new, _, _) = versions
+    assert shared_ratio(old, new) > 0.1
+    segments = align(old, new, hop_seconds)
+    assert len(segments) == 2
+
+    first, second = segments
+    assert first["offset"] == pytest.approx(10.0)
+    assert first["start"] == 0.0
+    assert first["end"] == pytest.approx(20.0, abs=1.0)
+    assert second["offset"] == pytest.approx(-25.0)
+    assert second["start"] == pytest.approx(25.0, abs=1.0)
+    assert second["end"] == pytest.approx(35.0, abs=1.0)
+
+
+def test_align_unrelated_audio(tmp_path):
+    rng = np.random.default_rng(1)
+    a, hop_seconds, _ = compute_fingerprints(_write_wav(tmp_path / "a.wav", rng.normal(0, 3000, RATE * 20)))
+    b, _, _ = compute_fingerprints(_write_wav(tmp_path / "b.wav", rng.normal(0, 3000, RATE * 20)))
+    assert align(a, b, hop_seconds) == []
+    assert align(a, np.zeros(0, dtype=np.uint32), hop_seconds) == []
+
+
+def test_bit_errors():
+    a = np.array([0, 0xFFFFFFFF, 0b1011], dtype=np.uint32)
+    b = np.array([0, 0, 0b0001], dtype=np.uint32)
+    assert bit_errors(a, b).tolist() == [0, 32, 2]
@@ -0,0 +1,29 @@
+"""冷啟動測試：import main 在時間預算內、不載入重量級模組、不建立檔案（與 bench_cold_start.py 相同的檢查）"""
+import os
+import statistics
+
+import pytest
+
+from bench_cold_start import DEFAULT_BUDGET_MS, measure_import
+
+# 較慢的 CI 機器可以 IMPORT_BUDGET_MS 放寬
+BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS))
+RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def imports(tmp_path_factory):
+    return [measure_import(tmp_path_factory.mktemp("cold-start")) for _ in range(RUNS)]
+
+
+def test_import_within_budget(imports):
+    import_ms = statistics.median(r["import_ms"] for r in imports)
+    assert import_ms <= BUDGET_MS, f"import main 耗時 {import_ms:.0f} ms，超過預算 {BUDGET_MS:.0f} ms"
+
+
+def test_import_skips_heavy_modules(imports):
+    assert [r["heavy_loaded"] for r in imports] == [[]] * RUNS
+
+
+def test_import_creates_no_files(imports):
+    assert [r["created"] for r in imports] == [[]] * RUNS
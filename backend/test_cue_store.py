@@ -0,0 +1,122 @@
+"""cue_store 測試：欄位儲存與 dict 介面一致、翻譯覆寫與緩衝區重新整理、revision"""
+import pytest
+
+import cue_store
+from cue_store import CueStore, cues_to_columns
+
+
+def _cues(n, first_id=0):
+    return [
+        {"id": first_id + i, "start_time": i * 1.5, "end_time": i * 1.5 + 1.0, "text": f"第 {i} 句 line"}
+        for i in range(n)
+    ]
+
+
+def test_sequence_interface_matches_dicts():
+    cues = _cues(5)
+    store = CueStore(cues)
+    assert len(store) == 5
+    assert list(store) == cues
+    assert store[-1] == cues[-1]
+    assert store[1:3] == cues[1:3]
+    assert list(store.texts()) == [c["text"] for c in cues]
+    with pytest.raises(IndexError):
+        store[5]
+
+
+def test_to_columns_matches_cues_to_columns():
+    cues = _cues(4)
+    store = CueStore(cues)
+    assert store.to_columns(1, 3) == cues_to_columns(cues[1:3])
+    assert store.to_columns(2, 100)["id"] == [2, 3]
+
+
+def test_position_with_gaps():
+    store = CueStore(_cues(3, first_id=10))
+    assert store.position(11) == 1
+    store.append({"id": 100, "start_time": 9.0, "end_time": 10.0, "text": "gap"})
+    assert store.position(100) == 3
+    assert store.position(12) == 2
+    assert store.position(50) is None
+
+
+def test_translations_out_of_order():
+    store = CueStore(_cues(4))
+    assert store.set_translation(2, "二")
+    assert store.set_translation(0, "零")
+    assert not store.set_translation(99, "x")
+    assert store.translated_count == 2
+    assert [c["id"] for c in store.translated] == [0, 2]
+    assert store.translated[1]["translated_text"] == "二"
+    assert store.translated.to_columns()["translated_text"] == ["零", "二"]
+    assert store.to_columns(translations=True)["translated_text"] == ["零", None, "二", None]
+
+    store.clear_translations()
+    assert store.translated_count == 0
+    assert list(store.translated) == []
+    assert store.translation(2) is None
+
+
+def test_overwrite_reuses_slot_and_appends_when_longer():
+    store = CueStore(_cues(2))
+    store.set_translation(0, "longer text")
+    store.set_translation(1, "other")
+    size = len(store._translation)
+
+    store.set_translation(0, "short")
+    assert len(store._translation) == size
+    assert store.translation(0) == "short"
+    assert store.translation(1) == "other"
+
+    store.set_translation(0, "a much longer replacement")
+    assert len(store._translation) > size
+    assert store.translation(0) == "a much longer replacement"
+    assert store.translated_count == 2
+
+
+def test_compaction_bounds_translation_buffer(monkeypatch):
+    monkeypatch.setattr(cue_store, "COMPACT_MIN_BYTES", 100)
+    store = CueStore(_cues(3))
+    store.set_translation(1, "fixed")
+    for n in range(1, 60):
+        store.set_translation(0, "x" * n)
+    assert store._translation_garbage <= max(100, len(store._translation) // 2)
+    assert len(store._translation) < 3 * (59 + 5)
+    assert store.translation(0) == "x" * 59
+    assert store.translation(1) == "fixed"
+    assert store.translation(2) is None
+
+
+def test_revisions():
+    store = CueStore(_cues(2))
+    other = CueStore(_cues(2))
+    assert store.revision != other.revision
+
+    text_revision = store.text_revision
+    store.set_translation(0, "t")
+    assert store.text_revision == text_revision
+    assert store.revision > text_revision
+
+    revision = store.revision
+    store.append({"id": 2, "start_time": 5.0, "end_time": 6.0, "text": "new"})
+    assert store.text_revision == store.revision > revision
+
+
+def test_content_hash_depends_only_on_content():
+    store = CueStore(_cues(3))
+    store.set_translation(0, "a much longer translation")
+    store.set_translation(0, "short")
+    store.set_translation(2, "二")
+
+    other = CueStore(_cues(3))
+    other.set_translation(2, "二")
+    other.set_translation(0, "short")
+    assert store.revision != other.revision
+    assert store.content_hash() == other.content_hash()
+    assert store.translated.content_hash() == store.content_hash()
+
+    before = store.content_hash()
+    store.set_translation(1, "一")
+    assert store.content_hash() != before
+    other.set_translation(1, "壹")
+    assert other.content_hash() != store.content_hash()
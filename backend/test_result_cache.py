@@ -0,0 +1,90 @@
+"""result_cache 測試：single-flight、失敗與 cache_if 不快取、LRU 上限、取消不影響其他等待者"""
+import asyncio
+
+import pytest
+
+from result_cache import ResultCache
+
+
+def _counting(result="value", delay=0.01, error=None):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return compute, calls
+
+
+def test_concurrent_requests_share_one_compute():
+    async def main():
+        cache = ResultCache()
+        compute, calls = _counting()
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        assert results == ["value"] * 5
+        assert len(calls) == 1
+        assert await cache.get_or_compute("k", compute) == "value"
+        assert len(calls) == 1
+        assert cache.stats() == {"entries": 1, "inflight": 0, "hits": 1, "misses": 1, "shared": 4}
+
+    asyncio.run(main())
+
+
+def test_failures_are_not_cached():
+    async def main():
+        cache = ResultCache()
+        failing, _ = _counting(error=RuntimeError("boom"))
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute("k", failing)
+        assert cache.get("k") is None
+        compute, calls = _counting()
+        assert await cache.get_or_compute("k", compute) == "value"
+        assert len(calls) == 1
+
+    asyncio.run(main())
+
+
+def test_cache_if_rejects_result():
+    async def main():
+        cache = ResultCache()
+        compute, calls = _counting(result={"failed": 1})
+        result = await cache.get_or_compute("k", compute, cache_if=lambda r: not r["failed"])
+        assert result == {"failed": 1}
+        await cache.get_or_compute("k", compute, cache_if=lambda r: not r["failed"])
+        assert len(calls) == 2
+        assert cache.stats()["entries"] == 0
+
+    asyncio.run(main())
+
+
+def test_lru_eviction():
+    async def main():
+        cache = ResultCache(max_entries=2)
+        for key in ("a", "b"):
+            await cache.get_or_compute(key, _counting(result=key, delay=0)[0])
+        assert cache.get("a") == "a"
+        await cache.get_or_compute("c", _counting(result="c", delay=0)[0])
+        assert cache.get("b") is None
+        assert cache.get("a") == "a"
+        assert cache.get("c") == "c"
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_cancel_compute():
+    async def main():
+        cache = ResultCache()
+        compute, calls = _counting(delay=0.05)
+        first = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        second = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "value"
+        assert first.cancelled()
+        assert len(calls) == 1
+        assert cache.get("k") == "value"
+
+    asyncio.run(main())
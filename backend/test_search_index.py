@@ -0,0 +1,121 @@
+"""search_index 測試：摘錄跳脫、CJK 子字串檢索與依種類清除"""
+import sqlite3
+
+import pytest
+
+from search_index import (
+    KIND_SUMMARY, KIND_TEXT, KIND_TRANSLATED, SearchIndex, _restore_cjk, build_match_query, tokenize_cjk,
+)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    yield index
+    index.close()
+
+
+def _cue(cue_id, text, translated=None):
+    cue = {"id": cue_id, "start_time": float(cue_id), "end_time": cue_id + 1.0, "text": text}
+    if translated:
+        cue["translated_text"] = translated
+    return cue
+
+
+def test_snippet_escapes_cue_html(index):
+    index.register_video("v1", "clip.mp4")
+    index.add_cues("v1", [_cue(1, "<script>alert(1)</script> hello world")])
+    hits = index.search("hello")["hits"]
+    assert len(hits) == 1
+    snippet = hits[0]["snippet"]
+    assert "<script>" not in snippet
+    assert "&lt;script&gt;" in snippet
+    assert "<mark>hello</mark>" in snippet
+    assert hits[0]["filename"] == "clip.mp4"
+
+
+def test_control_characters_cannot_forge_marks(index):
+    index.add_cues("v1", [_cue(1, "a\x01b\x02c token")])
+    snippet = index.search("token")["hits"][0]["snippet"]
+    assert snippet.count("<mark>") == 1
+
+
+def test_cjk_substring_search(index):
+    index.add_cues("v1", [_cue(1, "今天天氣很好"), _cue(2, "明天會下雨")])
+    hits = index.search("天氣")["hits"]
+    assert [h["cue_id"] for h in hits] == [1]
+    assert hits[0]["snippet"] == "今天<mark>天氣</mark>很好"
+    assert index.search("氣很好下")["hits"] == []
+
+
+@pytest.mark.parametrize("text", [
+    "譯:hello",
+    "Hello世界",
+    "（注意）今天 10 點，café 見！",
+    "  前後空白 ",
+    "日本語とEnglish、한국어 mixed",
+])
+def test_tokenize_round_trip(text):
+    assert _restore_cjk(tokenize_cjk(text)) == text
+
+
+def test_snippet_keeps_mixed_text(index):
+    index.add_cues("v1", [_cue(1, "譯:hello Hello世界")])
+    assert index.search("世界")["hits"][0]["snippet"] == "譯:hello Hello<mark>世界</mark>"
+    assert index.search("hello")["hits"][0]["snippet"] == "譯:<mark>hello</mark> <mark>Hello</mark>世界"
+
+
+def test_legacy_index_is_converted(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE VIRTUAL TABLE entries USING fts5(
+            body, video_id UNINDEXED, cue_id UNINDEXED, kind UNINDEXED,
+            start_time UNINDEXED, end_time UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+        );
+        INSERT INTO entries VALUES (' 譯 :hello  世  界 ', 'v1', 1, 'text', 0.0, 1.0);
+    """)
+    conn.commit()
+    conn.close()
+
+    index = SearchIndex(path)
+    assert index.search("世界")["hits"][0]["snippet"] == "譯:hello <mark>世界</mark>"
+    index.close()
+
+
+def test_query_syntax_is_quoted():
+    assert build_match_query('a" OR b') == '"a" AND "OR" AND "b"*'
+    assert build_match_query("!!!") is None
+
+
+def test_clear_video_by_kind(index):
+    index.add_cues("v1", [_cue(1, "apple", "蘋果")])
+    index.add_cues("v1", [_cue(1, "apple", "蘋果")], kind=KIND_TRANSLATED)
+    index.index_notes("v1", {"original": {"summary": "apple summary"}})
+    index.add_cues("v2", [_cue(1, "apple")])
+
+    index.clear_video("v1", [KIND_TEXT])
+    kinds = sorted((h["video_id"], h["kind"]) for h in index.search("apple")["hits"])
+    assert kinds == [("v1", KIND_SUMMARY), ("v2", KIND_TEXT)]
+    assert len(index.search("蘋果")["hits"]) == 1
+
+    index.clear_video("v1")
+    assert [h["video_id"] for h in index.search("apple")["hits"]] == ["v2"]
+    assert index.search("蘋果")["hits"] == []
+
+
+def test_replace_cues_and_video_filter(index):
+    index.add_cues("v1", [_cue(1, "old words")])
+    index.add_cues("v2", [_cue(1, "new words")])
+    index.replace_cues("v1", [_cue(1, "new words")])
+    assert index.search("old")["hits"] == []
+    assert [h["video_id"] for h in index.search("new", video_id="v1")["hits"]] == ["v1"]
+
+
+def test_deferred_writes_run_in_order(index):
+    index.defer(index.add_cues, "v1", [_cue(1, "first")])
+    index.defer(index.clear_video, "v1")
+    index.defer(index.replace_cues, "v1", [_cue(2, "second")])
+    index.defer(index.index_notes, "v1", {"original": {"summary": "second summary"}}).result()
+    assert index.search("first")["hits"] == []
+    assert sorted(h["kind"] for h in index.search("second")["hits"]) == [KIND_SUMMARY, KIND_TEXT]
@@ -0,0 +1,101 @@
+"""storage 測試：淘汰順序（可丟棄 → TTL → LRU）、保留標記與選出後的放回"""
+import pytest
+
+from storage import StorageArea, StorageManager, delete_paths, owner_of, parse_duration, parse_size
+
+
+def _file(area, owner, name, size, last_access, expendable=False):
+    path = area.path_for(owner, name)
+    path.write_bytes(b"x" * size)
+    entry = area.add(owner, path, expendable)
+    entry.last_access = last_access
+    return entry
+
+
+@pytest.fixture
+def area(tmp_path):
+    return StorageArea("audio", tmp_path / "audio", quota_bytes=250, ttl_seconds=100)
+
+
+def test_parse_settings():
+    assert parse_size("20G") == 20 * 1024 ** 3
+    assert parse_size("1.5k") == 1536
+    assert parse_size("0") is None
+    assert parse_duration("12h") == 43200
+    assert parse_duration("") is None
+    with pytest.raises(ValueError):
+        parse_size("lots")
+    assert owner_of("abc123_segment_0.wav") == "abc123"
+    assert owner_of("abc123.mp4") == "abc123"
+
+
+def test_sharded_paths(area):
+    path = area.path_for("AbCdef", "AbCdef.wav")
+    assert path.parent.name == "ab"
+    assert path.parent.is_dir()
+
+
+def test_victim_order_expendable_ttl_then_lru(area):
+    now = 1000.0
+    expendable = _file(area, "aa1", "aa1.wav", 10, now, expendable=True)
+    expired = _file(area, "bb1", "bb1.wav", 10, now - 200)
+    oldest = _file(area, "cc1", "cc1.wav", 100, now - 50)
+    middle = _file(area, "dd1", "dd1.wav", 100, now - 40)
+    newest = _file(area, "ee1", "ee1.wav", 100, now - 10)
+    assert area.used_bytes == 320 and area.over_quota()
+
+    victims = area.select_victims(pinned=set(), now=now)
+    assert {v.path for v in victims[:2]} == {expendable.path, expired.path}
+    assert [v.path for v in victims[2:]] == [oldest.path]
+    assert area.used_bytes == 200
+    assert not area.over_quota()
+    assert set(area.entries) == {middle.path, newest.path}
+    assert area.evictions == 3 and area.evicted_bytes == 120
+
+
+def test_pinned_owner_is_never_evicted(area):
+    now = 1000.0
+    pinned = _file(area, "aa1", "aa1.wav", 200, now - 500, expendable=True)
+    other = _file(area, "bb1", "bb1.wav", 100, now - 10)
+    victims = area.select_victims(pinned={"aa1"}, now=now)
+    assert [v.path for v in victims] == [other.path]
+    assert pinned.path in area.entries
+
+
+def test_restore_undoes_selection(area):
+    entry = _file(area, "aa1", "aa1.wav", 10, 0.0, expendable=True)
+    (victim,) = area.select_victims(pinned=set(), now=1.0)
+    area.restore(victim)
+    assert area.entries[entry.path] is entry
+    assert area.used_bytes == 10
+    assert area.evictions == 0 and area.evicted_bytes == 0
+
+
+def test_manager_release_pinned_and_notify(tmp_path):
+    manager = StorageManager({"audio": StorageArea("audio", tmp_path / "audio")})
+    notified = []
+    manager.on_release = lambda: notified.append(True)
+    area = manager.areas["audio"]
+    a = _file(area, "aa1", "aa1.wav", 10, 0.0)
+    b = _file(area, "bb1", "bb1.wav", 10, 0.0)
+    manager.mark_expendable(a.path)
+    manager.mark_expendable(b.path)
+    assert len(notified) == 2
+
+    with manager.in_use("aa1"):
+        assert manager.is_pinned("aa1")
+        assert [e.owner for _, e in manager.select_victims()] == ["bb1"]
+    assert not manager.is_pinned("aa1")
+    assert len(notified) == 3
+
+    victims = manager.select_victims()
+    assert [e.owner for _, e in victims] == ["aa1"]
+    manager.pin("aa1")
+    assert manager.release_pinned(victims) == []
+    assert a.path in area.entries and a.expendable
+    manager.unpin("aa1")
+
+    remaining = manager.release_pinned(manager.select_victims())
+    delete_paths([entry.path for _, entry in remaining])
+    assert not (tmp_path / "audio" / "aa" / "aa1.wav").exists()
+    assert area.used_bytes == 0
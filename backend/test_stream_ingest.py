@@ -0,0 +1,48 @@
+"""stream_ingest 測試：轉錄會話失敗時生產者收到錯誤、TCP 連線回傳 ERROR 並關閉"""
+import asyncio
+
+import pytest
+
+from stream_ingest import StreamFailedError, StreamIngestService
+
+
+class FailingClient:
+    async def transcribe_stream(self, chunks, sample_rate):
+        async for _ in chunks:
+            raise RuntimeError("session lost")
+        yield  # pragma: no cover
+
+
+def test_put_raises_after_session_failure():
+    async def main():
+        service = StreamIngestService(client_factory=FailingClient, retain_seconds=0)
+        stream = service.open_stream("a")
+        assert await stream.put(b"x")
+        await asyncio.gather(stream.task)
+        assert stream.error == "session lost"
+        with pytest.raises(StreamFailedError):
+            await stream.put(b"x")
+
+    asyncio.run(main())
+
+
+def test_tcp_producer_gets_error_and_is_closed():
+    async def main():
+        service = StreamIngestService(client_factory=FailingClient, retain_seconds=0)
+        server = await service.start_tcp_server("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"tcp\n")
+        assert await reader.readline() == b"OK\n"
+
+        writer.write(b"x" * 100)
+        await writer.drain()
+        await asyncio.gather(service.streams["tcp"].task)
+        writer.write(b"x" * 100)
+        await writer.drain()
+        assert await asyncio.wait_for(reader.readline(), 1) == b"ERROR session lost\n"
+        assert await asyncio.wait_for(reader.read(), 1) == b""
+        writer.close()
+        await service.shutdown()
+
+    asyncio.run(main())
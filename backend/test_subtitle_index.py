@@ -0,0 +1,96 @@
+"""subtitle_index 測試：時間窗與時間點查詢與逐一比對的結果一致"""
+import random
+
+import subtitle_index
+
+from cue_store import CueStore
+from subtitle_index import SubtitleIndex, drop_index, get_index
+
+
+def _cues(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    cues = []
+    for i in range(n):
+        start = rng.uniform(0, 600)
+        cues.append({"id": i, "start_time": start, "end_time": start + rng.uniform(0.1, 30), "text": f"cue {i}"})
+    return cues
+
+
+def _brute(cues, t_from, t_to):
+    return sorted((c["id"] for c in cues if c["end_time"] >= t_from and c["start_time"] <= t_to))
+
+
+def test_window_matches_linear_scan():
+    cues = _cues(500)
+    index = SubtitleIndex(cues)
+    rng = random.Random(1)
+    for _ in range(200):
+        t_from = rng.uniform(-10, 620)
+        t_to = t_from + rng.uniform(0, 60)
+        found, next_offset = index.window(t_from, t_to)
+        assert sorted(c["id"] for c in found) == _brute(cues, t_from, t_to)
+        assert next_offset is None
+
+
+def test_at_returns_cues_showing_at_time():
+    cues = [
+        {"id": 1, "start_time": 0.0, "end_time": 100.0, "text": "long"},
+        {"id": 2, "start_time": 10.0, "end_time": 12.0, "text": "short"},
+        {"id": 3, "start_time": 50.0, "end_time": 51.0, "text": "later"},
+    ]
+    index = SubtitleIndex(cues)
+    assert [c["id"] for c in index.at(11.0)[0]] == [1, 2]
+    assert [c["id"] for c in index.at(50.5)[0]] == [1, 3]
+    assert index.at(200.0)[0] == []
+
+
+def test_window_pagination_covers_all_results_once():
+    cues = _cues(300, seed=2)
+    index = SubtitleIndex(cues)
+    expected = _brute(cues, 100, 300)
+    collected, offset = [], 0
+    while True:
+        page, offset = index.window(100, 300, offset=offset, limit=7)
+        collected.extend(c["id"] for c in page)
+        if offset is None:
+            break
+    assert sorted(collected) == expected
+    assert len(collected) == len(set(collected))
+
+
+def test_cue_store_source_and_currency():
+    store = CueStore(_cues(50, seed=3))
+    index = get_index("video", "original", store)
+    assert get_index("video", "original", store) is index
+    assert sorted(c["id"] for c in index.window(0, 700)[0]) == list(range(50))
+
+    store.append({"id": 50, "start_time": 700.0, "end_time": 701.0, "text": "new"})
+    assert not index.is_current(store)
+    rebuilt = get_index("video", "original", store)
+    assert rebuilt is not index
+    assert [c["id"] for c in rebuilt.at(700.5)[0]] == [50]
+
+    drop_index("video")
+    assert get_index("video", "original", store) is not rebuilt
+
+
+def test_drop_index_by_track():
+    store = CueStore(_cues(5))
+    base = get_index("video", "original", store)
+    track = get_index("video:track1", "original", store)
+    drop_index("video")
+    assert get_index("video:track1", "original", store) is track
+    assert get_index("video", "original", store) is not base
+    drop_index("video", tracks=True)
+    assert get_index("video:track1", "original", store) is not track
+
+
+def test_index_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(subtitle_index, "MAX_INDEXES", 3)
+    monkeypatch.setattr(subtitle_index, "_indexes", subtitle_index.OrderedDict())
+    store = CueStore(_cues(5))
+    first = get_index("v0", "original", store)
+    for n in range(1, 4):
+        get_index(f"v{n}", "original", store)
+    assert len(subtitle_index._indexes) == 3
+    assert get_index("v0", "original", store) is not first
@@ -0,0 +1,260 @@
+"""
+追蹤模組 - 各處理階段與外部呼叫的 span，以及每個影片的處理時間軸
+
+span 欄位與 OpenTelemetry（OTLP JSON）一致：traceId / spanId / parentSpanId /
+startTimeUnixNano / endTimeUnixNano / attributes / status。
+- 設定 TRACE_FILE 時，結束的 span 以 JSON Lines 寫入本地檔案（背景執行緒，不阻塞）
+- 若已安裝 opentelemetry-api，同時建立對應的 OpenTelemetry span
+- 帶有 video_id 的 span 會記錄到該影片的時間軸，供 /timeline/{video_id} 查詢
+"""
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # 選用依賴
+    otel_trace = None
+
+
+MAX_TIMELINE_VIDEOS = 1000   # 保留時間軸的影片數（LRU）
+MAX_SPANS_PER_VIDEO = 2000   # 每個影片保留的 span 數
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _trace_id_for(video_id: Optional[str]) -> str:
+    """同一影片的所有 span 共用 traceId（由 UUID 轉換）"""
+    if video_id:
+        hex_id = video_id.replace("-", "")
+        if len(hex_id) == 32 and all(c in "0123456789abcdef" for c in hex_id):
+            return hex_id
+    return secrets.token_hex(16)
+
+
+class Span:
+    """單一追蹤區段"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "video_id",
+                 "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, parent: Optional["Span"], video_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.video_id = video_id or (parent.video_id if parent else None)
+        self.trace_id = parent.trace_id if parent else _trace_id_for(self.video_id)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        """OTLP JSON 格式"""
+        attributes = [{"key": "video_id", "value": {"stringValue": self.video_id}}] if self.video_id else []
+        for key, value in self.attributes.items():
+            if isinstance(value, bool):
+                typed = {"boolValue": value}
+            elif isinstance(value, int):
+                typed = {"intValue": str(value)}
+            elif isinstance(value, float):
+                typed = {"doubleValue": value}
+            else:
+                typed = {"stringValue": str(value)}
+            attributes.append({"key": key, "value": typed})
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or 0),
+            "attributes": attributes,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            data["parentSpanId"] = self.parent_span_id
+        return data
+
+
+class LocalFileExporter:
+    """以背景執行緒將 span 寫入 JSON Lines 檔案"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=10000)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span.to_otlp())
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class Tracer:
+    """追蹤器：建立 span、匯出並維護影片時間軸"""
+
+    def __init__(self, exporter: Optional[LocalFileExporter] = None):
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self._timelines: "OrderedDict[str, dict]" = OrderedDict()
+
+    def _timeline(self, video_id: str) -> dict:
+        timeline = self._timelines.get(video_id)
+        if timeline is None:
+            timeline = self._timelines[video_id] = {"events": [], "spans": []}
+            if len(self._timelines) > MAX_TIMELINE_VIDEOS:
+                self._timelines.popitem(last=False)
+        else:
+            self._timelines.move_to_end(video_id)
+        return timeline
+
+    @contextmanager
+    def span(self, name: str, video_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+        parent = _current_span.get()
+        current = Span(name, parent, video_id, attributes)
+        token = _current_span.set(current)
+        otel_cm = otel_trace.get_tracer("video-subtitle").start_as_current_span(name) if otel_trace else None
+        otel_span = otel_cm.__enter__() if otel_cm else None
+        try:
+            yield current
+            current.status = STATUS_OK
+        except BaseException as e:
+            current.status = STATUS_ERROR
+            current.status_message = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if otel_cm:
+                for key, value in current.attributes.items():
+                    otel_span.set_attribute(key, value if isinstance(value, (bool, int, float, str)) else str(value))
+                if current.video_id:
+                    otel_span.set_attribute("video_id", current.video_id)
+                otel_cm.__exit__(None, None, None)
+            self._finish(current)
+
+    def _finish(self, span: Span):
+        if self.exporter:
+            self.exporter.export(span)
+        if span.video_id:
+            with self._lock:
+                spans = self._timeline(span.video_id)["spans"]
+                spans.append(span)
+                if len(spans) > MAX_SPANS_PER_VIDEO:
+                    del spans[0]
+
+    def event(self, video_id: str, name: str, **attributes):
+        """記錄影片的狀態事件（queued / running / completed …）"""
+        with self._lock:
+            self._timeline(video_id)["events"].append({
+                "name": name,
+                "time_unix_nano": time.time_ns(),
+                **attributes,
+            })
+
+    def timeline(self, video_id: str) -> Optional[dict]:
+        """影片的處理時間軸：狀態事件與各階段耗時（相對第一個事件的毫秒數）"""
+        with self._lock:
+            timeline = self._timelines.get(video_id)
+            if timeline is None:
+                return None
+            events = list(timeline["events"])
+            spans = list(timeline["spans"])
+
+        origins = [e["time_unix_nano"] for e in events] + [s.start_ns for s in spans]
+        origin = min(origins) if origins else 0
+
+        def offset_ms(ns: int) -> float:
+            return round((ns - origin) / 1e6, 3)
+
+        stages = sorted(spans, key=lambda s: s.start_ns)
+        totals: Dict[str, Dict[str, float]] = {}
+        for s in stages:
+            total = totals.setdefault(s.name, {"count": 0, "total_ms": 0.0})
+            total["count"] += 1
+            total["total_ms"] = round(total["total_ms"] + (s.duration_ms or 0.0), 3)
+
+        return {
+            "video_id": video_id,
+            "status": events[-1]["name"] if events else None,
+            "events": [
+                {**{k: v for k, v in e.items() if k != "time_unix_nano"}, "at_ms": offset_ms(e["time_unix_nano"])}
+                for e in events
+            ],
+            "stages": [
+                {
+                    "name": s.name,
+                    "span_id": s.span_id,
+                    "parent_span_id": s.parent_span_id,
+                    "start_ms": offset_ms(s.start_ns),
+                    "duration_ms": round(s.duration_ms or 0.0, 3),
+                    "status": "error" if s.status == STATUS_ERROR else "ok",
+                    "error": s.status_message or None,
+                    "attributes": s.attributes,
+                }
+                for s in stages
+            ],
+            "totals": totals,
+        }
+
+
+_trace_file = os.getenv("TRACE_FILE")
+tracer = Tracer(LocalFileExporter(_trace_file) if _trace_file else None)
+
+
+def span(name: str, video_id: Optional[str] = None, **attributes):
+    """建立 span（with tracing.span("stage", video_id=...)）"""
+    return tracer.span(name, video_id, **attributes)
+
+
+def event(video_id: str, name: str, **attributes):
+    tracer.event(video_id, name, **attributes)
+
+
+def get_timeline(video_id: str) -> Optional[dict]:
+    return tracer.timeline(video_id)
+
+
+def run_in_context(func, *args):
+    """回傳可在執行緒池執行、並保留目前追蹤上下文的呼叫（run_in_executor 不會自動複製 contextvars）"""
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(func, *args)
@@ -0,0 +1,100 @@
+"""
+翻譯管線 - 在轉錄進行中即以批次翻譯已產生的字幕，讓翻譯延遲隱藏在轉錄時間內
+"""
+import asyncio
+import contextlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import tracing
+from admission import AdmissionPool
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20      # 每次翻譯請求的字幕數
+DEFAULT_MAX_DELAY = 0.5      # 未滿一批時最多等待多久送出（秒）
+DEFAULT_CONCURRENCY = 4      # 同時進行的翻譯請求數
+
+
+class TranslationPipeline:
+    """
+    字幕翻譯管線
+
+    submit() 為非阻塞呼叫，字幕累積成批後交給背景任務翻譯；
+    每批完成即呼叫 on_translated（帶 translated_text 的字幕複本）。
+    drain() 會送出剩餘字幕並等待所有翻譯完成。
+    指定 pool 時每批請求佔用該准入池的名額（已接受的工作，排隊但不會被拒絕）。
+    """
+
+    def __init__(
+        self,
+        on_translated: Callable[[List[Dict[str, Any]]], Any],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        translate_fn: Optional[Callable[[List[str]], Awaitable[List[str]]]] = None,
+        pool: Optional[AdmissionPool] = None,
+    ):
+        self.on_translated = on_translated
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        if translate_fn is None:
+            from translator import translate_batch_to_traditional_chinese as translate_fn
+        self.translate_fn = translate_fn
+        self.pool = pool
+        self.translated_count = 0
+        self.failed_count = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._buffer: List[Dict[str, Any]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def submit(self, subtitles: List[Dict[str, Any]]):
+        """加入待翻譯字幕"""
+        self._buffer.extend(subtitles)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._start(batch)
+        if self._buffer and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+
+    def flush(self):
+        """立即送出未滿一批的字幕"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self._start(batch)
+
+    async def drain(self):
+        """送出剩餘字幕並等待所有翻譯完成"""
+        self.flush()
+        while self._tasks:
+            tasks, self._tasks = self._tasks, []
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, batch: List[Dict[str, Any]]):
+        self._tasks = [t for t in self._tasks if not t.done()]
+        self._tasks.append(asyncio.create_task(self._translate(batch)))
+
+    async def _translate(self, batch: List[Dict[str, Any]]):
+        async with self._slots:
+            try:
+                async with self.pool.slot(reject=False) if self.pool else contextlib.nullcontext():
+                    with tracing.span("translate.batch", cues=len(batch)):
+                        translations = await self.translate_fn([s["text"] for s in batch])
+            except Exception as e:
+                self.failed_count += len(batch)
+                logger.error("批次翻譯失敗（%d 條）: %s", len(batch), e)
+                return
+
+        translated = [
+            {**subtitle, "translated_text": text}
+            for subtitle, text in zip(batch, translations)
+        ]
+        self.translated_count += len(translated)
+        result = self.on_translated(translated)
+        if asyncio.iscoroutine(result):
+            await result
@@ -1,9 +1,18 @@
 """
 翻譯服務 - 將文字翻譯為繁體中文
 """
+import asyncio
+import json
 import os
-from openai import OpenAI
+from typing import List
 
+import tracing
+from model_router import TASK_TRANSLATE, get_router
+
+
+# 翻譯使用的模型（未設定翻譯路由時）與提示詞版本（修改提示詞時遞增，使先前快取的翻譯結果失效）
+TRANSLATION_MODEL = "gpt-4o-mini"
+TRANSLATION_PROMPT_VERSION = 1
 
 async def translate_to_traditional_chinese(text: str) -> str:
     """
@@ -19,23 +28,26 @@ async def translate_to_traditional_chinese(text: str) -> str:
     if not api_key:
         raise ValueError("OPENAI_API_KEY 環境變數未設定")
     
-    client = OpenAI(api_key=api_key)
+    router = get_router()
+    route = router.select(TASK_TRANSLATE, TRANSLATION_MODEL, units=1)
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一個專業的翻譯助手，專門將各種語言翻譯成繁體中文。請保持原文的語調和風格，只翻譯內容，不要添加任何解釋或註釋。"
-                },
-                {
-                    "role": "user",
-                    "content": f"請將以下文字翻譯成繁體中文：\n\n{text}"
-                }
-            ],
-            temperature=0.3
-        )
+        with router.attempt(route, 1), \
+                tracing.span("openai.chat.completions", purpose="translate", model=route.model, route=route.name):
+            response = await router.async_client(route).chat.completions.create(
+                model=route.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "你是一個專業的翻譯助手，專門將各種語言翻譯成繁體中文。請保持原文的語調和風格，只翻譯內容，不要添加任何解釋或註釋。"
+                    },
+                    {
+                        "role": "user",
+                        "content": f"請將以下文字翻譯成繁體中文：\n\n{text}"
+                    }
+                ],
+                temperature=0.3
+            )
         
         translated_text = response.choices[0].message.content.strip()
         return translated_text
@@ -43,3 +55,56 @@ async def translate_to_traditional_chinese(text: str) -> str:
     except Exception as e:
         raise Exception(f"翻譯失敗: {str(e)}")
 
+
+
+async def translate_batch_to_traditional_chinese(texts: List[str]) -> List[str]:
+    """
+    以單次請求批次翻譯多段文字為繁體中文
+    
+    Args:
+        texts: 要翻譯的文字列表
+        
+    Returns:
+        與輸入順序一致的翻譯結果列表
+    """
+    if not texts:
+        return []
+    
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY 環境變數未設定")
+    
+    router = get_router()
+    route = router.select(TASK_TRANSLATE, TRANSLATION_MODEL, units=len(texts))
+    
+    try:
+        # 使用非同步客戶端，避免阻塞事件迴圈（批次翻譯與轉錄同時進行）
+        with router.attempt(route, len(texts)), \
+                tracing.span("openai.chat.completions", purpose="translate_batch", items=len(texts),
+                             model=route.model, route=route.name):
+            response = await router.async_client(route).chat.completions.create(
+                model=route.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "你是一個專業的翻譯助手，專門將各種語言翻譯成繁體中文。請保持原文的語調和風格，只翻譯內容，不要添加任何解釋或註釋。"
+                                   "輸入是 JSON 字串陣列，請以 JSON 物件回應：{\"translations\": [...]}，陣列長度與順序必須與輸入相同。"
+                    },
+                    {
+                        "role": "user",
+                        "content": json.dumps(texts, ensure_ascii=False)
+                    }
+                ],
+                temperature=0.3,
+                response_format={"type": "json_object"}
+            )
+        
+        translations = json.loads(response.choices[0].message.content).get("translations", [])
+    except Exception as e:
+        raise Exception(f"翻譯失敗: {str(e)}")
+    
+    if len(translations) != len(texts):
+        # 模型回傳數量不符時退回逐條翻譯
+        return list(await asyncio.gather(*(translate_to_traditional_chinese(t) for t in texts)))
+    
+    return [str(t).strip() for t in translations]
@@ -0,0 +1,197 @@
+"""
+影片串流模組 - HTTP Range/快取標頭，以及使用 FFmpeg 的 faststart / HLS 重新封裝
+"""
+import os
+import subprocess
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+
+READ_CHUNK_SIZE = 256 * 1024
+HLS_SEGMENT_SECONDS = 6
+HLS_PLAYLIST = "index.m3u8"
+
+REMUX_MODES = ("faststart", "hls")
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """
+    以檔案大小與修改時間（奈秒）產生強 ETag
+
+    同一路徑的檔案寫入後不再修改（重新封裝的版本有自己的路徑與 URL），
+    大小與修改時間相同即內容相同，可作為 If-Range 需要的強驗證器。
+    """
+    return f'"{stat.st_size:x}-{int(stat.st_mtime_ns):x}"'
+
+
+def _weak_match(tag: str, etag: str) -> bool:
+    """弱比較（If-None-Match）：忽略 W/ 前綴"""
+    return tag.removeprefix("W/") == etag.removeprefix("W/")
+
+
+def _if_range_matches(if_range: str, etag: str, last_modified: str) -> bool:
+    """
+    If-Range 條件（RFC 9110 13.1.5）：實體標籤需強比較，弱標籤一律視為不符（回傳完整檔案）
+    """
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag
+    if if_range.startswith("W/"):
+        return False
+    return if_range == last_modified
+
+
+def _parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析單一 bytes 範圍，回傳 (start, end)（含 end）
+
+    不支援多重範圍；格式錯誤時回傳 None（視為完整回應），
+    範圍超出檔案時拋出 ValueError（416）。
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text == "":
+            # 後綴範圍：最後 N 個位元組
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("無效的範圍")
+            return max(0, file_size - length), file_size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+    except ValueError:
+        return None
+    if start >= file_size or start > end:
+        raise ValueError("範圍超出檔案大小")
+    return start, min(end, file_size - 1)
+
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or any(_weak_match(tag.strip(), etag) for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def range_file_response(request: Request, path: str, media_type: Optional[str] = None,
+                        cache_control: str = "public, max-age=3600") -> Response:
+    """
+    支援 Range / ETag / Last-Modified 的檔案回應
+
+    - If-None-Match / If-Modified-Since 命中時回傳 304
+    - Range 命中時回傳 206，只讀取所需區段
+    - If-Range 與目前的強 ETag（或 Last-Modified）不符時回傳完整檔案；弱 ETag 不符合 If-Range
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    file_size = stat.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or _if_range_matches(if_range, etag, headers["Last-Modified"])):
+        try:
+            byte_range = _parse_range(range_header, file_size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{file_size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                _iter_file(path, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers=headers,
+            )
+
+    headers["Content-Length"] = str(file_size)
+    return StreamingResponse(_iter_file(path, 0, file_size), media_type=media_type, headers=headers)
+
+
+def remux_faststart(video_path: str, output_path: str) -> str:
+    """
+    將影片重新封裝為 moov atom 在前的 MP4（不重新編碼）
+
+    Args:
+        video_path: 輸入影片路徑
+        output_path: 輸出 MP4 路徑
+    """
+    cmd = [
+        "ffmpeg",
+        "-i", video_path,
+        "-map", "0",
+        "-c", "copy",  # 不重新編碼
+        "-movflags", "+faststart",  # moov atom 移至檔案開頭
+        "-f", "mp4",
+        "-y",
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return output_path
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg 重新封裝失敗: {e.stderr}")
+
+
+def segment_hls(video_path: str, output_dir: str, segment_seconds: int = HLS_SEGMENT_SECONDS) -> str:
+    """
+    將影片切割為 HLS 區段（不重新編碼），回傳播放清單路徑
+
+    Args:
+        video_path: 輸入影片路徑
+        output_dir: 區段輸出目錄
+        segment_seconds: 每段長度（秒）
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    playlist = os.path.join(output_dir, HLS_PLAYLIST)
+    cmd = [
+        "ffmpeg",
+        "-i", video_path,
+        "-c", "copy",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(output_dir, "segment_%05d.ts"),
+        "-y",
+        playlist
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return playlist
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg HLS 切割失敗: {e.stderr}")
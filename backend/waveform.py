@@ -0,0 +1,189 @@
+"""
+波形峰值金字塔 - 由 WAV 計算多解析度的 min/max 峰值，供前端分塊讀取
+
+基礎層每 BASE_SAMPLES_PER_PEAK 個樣本取一組 (min, max)，之後每層將相鄰兩組合併
+（解析度減半），直到整層不超過一個分塊。峰值量化為 int8，每組 2 位元組：
+3 小時 24kHz 音訊的基礎層約 2MB，整個金字塔約 4MB，每個分塊 2KB。
+
+檔案格式（little-endian）：
+    header:  magic "WVPK" | version u16 | level_count u16 | sample_rate u32 | total_samples u64
+    levels:  每層 samples_per_peak u32 | peak_count u32 | data_offset u64
+    data:    每層連續的 int8 [min0, max0, min1, max1, ...]
+"""
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+MAGIC = b"WVPK"
+VERSION = 1
+BASE_SAMPLES_PER_PEAK = 256   # 24kHz 時約 94 組/秒
+TILE_PEAKS = 1024             # 每個分塊的峰值組數（2KB）
+BLOCK_PEAKS = 65536           # 每次從 memmap 讀入處理的峰值組數（控制記憶體用量）
+
+_HEADER = struct.Struct("<4sHHIQ")
+_LEVEL = struct.Struct("<IIQ")
+
+
+def wav_data_layout(wav_path: str):
+    """解析 RIFF 標頭，回傳 (data 區段偏移, 位元組數, 採樣率, 聲道數, 樣本寬度)"""
+    with open(wav_path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError("不是有效的 WAV 檔案")
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError("WAV 檔案缺少 data 區段")
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(size - 16 + (size & 1), os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV 檔案缺少 fmt 區段")
+                offset = f.tell()
+                # FFmpeg 串流輸出時 data 長度可能為 0 或 0xFFFFFFFF，以實際檔案大小為準
+                available = os.path.getsize(wav_path) - offset
+                if size == 0 or size > available:
+                    size = available
+                audio_format, channels, sample_rate, _, _, bits = fmt
+                if audio_format != 1 or bits != 16:
+                    raise ValueError("僅支援 16-bit PCM WAV")
+                return offset, size, sample_rate, channels, bits // 8
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def _reduce(peaks: np.ndarray) -> np.ndarray:
+    """將相鄰兩組峰值合併為一組（長度為奇數時最後一組單獨保留）"""
+    if len(peaks) % 2:
+        peaks = np.concatenate([peaks, peaks[-1:]])
+    pairs = peaks.reshape(-1, 2, 2)
+    return np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1)
+
+
+def compute_base_peaks(wav_path: str, samples_per_peak: int = BASE_SAMPLES_PER_PEAK):
+    """
+    以 memmap 分塊讀取 WAV 並向量化計算基礎層峰值
+
+    Returns:
+        (peaks: int8 陣列 shape=(n, 2), sample_rate, total_samples)
+    """
+    offset, size, sample_rate, channels, width = wav_data_layout(wav_path)
+    frame_count = size // (width * channels)
+    if frame_count == 0:
+        return np.zeros((0, 2), dtype=np.int8), sample_rate, 0
+
+    samples = np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(frame_count, channels))
+    peak_count = -(-frame_count // samples_per_peak)
+    peaks = np.empty((peak_count, 2), dtype=np.int8)
+
+    block = samples_per_peak * BLOCK_PEAKS
+    for start in range(0, frame_count, block):
+        chunk = samples[start:start + block]
+        # 多聲道時取所有聲道的極值
+        chunk = chunk.reshape(-1) if channels == 1 else chunk
+        whole = len(chunk) // samples_per_peak
+        first = start // samples_per_peak
+        if whole:
+            view = chunk[:whole * samples_per_peak].reshape(whole, -1)
+            # int16 → int8：右移 8 位元（算術位移保留符號）
+            peaks[first:first + whole, 0] = view.min(axis=1) >> 8
+            peaks[first:first + whole, 1] = view.max(axis=1) >> 8
+        if len(chunk) > whole * samples_per_peak:
+            tail = chunk[whole * samples_per_peak:]
+            peaks[first + whole] = (tail.min() >> 8, tail.max() >> 8)
+    del samples
+    return peaks, sample_rate, frame_count
+
+
+def build_waveform(wav_path: str, output_path: str,
+                   samples_per_peak: int = BASE_SAMPLES_PER_PEAK) -> Dict:
+    """
+    計算峰值金字塔並寫入二進位檔案
+
+    Returns:
+        波形中繼資料（同 WaveformFile.info()）
+    """
+    peaks, sample_rate, total_samples = compute_base_peaks(wav_path, samples_per_peak)
+    levels = [(samples_per_peak, peaks)]
+    while len(levels[-1][1]) > TILE_PEAKS:
+        spp, current = levels[-1]
+        levels.append((spp * 2, _reduce(current)))
+
+    data_offset = _HEADER.size + _LEVEL.size * len(levels)
+    level_headers = []
+    for spp, level_peaks in levels:
+        level_headers.append(_LEVEL.pack(spp, len(level_peaks), data_offset))
+        data_offset += level_peaks.nbytes
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(levels), sample_rate, total_samples))
+        f.write(b"".join(level_headers))
+        for _, level_peaks in levels:
+            f.write(np.ascontiguousarray(level_peaks).tobytes())
+    os.replace(tmp_path, output_path)
+
+    with WaveformFile(output_path) as waveform:
+        return waveform.info()
+
+
+class WaveformFile:
+    """以 mmap 讀取峰值檔案，取出指定層級的分塊"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, level_count, self.sample_rate, self.total_samples = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("不支援的波形檔案格式")
+        self.levels: List[Dict[str, int]] = []
+        for i in range(level_count):
+            spp, count, offset = _LEVEL.unpack_from(self._mmap, _HEADER.size + i * _LEVEL.size)
+            self.levels.append({"samples_per_peak": spp, "peaks": count, "offset": offset})
+
+    def info(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "duration": self.total_samples / self.sample_rate if self.sample_rate else 0.0,
+            "tile_peaks": TILE_PEAKS,
+            "levels": [
+                {
+                    "level": i,
+                    "samples_per_peak": level["samples_per_peak"],
+                    "peaks_per_second": self.sample_rate / level["samples_per_peak"],
+                    "peaks": level["peaks"],
+                    "tiles": -(-level["peaks"] // TILE_PEAKS),
+                }
+                for i, level in enumerate(self.levels)
+            ],
+        }
+
+    def tile(self, level: int, index: int) -> Optional[bytes]:
+        """取得分塊資料（int8 min/max 交錯）；超出範圍時回傳 None"""
+        if not 0 <= level < len(self.levels):
+            return None
+        meta = self.levels[level]
+        start = index * TILE_PEAKS
+        if index < 0 or start >= meta["peaks"]:
+            return None
+        end = min(start + TILE_PEAKS, meta["peaks"])
+        return self._mmap[meta["offset"] + start * 2:meta["offset"] + end * 2]
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
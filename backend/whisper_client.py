@@ -1,20 +1,60 @@
 """
 Whisper API 客戶端 - 處理音訊轉錄（精確時間戳）
 """
+import io
+import logging
 import os
-from openai import OpenAI
-from typing import List, Dict, Any
+import wave
+from typing import Iterator, List, Dict, Any, Optional
+
+import tracing
+from logging_setup import Sampler
+from model_router import ModelRouter, TASK_TRANSCRIBE, get_router
+
+
+logger = logging.getLogger(__name__)
+_cue_sampler = Sampler()
+
+
+# 分段轉錄的時間窗長度：24kHz 16-bit mono 約 14MB，低於 Whisper API 25MB 上限
+DEFAULT_WINDOW_SECONDS = 300.0
+
+# 未設定轉錄路由時使用的模型
+TRANSCRIPTION_MODEL = "whisper-1"
+
+
+def _wav_seconds(path: str) -> float:
+    """WAV 音訊長度（秒）；無法讀取時回傳 0"""
+    try:
+        with wave.open(path, "rb") as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return 0.0
 
 
 class WhisperTranscriptionClient:
     """OpenAI Whisper API 轉錄客戶端"""
     
-    def __init__(self):
+    def __init__(self, router: Optional[ModelRouter] = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY 環境變數未設定")
         
-        self.client = OpenAI(api_key=self.api_key)
+        # 每次請求依音訊長度與負載選擇模型與端點（客戶端依端點共用）
+        self.router = router or get_router()
+    
+    def _create_transcription(self, file, seconds: float, granularities: List[str], **span_attributes):
+        """經由模型路由送出一次轉錄請求"""
+        minutes = seconds / 60
+        route = self.router.select(TASK_TRANSCRIBE, TRANSCRIPTION_MODEL, units=minutes)
+        with self.router.attempt(route, minutes), \
+                tracing.span("openai.audio.transcriptions", model=route.model, route=route.name, **span_attributes):
+            return self.router.client(route).audio.transcriptions.create(
+                model=route.model,
+                file=file,
+                response_format="verbose_json",
+                timestamp_granularities=granularities
+            )
     
     def transcribe_audio_file(self, audio_path: str) -> List[Dict[str, Any]]:
         """
@@ -26,73 +66,187 @@ class WhisperTranscriptionClient:
         Returns:
             字幕列表，每個字幕包含 {id, start_time, end_time, text}
         """
-        print(f"開始使用 Whisper API 轉錄: {audio_path}")
+        logger.info("開始使用 Whisper API 轉錄: %s", audio_path)
         
         try:
             with open(audio_path, "rb") as audio_file:
-                print(f"音訊檔案大小: {os.path.getsize(audio_path)} bytes")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("音訊檔案大小: %d bytes", os.path.getsize(audio_path))
                 
-                # 使用 verbose_json 格式獲取詳細時間戳
-                print("正在調用 Whisper API...")
-                response = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json",
-                    timestamp_granularities=["segment"]  # 獲取段落級時間戳
-                )
-                print(f"Whisper API 返回成功")
+                # 使用 verbose_json 格式獲取詳細時間戳（段落級）
+                response = self._create_transcription(audio_file, _wav_seconds(audio_path), ["segment"])
             
-            subtitles = []
-            
-            # 調試：打印原始響應結構
-            print(f"響應類型: {type(response)}")
-            print(f"響應屬性: {dir(response)}")
-            
-            # 處理轉錄結果
-            if hasattr(response, 'segments') and response.segments:
-                print(f"找到 {len(response.segments)} 個段落")
-                for idx, segment in enumerate(response.segments, 1):
-                    # segment 可能是對象或字典
-                    if hasattr(segment, 'start'):
-                        start_time = segment.start
-                        end_time = segment.end
-                        text = segment.text
-                    else:
-                        start_time = segment.get("start", 0.0)
-                        end_time = segment.get("end", 0.0)
-                        text = segment.get("text", "")
-                    
-                    subtitle = {
-                        "id": idx,
-                        "start_time": float(start_time),
-                        "end_time": float(end_time),
-                        "text": text.strip() if text else ""
-                    }
-                    
-                    if subtitle["text"]:  # 只添加有內容的字幕
-                        subtitles.append(subtitle)
-                        print(f"字幕 {idx}: {subtitle['start_time']:.2f}s - {subtitle['end_time']:.2f}s: {subtitle['text'][:30]}...")
-            else:
-                print(f"警告：沒有找到 segments 屬性")
-                # 嘗試獲取純文字
-                if hasattr(response, 'text') and response.text:
-                    print(f"找到純文字: {response.text[:100]}...")
-                    subtitles.append({
-                        "id": 1,
-                        "start_time": 0.0,
-                        "end_time": 60.0,  # 預設 60 秒
-                        "text": response.text.strip()
-                    })
+            subtitles = self._segments_to_subtitles(response)
             
-            print(f"轉錄完成，共 {len(subtitles)} 段字幕")
+            logger.info("轉錄完成，共 %d 段字幕", len(subtitles))
             return subtitles
             
-        except Exception as e:
-            print(f"Whisper API 錯誤: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Whisper API 錯誤")
             raise
     
+    def transcribe_audio_windows(self, audio_path: str,
+                                 window_seconds: float = DEFAULT_WINDOW_SECONDS) -> Iterator[List[Dict[str, Any]]]:
+        """
+        將 WAV 音訊切成固定長度的時間窗逐一轉錄，每完成一個時間窗即產生該段字幕
+        
+        可讓後續處理（推送、翻譯）與轉錄重疊進行，同時避免單一請求超過
+        Whisper API 的 25MB 上傳限制。
+        
+        Args:
+            audio_path: WAV 音訊檔案路徑
+            window_seconds: 每個時間窗長度（秒）
+            
+        Yields:
+            該時間窗的字幕列表（時間戳已換算為整段音訊的絕對時間，id 連續遞增）
+        """
+        next_id = 1
+        with wave.open(audio_path, "rb") as wav_file:
+            params = wav_file.getparams()
+            frames_per_window = int(params.framerate * window_seconds)
+            offset = 0.0
+            window_index = 0
+            
+            while True:
+                frames = wav_file.readframes(frames_per_window)
+                if not frames:
+                    break
+                window_index += 1
+                
+                buffer = io.BytesIO()
+                with wave.open(buffer, "wb") as window_wav:
+                    window_wav.setparams(params)
+                    window_wav.writeframes(frames)
+                
+                seconds = len(frames) / (params.sampwidth * params.nchannels) / params.framerate
+                subtitles = self._transcribe_window(
+                    f"window_{window_index}.wav", buffer.getvalue(), window_index, offset, next_id, seconds
+                )
+                next_id += len(subtitles)
+                offset += seconds
+                yield subtitles
+    
+    def transcribe_audio_range(self, audio_path: str, start_time: float, end_time: float,
+                               start_id: int = 1,
+                               window_seconds: float = DEFAULT_WINDOW_SECONDS) -> Iterator[List[Dict[str, Any]]]:
+        """
+        只轉錄 WAV 音訊的 [start_time, end_time) 區間（增量轉錄的變動區段）
+
+        Args:
+            audio_path: WAV 音訊檔案路徑
+            start_time: 區間開始（秒）
+            end_time: 區間結束（秒）
+            start_id: 第一條字幕的 id
+            window_seconds: 區間超過此長度時分段轉錄
+
+        Yields:
+            該時間窗的字幕列表（時間戳為整段音訊的絕對時間，id 自 start_id 連續遞增）
+        """
+        next_id = start_id
+        with wave.open(audio_path, "rb") as wav_file:
+            params = wav_file.getparams()
+            position = int(start_time * params.framerate)
+            last = int(end_time * params.framerate)
+            frames_per_window = int(params.framerate * window_seconds)
+            wav_file.setpos(position)
+            window_index = 0
+
+            while position < last:
+                frames = wav_file.readframes(min(frames_per_window, last - position))
+                if not frames:
+                    break
+                window_index += 1
+
+                buffer = io.BytesIO()
+                with wave.open(buffer, "wb") as window_wav:
+                    window_wav.setparams(params)
+                    window_wav.writeframes(frames)
+
+                frame_count = len(frames) // (params.sampwidth * params.nchannels)
+                subtitles = self._transcribe_window(
+                    f"range_{window_index}.wav", buffer.getvalue(), window_index,
+                    position / params.framerate, next_id, frame_count / params.framerate
+                )
+                next_id += len(subtitles)
+                position += frame_count
+                yield subtitles
+
+    def transcribe_segments(self, segments: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        逐一轉錄 FFmpeg 預先切好的音訊分段（extract_audio_renditions 的 whisper 版本）
+        
+        Args:
+            segments: [{path, start_time, end_time}, ...]，依時間排序
+            
+        Yields:
+            該分段的字幕列表（時間戳已加上分段開始時間，id 連續遞增）
+        """
+        next_id = 1
+        for window_index, segment in enumerate(segments, 1):
+            with open(segment["path"], "rb") as f:
+                data = f.read()
+            subtitles = self._transcribe_window(
+                os.path.basename(segment["path"]), data, window_index, segment["start_time"], next_id,
+                segment["end_time"] - segment["start_time"]
+            )
+            next_id += len(subtitles)
+            yield subtitles
+    
+    def _transcribe_window(self, filename: str, data: bytes, window_index: int,
+                           offset: float, start_id: int, seconds: float = 0.0) -> List[Dict[str, Any]]:
+        """轉錄單一時間窗的音訊並換算為絕對時間戳"""
+        logger.info("轉錄時間窗 %d（%.0fs 起）", window_index, offset)
+        response = self._create_transcription(
+            (filename, data), seconds, ["segment"],
+            window=window_index, offset_seconds=offset, bytes=len(data)
+        )
+        return self._segments_to_subtitles(response, time_offset=offset, start_id=start_id)
+    
+    def _segments_to_subtitles(self, response, time_offset: float = 0.0,
+                               start_id: int = 1) -> List[Dict[str, Any]]:
+        """將 verbose_json 回應轉換為字幕列表"""
+        subtitles = []
+        
+        # 處理轉錄結果
+        if hasattr(response, 'segments') and response.segments:
+            logger.debug("找到 %d 個段落", len(response.segments))
+            for segment in response.segments:
+                # segment 可能是對象或字典
+                if hasattr(segment, 'start'):
+                    start_time = segment.start
+                    end_time = segment.end
+                    text = segment.text
+                else:
+                    start_time = segment.get("start", 0.0)
+                    end_time = segment.get("end", 0.0)
+                    text = segment.get("text", "")
+                
+                subtitle = {
+                    "id": start_id + len(subtitles),
+                    "start_time": float(start_time) + time_offset,
+                    "end_time": float(end_time) + time_offset,
+                    "text": text.strip() if text else ""
+                }
+                
+                if subtitle["text"]:  # 只添加有內容的字幕
+                    subtitles.append(subtitle)
+                    if logger.isEnabledFor(logging.DEBUG) and _cue_sampler():
+                        logger.debug("字幕 %d: %.2fs - %.2fs: %.30s", subtitle["id"],
+                                     subtitle["start_time"], subtitle["end_time"], subtitle["text"])
+        else:
+            logger.warning("沒有找到 segments 屬性")
+            # 嘗試獲取純文字
+            if hasattr(response, 'text') and response.text:
+                logger.debug("找到純文字: %.100s", response.text)
+                subtitles.append({
+                    "id": start_id,
+                    "start_time": time_offset,
+                    "end_time": time_offset + 60.0,  # 預設 60 秒
+                    "text": response.text.strip()
+                })
+        
+        return subtitles
+    
     def transcribe_with_word_timestamps(self, audio_path: str, max_segment_duration: float = 2.0) -> List[Dict[str, Any]]:
         """
         使用 Whisper API 轉錄音訊檔案，獲取字詞級時間戳並按時間分段
@@ -104,16 +258,11 @@ class WhisperTranscriptionClient:
         Returns:
             字幕列表，每個字幕包含 {id, start_time, end_time, text}
         """
-        print(f"開始使用 Whisper API 轉錄（字詞級時間戳）: {audio_path}")
+        logger.info("開始使用 Whisper API 轉錄（字詞級時間戳）: %s", audio_path)
         
         with open(audio_path, "rb") as audio_file:
             # 獲取字詞和段落級時間戳
-            response = self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="verbose_json",
-                timestamp_granularities=["word", "segment"]
-            )
+            response = self._create_transcription(audio_file, _wav_seconds(audio_path), ["word", "segment"])
         
         subtitles = []
         subtitle_id = 0
@@ -160,7 +309,9 @@ class WhisperTranscriptionClient:
                             "end_time": current_segment["end_time"],
                             "text": text
                         })
-                        print(f"字幕 {subtitle_id}: {current_segment['start_time']:.2f}s - {current_segment['end_time']:.2f}s: {text[:30]}...")
+                        if logger.isEnabledFor(logging.DEBUG) and _cue_sampler():
+                            logger.debug("字幕 %d: %.2fs - %.2fs: %.30s", subtitle_id,
+                                         current_segment["start_time"], current_segment["end_time"], text)
                     
                     # 重置段落
                     current_segment = {
@@ -195,6 +346,6 @@ class WhisperTranscriptionClient:
                 if subtitle["text"]:
                     subtitles.append(subtitle)
         
-        print(f"轉錄完成，共 {len(subtitles)} 段字幕")
+        logger.info("轉錄完成，共 %d 段字幕", len(subtitles))
         return subtitles
 
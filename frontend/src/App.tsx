@@ -44,8 +44,15 @@ function App() {
     setShowNotes(false)
   }
 
-  const handleSubtitleReceived = (subtitle: Subtitle) => {
-    setSubtitles(prev => [...prev, subtitle])
+  const handleSubtitlesReceived = (batch: Subtitle[]) => {
+    setSubtitles(prev => [...prev, ...batch])
+  }
+
+  const handleTranslationsReceived = (batch: { id: number; translated_text: string }[]) => {
+    const translatedMap = new Map(batch.map(t => [t.id, t.translated_text]))
+    setSubtitles(prev => prev.map(s => (
+      translatedMap.has(s.id) ? { ...s, translated_text: translatedMap.get(s.id) } : s
+    )))
   }
 
   const handleNotesReceived = (notesData: BilingualNotes) => {
@@ -140,7 +147,8 @@ function App() {
                   videoId={videoId}
                   subtitles={subtitles}
                   language={language}
-                  onSubtitleReceived={handleSubtitleReceived}
+                  onSubtitlesReceived={handleSubtitlesReceived}
+                  onTranslationsReceived={handleTranslationsReceived}
                   onTranscriptionStart={handleTranscriptionStart}
                   onTranscriptionComplete={handleTranscriptionComplete}
                   onNotesReceived={handleNotesReceived}
@@ -1,6 +1,9 @@
 import { useEffect, useRef, useState } from 'react'
 import { Play, Pause, Loader2 } from 'lucide-react'
 import useWebSocket from '../hooks/useWebSocket'
+import { decodeSubtitleFrame, decodeTranslationFrame, isSubtitleFrame } from '../utils/subtitleFrames'
+import { findActiveCue } from '../utils/subtitleIndex'
+import WaveformBar from './WaveformBar'
 
 interface Subtitle {
   id: number
@@ -15,7 +18,8 @@ interface VideoPlayerProps {
   videoId: string
   subtitles: Subtitle[]
   language: 'original' | 'traditional'
-  onSubtitleReceived: (subtitle: any) => void
+  onSubtitlesReceived: (subtitles: any[]) => void
+  onTranslationsReceived?: (translations: { id: number; translated_text: string }[]) => void
   onTranscriptionStart: () => void
   onTranscriptionComplete: () => void
   onNotesReceived?: (notes: any) => void
@@ -27,7 +31,8 @@ export default function VideoPlayer({
   videoId,
   subtitles,
   language,
-  onSubtitleReceived,
+  onSubtitlesReceived,
+  onTranslationsReceived,
   onTranscriptionStart,
   onTranscriptionComplete,
   onNotesReceived,
@@ -41,15 +46,18 @@ export default function VideoPlayer({
   const wsRef = useRef<{ connect: () => void; disconnect: () => void } | null>(null)
 
   const { connect, disconnect, connected } = useWebSocket(
-    `/ws/transcribe/${videoId}`,
+    // 選擇繁體中文時，翻譯與轉錄同時進行
+    `/ws/transcribe/${videoId}?encoding=compact${language === 'traditional' ? '&translate=true' : ''}`,
     {
       onMessage: (data: any) => {
         console.log('WebSocket 收到消息:', data.type)
         if (data.type === 'status') {
           console.log('狀態:', data.message)
-        } else if (data.type === 'subtitle') {
-          console.log('收到字幕:', data.data)
-          onSubtitleReceived(data.data)
+        } else if (isSubtitleFrame(data)) {
+          // 一個訊框可能包含多條字幕，一次更新狀態
+          onSubtitlesReceived(decodeSubtitleFrame(data))
+        } else if (data.type === 'translations') {
+          onTranslationsReceived?.(decodeTranslationFrame(data))
         } else if (data.type === 'completed') {
           console.log('轉錄完成')
           setIsTranscribing(false)
@@ -94,12 +102,8 @@ export default function VideoPlayer({
     const updateSubtitle = () => {
       const currentTime = video.currentTime
       
-      // 找到當前時間對應的字幕
-      const activeSubtitle = subtitles.find(
-        (subtitle) => 
-          currentTime >= subtitle.start_time && 
-          currentTime <= subtitle.end_time
-      )
+      // 找到當前時間對應的字幕（二分搜尋）
+      const activeSubtitle = findActiveCue(subtitles, currentTime)
       
       setCurrentSubtitle(activeSubtitle || null)
     }
@@ -181,6 +185,8 @@ export default function VideoPlayer({
         )}
       </div>
 
+      <WaveformBar videoId={videoId} videoRef={videoRef} />
+
       <div className="p-4 bg-gray-50 border-t">
         <div className="flex items-center justify-between">
           <div className="flex items-center gap-2">
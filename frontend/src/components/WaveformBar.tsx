@@ -0,0 +1,140 @@
+import { useEffect, useRef, useState } from 'react'
+import { chooseLevel, fetchWaveformInfo, loadPeaks, WaveformInfo } from '../utils/waveform'
+
+interface WaveformBarProps {
+  videoId: string
+  videoRef: React.RefObject<HTMLVideoElement>
+}
+
+const HEIGHT = 64
+const MAX_ZOOM = 256
+
+export default function WaveformBar({ videoId, videoRef }: WaveformBarProps) {
+  const canvasRef = useRef<HTMLCanvasElement>(null)
+  const [info, setInfo] = useState<WaveformInfo | null>(null)
+  const [zoom, setZoom] = useState(1)
+  const [currentTime, setCurrentTime] = useState(0)
+  const [peaks, setPeaks] = useState<{ data: Int8Array; start: number; end: number } | null>(null)
+
+  // 波形在上傳後於背景計算，尚未完成時稍後重試
+  useEffect(() => {
+    let cancelled = false
+    let timer: ReturnType<typeof setTimeout>
+    const poll = async () => {
+      try {
+        const result = await fetchWaveformInfo(videoId)
+        if (cancelled) return
+        if (result.status === 'completed') {
+          setInfo(result)
+        } else if (result.status !== 'failed') {
+          timer = setTimeout(poll, 1000)
+        }
+      } catch {
+        // 讀取失敗時不顯示波形
+      }
+    }
+    poll()
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [videoId])
+
+  useEffect(() => {
+    const video = videoRef.current
+    if (!video) return
+    const update = () => setCurrentTime(video.currentTime)
+    video.addEventListener('timeupdate', update)
+    video.addEventListener('seeked', update)
+    return () => {
+      video.removeEventListener('timeupdate', update)
+      video.removeEventListener('seeked', update)
+    }
+  }, [videoRef])
+
+  const duration = info?.duration ?? 0
+  const visibleSeconds = duration / zoom
+  // 放大時以播放位置為中心
+  const viewStart = Math.min(Math.max(0, currentTime - visibleSeconds / 2), Math.max(0, duration - visibleSeconds))
+
+  // 只讀取可見範圍所需的分塊
+  useEffect(() => {
+    const canvas = canvasRef.current
+    if (!info?.levels || !info.tile_peaks || !canvas || duration <= 0) return
+    const level = chooseLevel(info.levels, visibleSeconds, canvas.clientWidth)
+    const start = viewStart * level.peaks_per_second
+    const end = (viewStart + visibleSeconds) * level.peaks_per_second
+    let cancelled = false
+    loadPeaks(videoId, level, info.tile_peaks, start, end)
+      .then((data) => {
+        if (!cancelled) setPeaks({ data, start: viewStart, end: viewStart + visibleSeconds })
+      })
+      .catch(() => undefined)
+    return () => {
+      cancelled = true
+    }
+    // 縮放時 viewStart 以秒為單位變化即可，不需每個 timeupdate 重新讀取
+  }, [info, videoId, zoom, Math.floor(viewStart)])
+
+  useEffect(() => {
+    const canvas = canvasRef.current
+    if (!canvas || !peaks) return
+    const width = canvas.clientWidth
+    const ratio = window.devicePixelRatio || 1
+    canvas.width = width * ratio
+    canvas.height = HEIGHT * ratio
+    const ctx = canvas.getContext('2d')
+    if (!ctx) return
+    ctx.scale(ratio, ratio)
+    ctx.clearRect(0, 0, width, HEIGHT)
+
+    const count = peaks.data.length / 2
+    const mid = HEIGHT / 2
+    ctx.fillStyle = '#93c5fd'
+    for (let x = 0; x < width; x++) {
+      // 每個像素涵蓋的峰值範圍取極值
+      const from = Math.floor((x / width) * count)
+      const to = Math.max(from + 1, Math.floor(((x + 1) / width) * count))
+      let min = 0
+      let max = 0
+      for (let i = from; i < to && i < count; i++) {
+        min = Math.min(min, peaks.data[i * 2])
+        max = Math.max(max, peaks.data[i * 2 + 1])
+      }
+      const top = mid - (max / 128) * mid
+      const bottom = mid - (min / 128) * mid
+      ctx.fillRect(x, top, 1, Math.max(1, bottom - top))
+    }
+
+    const span = peaks.end - peaks.start
+    if (span > 0) {
+      const playhead = ((currentTime - peaks.start) / span) * width
+      ctx.fillStyle = '#2563eb'
+      ctx.fillRect(playhead, 0, 2, HEIGHT)
+    }
+  }, [peaks, currentTime])
+
+  const handleClick = (event: React.MouseEvent<HTMLCanvasElement>) => {
+    const video = videoRef.current
+    if (!video || !peaks) return
+    const rect = event.currentTarget.getBoundingClientRect()
+    video.currentTime = peaks.start + ((event.clientX - rect.left) / rect.width) * (peaks.end - peaks.start)
+  }
+
+  const handleWheel = (event: React.WheelEvent<HTMLCanvasElement>) => {
+    setZoom((z) => Math.min(MAX_ZOOM, Math.max(1, event.deltaY < 0 ? z * 2 : z / 2)))
+  }
+
+  if (!info) return null
+
+  return (
+    <canvas
+      ref={canvasRef}
+      className="w-full cursor-pointer bg-gray-100"
+      style={{ height: HEIGHT }}
+      onClick={handleClick}
+      onWheel={handleWheel}
+      title="點擊跳轉，滾輪縮放"
+    />
+  )
+}
@@ -0,0 +1,51 @@
+/**
+ * 字幕推送訊框解碼工具
+ *
+ * 後端以批次訊框推送字幕：
+ * - { type: 'subtitles', data: Subtitle[] }
+ * - { type: 'cues', fields: string[], data: any[][] }（精簡陣列編碼）
+ * - { type: 'translations', data: [...] }（與轉錄同時進行的翻譯結果）
+ */
+
+export interface Subtitle {
+  id: number
+  start_time: number
+  end_time: number
+  text: string
+}
+
+export function decodeSubtitleFrame(frame: any): Subtitle[] {
+  if (frame.type === 'subtitle') {
+    return [frame.data]
+  }
+  if (frame.type === 'subtitles') {
+    return frame.data
+  }
+  if (frame.type === 'cues') {
+    const fields: string[] = frame.fields
+    return frame.data.map((row: any[]) => {
+      const cue: any = {}
+      fields.forEach((field, index) => {
+        cue[field] = row[index]
+      })
+      return cue as Subtitle
+    })
+  }
+  return []
+}
+
+export interface TranslatedCue {
+  id: number
+  translated_text: string
+}
+
+export function decodeTranslationFrame(frame: any): TranslatedCue[] {
+  if (frame.fields) {
+    return frame.data.map((row: any[]) => ({ id: row[0], translated_text: row[1] }))
+  }
+  return frame.data
+}
+
+export function isSubtitleFrame(frame: any): boolean {
+  return frame.type === 'subtitle' || frame.type === 'subtitles' || frame.type === 'cues'
+}
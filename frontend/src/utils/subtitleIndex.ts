@@ -0,0 +1,33 @@
+/**
+ * 字幕時間查詢工具
+ */
+
+export interface TimedCue {
+  start_time: number
+  end_time: number
+}
+
+/**
+ * 以二分搜尋找出時間點 t 正在顯示的字幕（字幕需依 start_time 排序）
+ */
+export function findActiveCue<T extends TimedCue>(cues: T[], t: number): T | null {
+  let lo = 0
+  let hi = cues.length - 1
+  let last = -1
+  while (lo <= hi) {
+    const mid = (lo + hi) >> 1
+    if (cues[mid].start_time <= t) {
+      last = mid
+      lo = mid + 1
+    } else {
+      hi = mid - 1
+    }
+  }
+  // 相鄰字幕可能略有重疊，往前檢查一條
+  for (let i = last; i >= 0 && i >= last - 1; i--) {
+    if (t <= cues[i].end_time) {
+      return cues[i]
+    }
+  }
+  return null
+}
@@ -0,0 +1,93 @@
+/**
+ * 波形峰值分塊讀取工具
+ *
+ * 後端提供多解析度的 min/max 峰值金字塔，每個分塊為 int8 的 (min, max) 交錯陣列。
+ * 依顯示寬度選擇剛好足夠的層級，只下載可見範圍的分塊。
+ */
+
+export interface WaveformLevel {
+  level: number
+  samples_per_peak: number
+  peaks_per_second: number
+  peaks: number
+  tiles: number
+}
+
+export interface WaveformInfo {
+  status: string
+  sample_rate?: number
+  duration?: number
+  tile_peaks?: number
+  levels?: WaveformLevel[]
+}
+
+const tileCache = new Map<string, Promise<Int8Array>>()
+
+export async function fetchWaveformInfo(videoId: string): Promise<WaveformInfo> {
+  const response = await fetch(`/api/waveform/${videoId}`)
+  if (!response.ok) {
+    throw new Error('波形資料讀取失敗')
+  }
+  return response.json()
+}
+
+/**
+ * 選擇可見時間範圍內峰值數不少於畫面寬度（像素）的最粗層級
+ */
+export function chooseLevel(levels: WaveformLevel[], visibleSeconds: number, widthPx: number): WaveformLevel {
+  for (let i = levels.length - 1; i >= 0; i--) {
+    if (levels[i].peaks_per_second * visibleSeconds >= widthPx) {
+      return levels[i]
+    }
+  }
+  return levels[0]
+}
+
+function fetchTile(videoId: string, level: number, tile: number): Promise<Int8Array> {
+  const key = `${videoId}/${level}/${tile}`
+  let cached = tileCache.get(key)
+  if (!cached) {
+    cached = fetch(`/api/waveform/${key}`)
+      .then((response) => {
+        if (!response.ok) throw new Error('波形分塊讀取失敗')
+        return response.arrayBuffer()
+      })
+      .then((buffer) => new Int8Array(buffer))
+    // 失敗時移除快取，下次重新請求
+    cached.catch(() => tileCache.delete(key))
+    tileCache.set(key, cached)
+  }
+  return cached
+}
+
+/**
+ * 讀取層級中 [startPeak, endPeak) 範圍的峰值（只下載涵蓋此範圍的分塊）
+ */
+export async function loadPeaks(
+  videoId: string,
+  level: WaveformLevel,
+  tilePeaks: number,
+  startPeak: number,
+  endPeak: number
+): Promise<Int8Array> {
+  const start = Math.max(0, Math.floor(startPeak))
+  const end = Math.min(level.peaks, Math.ceil(endPeak))
+  if (end <= start) return new Int8Array(0)
+
+  const firstTile = Math.floor(start / tilePeaks)
+  const lastTile = Math.floor((end - 1) / tilePeaks)
+  const tiles = await Promise.all(
+    Array.from({ length: lastTile - firstTile + 1 }, (_, i) => fetchTile(videoId, level.level, firstTile + i))
+  )
+
+  const result = new Int8Array((end - start) * 2)
+  let written = 0
+  tiles.forEach((tile, i) => {
+    const tileStart = (firstTile + i) * tilePeaks
+    const from = Math.max(start, tileStart) - tileStart
+    const to = Math.min(end, tileStart + tile.length / 2) - tileStart
+    result.set(tile.subarray(from * 2, to * 2), written)
+    written += (to - from) * 2
+  })
+  return result
+}
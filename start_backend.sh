@@ -18,7 +18,7 @@ if ! command -v ffmpeg &> /dev/null; then
     exit 1
 fi
 
-# 啟動服務
-echo "啟動後端服務於 http://localhost:8000"
+# 啟動服務（WORKERS=auto 依 CPU 核心數啟動多個 worker）
+echo "啟動後端服務於 http://localhost:${PORT:-8000}"
 python main.py
 